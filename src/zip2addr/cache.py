@@ -0,0 +1,122 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh at gmail.com>
+# SPDX-License-Identifier: MIT
+#
+"""Bounded in-process cache of serialized responses with LRU and TTL.
+
+Entries are dropped in the least recently used order if the cache is full,
+and expired ``ttl`` seconds after these were cached. All of them are dropped
+if the signature of the data given changed, e.g. the database file was
+replaced or updated.
+"""
+import collections
+import threading
+import time
+import typing
+
+from . import config
+
+
+class ResponseCache:
+    """A cache of serialized responses keyed by zip codes.
+    """
+    def __init__(
+        self, maxsize: int, ttl: float,
+        timer: typing.Callable[[], float] = time.monotonic
+    ):
+        """
+        :param maxsize: The max number of entries, or 0 to disable the cache
+        :param ttl: Seconds to keep entries
+        :param timer: A function returns the current time in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries: collections.OrderedDict[
+            str, tuple[float, bytes]
+        ] = collections.OrderedDict()
+        self._signature: typing.Any = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def validate(self, signature: typing.Any):
+        """Drop all entries if the signature of the data changed.
+        """
+        with self._lock:
+            if signature != self._signature:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._signature = signature
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        """Get the response of ``key`` if it's cached and not expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < self._timer():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: bytes):
+        """Cache the response of ``key``.
+        """
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (self._timer() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Get the counters and the number of entries.
+        """
+        return dict(
+            size=len(self._entries), maxsize=self.maxsize,
+            hits=self.hits, misses=self.misses, evictions=self.evictions,
+            expirations=self.expirations, invalidations=self.invalidations,
+        )
+
+
+_CACHE: typing.Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the cache of responses configured, see
+    :func:`zip2addr.config.get_cache_options`.
+    """
+    global _CACHE  # pylint: disable=global-statement
+
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            options = config.get_cache_options()
+            _CACHE = ResponseCache(options["maxsize"], options["ttl"])
+
+    return _CACHE
@@ -3,6 +3,7 @@
 """CLI frontend to manage database files.
 """
 import pprint
+import typing
 
 import click
 
@@ -32,28 +33,98 @@ def main(verbose: bool):
     "--csv-filenames", "-C", nargs=2,
     default=constants.ZIPCODE_CSV_FILENAMES
 )
+@click.option(
+    "--streaming/--no-streaming", default=False,
+    help="Save data into the db in batches without making a json file"
+)
+@click.option(
+    "--export-json", is_flag=True, default=False,
+    help="Export data as a json file also in streaming mode"
+)
+@click.option(
+    "--extract/--no-extract", default=False,
+    help="Extract csv files from zip files instead of reading them directly"
+)
+@click.option(
+    "--workers", "-w", type=click.IntRange(min=0), default=1,
+    help="The number of worker processes to parse csv data; "
+         "0 means the number of CPUs"
+)
+@click.option(
+    "--snapshot/--no-snapshot", default=True,
+    help="Save data as a snapshot file also to look up them with mmap"
+)
+@click.option(
+    "--normalize/--no-normalize", default=False,
+    help="Save prefectures and cities in their own tables to make the "
+         "tables of addresses smaller; these are still duplicated in the "
+         "lookup table"
+)
+@click.option(
+    "--profile", is_flag=True, default=False,
+    help="Show wall time and rows of each stage"
+)
+@click.option(
+    "--profile-dir", default=None,
+    help="Save the profile report and cProfile stats of each stage in this "
+         "dir, which makes stages slower; it implies --profile"
+)
+@click.option(
+    "--trace-memory", is_flag=True, default=False,
+    help="Show peak memory of each stage also, which makes stages slower; "
+         "it implies --profile"
+)
 def initdb(
     datadir: str, output: str,
     zip_filenames: tuple[str, str],
     csv_filenames: tuple[str, str],
+    streaming: bool, export_json: bool, extract: bool, workers: int,
+    snapshot: bool, normalize: bool, profile: bool,
+    profile_dir: typing.Optional[str], trace_memory: bool,
 ):
     """
     Prase csv files extracted from zip files, save resutl data as a db file.
     """
-    iapi.initdb(
+    profiler = iapi.initdb(
         datadir, output,
-        zip_filenames=zip_filenames, csv_filenames=csv_filenames
+        zip_filenames=zip_filenames, csv_filenames=csv_filenames,
+        streaming=streaming, export_json=export_json, extract=extract,
+        workers=workers, make_snapshot=snapshot, normalize=normalize,
+        profile=profile or profile_dir is not None or trace_memory,
+        profile_dir=profile_dir, trace_memory=trace_memory
     )
+    if profiler is not None:
+        click.echo(profiler.report())
 
 
 @main.command()
 @click.option("--db-path", "-d", default=constants.DATABASE_FILEPATH)
+@click.argument(
+    "delta_files", nargs=-1, required=True,
+    type=click.Path(exists=True, dir_okay=False)
+)
+def update(db_path: str, delta_files: tuple[str, ...]):
+    """
+    Apply the monthly delta files, add_YYMM.zip and del_YYMM.zip, to the
+    database file.
+    """
+    res = iapi.update_db(db_path, delta_files)
+    if res:
+        click.echo(", ".join(f"{k}: {v}" for k, v in res.items()))
+
+
+@main.command()
+@click.option("--db-path", "-d", default=constants.DATABASE_FILEPATH)
+@click.option(
+    "--engine", "-e", type=click.Choice(constants.LOOKUP_ENGINES),
+    default=constants.LOOKUP_ENGINE
+)
 @click.argument("zipcode")
-def search(db_path: str, zipcode: str):
+def search(db_path: str, engine: str, zipcode: str):
     """
     Search address info from rhe database file by given zip code.
     """
-    res = iapi.search_by_zipcode(zipcode, db_path, limit=0)
+    res = iapi.search_by_zipcode(zipcode, db_path, limit=0, engine=engine)
     fmt = pprint.pformat
 
     if len(res) > utils.get_term_lines():
@@ -61,3 +132,50 @@ def search(db_path: str, zipcode: str):
     else:
         for zipd in res:
             click.echo(fmt(zipd))
+
+
+@main.command()
+@click.option("--db-path", "-d", default=constants.DATABASE_FILEPATH)
+@click.option(
+    "--engine", "-e", type=click.Choice(constants.LOOKUP_ENGINES),
+    default=constants.LOOKUP_ENGINE
+)
+@click.option(
+    "--input", "-i", "input_file", type=click.File(),
+    help="A file has zip codes, one per line, or '-' to read from stdin"
+)
+@click.argument("zipcodes", nargs=-1)
+def search_batch(
+    db_path: str, engine: str, input_file: typing.Optional[typing.TextIO],
+    zipcodes: tuple[str, ...]
+):
+    """
+    Search address info of zip codes from the database file at once.
+    """
+    zcs = list(zipcodes)
+    if input_file is not None:
+        zcs.extend(line.strip() for line in input_file if line.strip())
+
+    res = iapi.search_by_zipcodes(zcs, db_path, engine=engine)
+    for zipd in res:
+        click.echo(pprint.pformat(zipd))
+
+
+@main.command()
+@click.option("--db-path", "-d", default=constants.DATABASE_FILEPATH)
+@click.option("--limit", "-n", type=int, default=constants.LIMIT)
+@click.option("--fuzzy/--no-fuzzy", default=False,
+              help="Find similar addresses even if the query has typos")
+@click.argument("query", nargs=-1, required=True)
+def search_address(
+    db_path: str, limit: int, fuzzy: bool, query: tuple[str, ...]
+):
+    """
+    Search zip codes from the database file by (partial) address in kanji,
+    kana or roman.
+    """
+    res = iapi.search_by_address(
+        " ".join(query), db_path, limit=limit, fuzzy=fuzzy
+    )
+    for zipd in res:
+        click.echo(pprint.pformat(zipd))
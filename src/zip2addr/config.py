@@ -0,0 +1,87 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh at gmail.com>
+# SPDX-License-Identifier: MIT
+"""Configurations of the web app from environment variables.
+"""
+import os
+
+from . import constants
+
+
+ENV_PREFIX: str = f"{constants.NAME.upper()}_"
+
+
+def get_env(name: str, default: str) -> str:
+    """Get the value of the environment variable ``ENV_PREFIX`` + ``name``.
+    """
+    return os.environ.get(f"{ENV_PREFIX}{name}", default)
+
+
+def get_lookup_engine() -> str:
+    """
+    Get the engine to look up zip codes from ZIP2ADDR_LOOKUP_ENGINE.
+
+    :raises: ValueError
+    """
+    engine = get_env("LOOKUP_ENGINE", constants.LOOKUP_ENGINE)
+    if engine not in constants.LOOKUP_ENGINES:
+        raise ValueError(f"Unknown lookup engine: {engine}")
+
+    return engine
+
+
+def get_bool(name: str, default: bool) -> bool:
+    """Get the boolean value of the environment variable.
+    """
+    value = get_env(name, "")
+    if not value:
+        return default
+
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def get_int(name: str, default: int) -> int:
+    """Get the integer value of the environment variable.
+
+    :raises: ValueError
+    """
+    value = get_env(name, "")
+    if not value:
+        return default
+
+    return int(value)
+
+
+def get_cache_options() -> dict[str, int]:
+    """
+    Get the options of the cache of responses from ZIP2ADDR_CACHE_SIZE and
+    ZIP2ADDR_CACHE_TTL, and it's disabled if the size is 0.
+
+    :raises: ValueError
+    """
+    return dict(
+        maxsize=get_int("CACHE_SIZE", constants.CACHE_SIZE),
+        ttl=get_int("CACHE_TTL", constants.CACHE_TTL)
+    )
+
+
+def get_db_options() -> dict[str, bool]:
+    """
+    Get the options of database engines to serve lookups from
+    ZIP2ADDR_DB_READ_ONLY and ZIP2ADDR_DB_IMMUTABLE.
+
+    The database files must not be modified in place, by 'zip2addr update'
+    for example, while serving if ZIP2ADDR_DB_IMMUTABLE is true.
+    """
+    return dict(
+        read_only=get_bool("DB_READ_ONLY", True),
+        immutable=get_bool("DB_IMMUTABLE", False)
+    )
+
+
+def is_db_async() -> bool:
+    """
+    Test if the web app reads the database with async sessions over
+    aiosqlite from ZIP2ADDR_DB_ASYNC, instead of sync sessions in worker
+    threads.
+    """
+    return get_bool("DB_ASYNC", constants.DB_ASYNC)
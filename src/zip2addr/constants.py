@@ -20,6 +20,11 @@ ZIPCODE_ZIP_FILE_URLS: typing.Final[tuple[str, ...]] = (
     KANA_ZIPCODE_URL,
 )
 
+# The size of chunks to save the data downloaded, and the validators of the
+# data to download them again only if they were modified.
+DOWNLOAD_CHUNK_SIZE: typing.Final[int] = 1024 * 64
+HTTP_VALIDATORS: typing.Final[tuple[str, ...]] = ("ETag", "Last-Modified")
+
 # .. seealso:: https://www.post.japanpost.jp/zipcode/download.html
 ROMAN_ZIPCODE_ZIP_FILENAME: typing.Final[str] = "ken_all_rome.zip"
 KANA_ZIPCODE_ZIP_FILENAME: typing.Final[str] = "ken_all.zip"
@@ -28,6 +33,10 @@ ZIPCODE_ZIP_FILENAMES: tuple[str, ...] = (
     KANA_ZIPCODE_ZIP_FILENAME,
 )
 
+# Types of the monthly delta files, add_YYMM.zip and del_YYMM.zip, in the
+# same format as kana data.
+DELTA_FILE_TYPES: typing.Final[tuple[str, ...]] = ("add", "del")
+
 ROMAN_ZIPCODE_FILENAME: typing.Final[str] = "KEN_ALL_ROME.csv"
 KANA_ZIPCODE_FILENAME: typing.Final[str] = "KEN_ALL.CSV"
 ZIPCODE_CSV_FILENAMES: tuple[str, ...] = (
@@ -35,11 +44,84 @@ ZIPCODE_CSV_FILENAMES: tuple[str, ...] = (
     KANA_ZIPCODE_FILENAME,
 )
 
+# The encoding of csv files. Japan Post's csv files are in CP932, the superset
+# of Shift_JIS.
+CSV_ENCODING: typing.Final[str] = "cp932"
+
 JSON_FILENAME: typing.Final[str] = "zipcodes.json"
 
 # .. seealso:: https://peps.python.org/pep-0591/
 DATABASE_FILENAME: typing.Final[str] = "zipcodes.db"
 DATABASE_FILEPATH: typing.Final[str] = f"./{DATABASE_FILENAME}"
 
+# The suffix of the snapshot files of databases, looked up with mmap.
+SNAPSHOT_SUFFIX: typing.Final[str] = ".snap"
+
+# The suffix of the digit trie files of zip codes in databases.
+TRIE_SUFFIX: typing.Final[str] = ".trie"
+
+# The max number of responses of zip codes cached and the seconds to keep
+# them in the cache.
+CACHE_SIZE: typing.Final[int] = 4096
+CACHE_TTL: typing.Final[int] = 3600
+
+# Seconds clients and CDNs may cache responses for without revalidating.
+HTTP_CACHE_MAX_AGE: typing.Final[int] = 3600
+
+# The header of responses has the total number of zip codes found.
+TOTAL_COUNT_HEADER: typing.Final[str] = "X-Total-Count"
+
+# Zip codes in Japan are 7 digits.
+ZIPCODE_LENGTH: typing.Final[int] = 7
+PARTIAL_ZIPCODE_PATTERN: typing.Final[str] = f"^[0-9]{{0,{ZIPCODE_LENGTH}}}$"
+
+# Engines to look up zip codes in the web app and the cli frontend.
+LOOKUP_ENGINES: typing.Final[tuple[str, ...]] = ("sql", "mmap", "memory")
+LOOKUP_ENGINE: typing.Final[str] = LOOKUP_ENGINES[0]
+
 # # of limit of results to get, etc.
 LIMIT: typing.Final[int] = 100
+
+# The max limit of results of searches by addresses in the web app.
+MAX_LIMIT: typing.Final[int] = 1000
+
+# The max number of zip codes looked up in a batch, and the number of them
+# looked up in a query at once in it, less than the max number of variables
+# in SQLite statements, 999 in the versions before 3.32.0.
+BATCH_LOOKUP_LIMIT: typing.Final[int] = 1000
+BATCH_QUERY_SIZE: typing.Final[int] = 500
+
+# The max length of queries to search zip codes by addresses.
+QUERY_LENGTH: typing.Final[int] = 100
+
+# The header of responses has the cursor to get the next page.
+NEXT_CURSOR_HEADER: typing.Final[str] = "X-Next-Cursor"
+
+# The number of rows to insert into the database at once.
+BATCH_SIZE: typing.Final[int] = 5000
+
+# The number of lines of csv files to parse in a worker process at once, and
+# the maximum number of chunks of lines waiting to be parsed.
+CHUNK_SIZE: typing.Final[int] = 10000
+MAX_PENDING_CHUNKS: typing.Final[int] = 32
+
+# Pragmas and the pool of read-only database engines to serve lookups.
+SQLITE_READ_ONLY_PRAGMAS: typing.Final[tuple[tuple[str, typing.Any], ...]] = (
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -64 * 1024),  # KiB if it's negative.
+    ("temp_store", "MEMORY"),
+    ("query_only", "ON"),
+)
+DB_POOL_SIZE: typing.Final[int] = 8
+DB_POOL_MAX_OVERFLOW: typing.Final[int] = 8
+
+# The web app reads the database with sync sessions in worker threads by
+# default, as async sessions over aiosqlite were slower to answer concurrent
+# requests in tests/benchmarks/bench_concurrency.py.
+DB_ASYNC: typing.Final[bool] = False
+
+# Candidates to rank by the similarity of trigrams in fuzzy address search,
+# per result, and the ratio of the trigrams of queries found in addresses
+# needed at least.
+FUZZY_CANDIDATES: typing.Final[int] = 20
+FUZZY_THRESHOLD: typing.Final[float] = 0.5
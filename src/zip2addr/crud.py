@@ -1,44 +1,422 @@
 """Functions for CRUD operations.
 """
+import re
 import typing
 
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from . import constants, models, schemas
+from . import constants, models, schemas, utils
+
+
+def select_zipcode_data() -> typing.Any:
+    """
+    Make a statement to select zip codes and address info of them as flat
+    rows, have the same keys as models.Zipcode.as_dict() and id and
+    address_id, ordered by zip code.
+    """
+    ztable = models.Zipcode.__table__
+    atable = models.Address.__table__
+    rtable = models.RomanAddress.__table__
+    ktable = models.KanaAddress.__table__
+    mtable = models.Municipality.__table__
+    ptable = models.Prefecture.__table__
+
+    # pref and city_ward are referred from the municipality if normalized.
+    columns = [ztable.c.id, ztable.c.zipcode, ztable.c.address_id]
+    for table, prefix in ((atable, ""), (rtable, "roman_"), (ktable, "kana_")):
+        columns.extend([
+            sqlalchemy.func.coalesce(
+                table.c.pref, ptable.c[f"{prefix}pref"], ""
+            ).label(f"{prefix}pref"),
+            sqlalchemy.func.coalesce(
+                table.c.city_ward, mtable.c[f"{prefix}city_ward"], ""
+            ).label(f"{prefix}city_ward"),
+            sqlalchemy.func.coalesce(
+                table.c.house_numbers, ""
+            ).label(f"{prefix}house_numbers"),
+        ])
+
+    return sqlalchemy.select(*columns).select_from(
+        ztable.join(
+            atable, atable.c.id == ztable.c.address_id
+        ).outerjoin(
+            rtable, rtable.c.address_id == atable.c.id
+        ).outerjoin(
+            ktable, ktable.c.address_id == atable.c.id
+        ).outerjoin(
+            mtable, mtable.c.id == atable.c.municipality_id
+        ).outerjoin(
+            ptable, ptable.c.id == mtable.c.prefecture_id
+        )
+    ).order_by(ztable.c.zipcode)
+
+
+def get_next_prefix(prefix: str) -> typing.Optional[str]:
+    """
+    Get the least string greater than any strings start with ``prefix`` of
+    digits, or None if there is no such one, e.g. '0599' -> '06'.
+    """
+    stripped = prefix.rstrip("9")
+    if not stripped:
+        return None
+
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+
+def get_prefix_condition(column: typing.Any, prefix: str) -> typing.Any:
+    """
+    Make a condition to match zip codes start with ``prefix`` as a half-open
+    range [prefix, next prefix), can use the index of ``column`` unlike LIKE.
+
+    :raises: ValueError if ``prefix`` is not digits up to the zip code length
+    """
+    if not re.fullmatch(constants.PARTIAL_ZIPCODE_PATTERN, prefix):
+        raise ValueError(f"Invalid partial zip code: {prefix!r}")
+
+    upper = get_next_prefix(prefix)
+    if upper is None:
+        return column >= prefix
+
+    return sqlalchemy.and_(column >= prefix, column < upper)
+
+
+def select_zipcodes(
+    partial_zipcode: typing.Optional[str] = None,
+    skip: int = 0, limit: typing.Optional[int] = constants.LIMIT,
+    after: typing.Optional[str] = None
+) -> typing.Any:
+    """
+    Make a statement to select zip codes from the lookup table ordered by zip
+    code, used in sync and async sessions.
+
+    :param partial_zipcode: Select zip codes start with it if given
+    :param limit: Select all of zip codes if it's None
+    :param after:
+        Select zip codes greater than it to page through them by zip code,
+        costs same for any pages unlike ``skip``
+    :raises: ValueError if ``partial_zipcode`` is not valid
+    """
+    column = models.ZipcodeLookup.__table__.c.zipcode
+    stmt = sqlalchemy.select(models.ZipcodeLookup)
+    if partial_zipcode is not None:
+        stmt = stmt.where(get_prefix_condition(column, partial_zipcode))
+    if after is not None:
+        stmt = stmt.where(column > after)
+
+    stmt = stmt.order_by(column).offset(skip)
+    return stmt if limit is None else stmt.limit(limit)
 
 
 def get_zipcode(
     dbs: Session,
     zipcode: str,
-) -> typing.Optional[models.Zipcode]:
+) -> typing.Optional[models.ZipcodeLookup]:
     """Get *a* model instance of zip code by a zip code string.
     """
-    return dbs.query(
-        models.Zipcode
-    ).filter(models.Zipcode.zipcode == zipcode).first()
+    return dbs.get(models.ZipcodeLookup, zipcode)
+
+
+def select_zipcodes_in(zipcodes: typing.Collection[str]) -> typing.Any:
+    """Make a statement to select the zip codes ``zipcodes``.
+    """
+    return sqlalchemy.select(models.ZipcodeLookup).where(
+        models.ZipcodeLookup.zipcode.in_(zipcodes)
+    )
+
+
+def get_zipcodes_by_zipcodes(
+    dbs: Session, zipcodes: typing.Iterable[str],
+    chunk_size: int = constants.BATCH_QUERY_SIZE
+) -> dict[str, models.ZipcodeLookup]:
+    """
+    Get model instances of the zip codes found in ``zipcodes`` with queries
+    for chunks of them.
+    """
+    res: dict[str, models.ZipcodeLookup] = {}
+    for chunk in utils.chunks(sorted(set(zipcodes)), chunk_size):
+        res.update(
+            (zc.zipcode, zc) for zc in dbs.scalars(select_zipcodes_in(chunk))
+        )
+
+    return res
+
+
+def lookup_zipcodes(
+    engine: typing.Any, zipcodes: typing.Iterable[str]
+) -> dict[str, typing.Any]:
+    """
+    Get the zip codes found in ``zipcodes`` with the lookup engine, a
+    snapshot.Snapshot or a memory.Store object.
+    """
+    res = {}
+    for zipcode in set(zipcodes):
+        zdata = engine.get_zipcode(zipcode)
+        if zdata is not None:
+            res[zipcode] = zdata
+
+    return res
+
+
+def make_batch_results(
+    zipcodes: typing.Iterable[str], found: typing.Mapping[str, typing.Any]
+) -> list[dict[str, typing.Any]]:
+    """
+    Make the results of ``zipcodes`` in the order with the markers of zip
+    codes not found.
+    """
+    return [
+        dict(
+            zipcode=zipcode, found=zipcode in found,
+            result=found[zipcode].as_dict() if zipcode in found else None
+        )
+        for zipcode in zipcodes
+    ]
 
 
 def get_zipcodes(
-    dbs: Session, skip: int = 0, limit: int = 100
-) -> list[models.Zipcode]:
+    dbs: Session, skip: int = 0, limit: int = 100,
+    after: typing.Optional[str] = None
+) -> list[models.ZipcodeLookup]:
     """Get all of model instances of zip code.
+
+    :param after: See :func:`select_zipcodes`
     """
-    return dbs.query(models.Zipcode).offset(skip).limit(limit).all()
+    return list(dbs.scalars(
+        select_zipcodes(skip=skip, limit=limit, after=after)
+    ))
 
 
 def get_zipcodes_by_partial_zipcode(
         dbs: Session, partial_zipcode: str,
-        skip: int = 0, limit: int = constants.LIMIT
-) -> list[models.Zipcode]:
+        skip: int = 0, limit: int = constants.LIMIT,
+        after: typing.Optional[str] = None
+) -> list[models.ZipcodeLookup]:
     """Get model instances of zip code by partial zip code string.
+
+    :param after: See :func:`select_zipcodes`
+    :raises: ValueError if ``partial_zipcode`` is not valid
+    """
+    return list(dbs.scalars(
+        select_zipcodes(
+            partial_zipcode, skip=skip,
+            limit=limit if limit > 0 else None, after=after
+        )
+    ))
+
+
+async def get_zipcode_async(
+    adbs: AsyncSession, zipcode: str
+) -> typing.Optional[models.ZipcodeLookup]:
+    """Get *a* model instance of zip code asynchronously.
+    """
+    return await adbs.get(models.ZipcodeLookup, zipcode)
+
+
+async def get_zipcodes_by_zipcodes_async(
+    adbs: AsyncSession, zipcodes: typing.Iterable[str],
+    chunk_size: int = constants.BATCH_QUERY_SIZE
+) -> dict[str, models.ZipcodeLookup]:
+    """Get model instances of the zip codes found asynchronously.
+    """
+    res: dict[str, models.ZipcodeLookup] = {}
+    for chunk in utils.chunks(sorted(set(zipcodes)), chunk_size):
+        res.update(
+            (zc.zipcode, zc)
+            for zc in await adbs.scalars(select_zipcodes_in(chunk))
+        )
+
+    return res
+
+
+async def get_zipcodes_async(
+    adbs: AsyncSession, skip: int = 0, limit: int = constants.LIMIT,
+    after: typing.Optional[str] = None
+) -> list[models.ZipcodeLookup]:
+    """Get model instances of zip code asynchronously.
     """
-    res = dbs.query(
-        models.Zipcode
-    ).filter(
-        models.Zipcode.zipcode.startswith(partial_zipcode)
-    ).offset(skip)
+    return list(await adbs.scalars(
+        select_zipcodes(skip=skip, limit=limit, after=after)
+    ))
 
-    return res.limit(limit).all() if limit > 0 else res.all()
+
+async def get_zipcodes_by_partial_zipcode_async(
+    adbs: AsyncSession, partial_zipcode: str,
+    skip: int = 0, limit: int = constants.LIMIT,
+    after: typing.Optional[str] = None
+) -> list[models.ZipcodeLookup]:
+    """Get model instances of zip code by partial zip code asynchronously.
+
+    :raises: ValueError if ``partial_zipcode`` is not valid
+    """
+    return list(await adbs.scalars(
+        select_zipcodes(
+            partial_zipcode, skip=skip,
+            limit=limit if limit > 0 else None, after=after
+        )
+    ))
+
+
+def get_words(query: str) -> list[str]:
+    """Get the words in ``query`` normalized same as addresses indexed.
+
+    :raises: ValueError if ``query`` has no words
+    """
+    words = [
+        word for word in (utils.normalize_text(w) for w in query.split())
+        if word
+    ]
+    if not words:
+        raise ValueError(f"No words to search: {query!r}")
+
+    return words
+
+
+def _quote(phrase: str) -> str:
+    """Quote a phrase in full-text search queries.
+    """
+    return '"{}"'.format(phrase.replace('"', '""'))
+
+
+def select_zipcodes_by_address(
+    query: str, limit: int = constants.LIMIT
+) -> typing.Any:
+    """
+    Make a statement to select zip codes have the addresses contain all of
+    the words in ``query``, in kanji, kana or roman, ranked by relevance.
+
+    Words of three or more characters are matched with the full-text search
+    index, and shorter ones are matched by scanning the index as the trigram
+    tokenizer cannot match them.
+
+    :raises: ValueError if ``query`` has no words
+    """
+    words = get_words(query)
+
+    fts = models.ADDRESS_FTS
+    ltable = models.ZipcodeLookup
+    stmt = sqlalchemy.select(ltable).join(
+        fts, fts.c.zipcode == ltable.zipcode
+    )
+
+    phrases = [_quote(word) for word in words if len(word) >= 3]
+    if phrases:
+        stmt = stmt.where(fts.c.text.match(" ".join(phrases))).order_by(
+            fts.c.rank
+        )
+
+    for word in words:
+        if len(word) < 3:
+            stmt = stmt.where(sqlalchemy.func.instr(fts.c.text, word) > 0)
+
+    stmt = stmt.order_by(ltable.zipcode)
+    return stmt.limit(limit) if limit > 0 else stmt
+
+
+def get_query_trigrams(query: str) -> set[str]:
+    """Get the trigrams of the words in ``query``.
+
+    :raises: ValueError if ``query`` has no words
+    """
+    return set().union(*(utils.get_trigrams(w) for w in get_words(query)))
+
+
+def get_fuzzy_limit(limit: int) -> int:
+    """
+    Get the limit of results of fuzzy searches; candidates are ranked in
+    Python, so these are never unlimited and ``limit`` not in the range
+    [1, constants.MAX_LIMIT] is constants.MAX_LIMIT.
+    """
+    return limit if 0 < limit <= constants.MAX_LIMIT else constants.MAX_LIMIT
+
+
+def select_zipcodes_by_address_fuzzily(
+    query: str, limit: int = constants.LIMIT
+) -> typing.Any:
+    """
+    Make a statement to select candidates of zip codes and the texts of the
+    addresses have any of the trigrams of the words in ``query``, ranked by
+    relevance, to find addresses even if ``query`` has typos.
+
+    :param limit: See :func:`get_fuzzy_limit`
+    :raises: ValueError if ``query`` has no words of three or more characters
+    """
+    trigrams = get_query_trigrams(query)
+    if not trigrams:
+        raise ValueError(f"No words to search fuzzily: {query!r}")
+
+    fts = models.ADDRESS_FTS
+    ltable = models.ZipcodeLookup
+    stmt = sqlalchemy.select(ltable, fts.c.text).join(
+        fts, fts.c.zipcode == ltable.zipcode
+    ).where(
+        fts.c.text.match(" OR ".join(_quote(t) for t in sorted(trigrams)))
+    ).order_by(fts.c.rank, ltable.zipcode)
+
+    return stmt.limit(get_fuzzy_limit(limit) * constants.FUZZY_CANDIDATES)
+
+
+def rank_by_similarity(
+    rows: typing.Iterable[typing.Any], query: str,
+    limit: int = constants.LIMIT
+) -> list[models.ZipcodeLookup]:
+    """
+    Rank candidates, rows of zip code and the text of the address, by the
+    ratio of the trigrams of the words in ``query`` found in the addresses,
+    and drop ones less similar than constants.FUZZY_THRESHOLD.
+
+    :param limit: See :func:`get_fuzzy_limit`
+    """
+    trigrams = get_query_trigrams(query)
+    scored = []
+    for idx, (zipcode, text) in enumerate(rows):
+        score = len(trigrams & utils.get_trigrams(text)) / len(trigrams)
+        if score >= constants.FUZZY_THRESHOLD:
+            scored.append((-score, idx, zipcode))
+
+    res = [zipcode for (_score, _idx, zipcode) in sorted(scored)]
+    return res[:get_fuzzy_limit(limit)]
+
+
+def search_zipcodes_by_address(
+    dbs: Session, query: str, limit: int = constants.LIMIT,
+    fuzzy: bool = False
+) -> list[models.ZipcodeLookup]:
+    """Get model instances of zip code by (partial) address.
+
+    :param fuzzy:
+        Find addresses similar to ``query`` even if it has typos if True, or
+        addresses contain all of the words only if ``query`` is too short
+    :raises: ValueError, sqlalchemy.exc.OperationalError if the full-text
+        search index is not available
+    """
+    if fuzzy and get_query_trigrams(query):
+        rows = dbs.execute(
+            select_zipcodes_by_address_fuzzily(query, limit=limit)
+        )
+        return rank_by_similarity(rows, query, limit=limit)
+
+    return list(dbs.scalars(select_zipcodes_by_address(query, limit=limit)))
+
+
+async def search_zipcodes_by_address_async(
+    adbs: AsyncSession, query: str, limit: int = constants.LIMIT,
+    fuzzy: bool = False
+) -> list[models.ZipcodeLookup]:
+    """Get model instances of zip code by (partial) address asynchronously.
+
+    :raises: ValueError, sqlalchemy.exc.OperationalError
+    """
+    if fuzzy and get_query_trigrams(query):
+        rows = await adbs.execute(
+            select_zipcodes_by_address_fuzzily(query, limit=limit)
+        )
+        return rank_by_similarity(rows, query, limit=limit)
+
+    return list(
+        await adbs.scalars(select_zipcodes_by_address(query, limit=limit))
+    )
 
 
 def create_address(
@@ -36,18 +36,29 @@ CSV data:
     - <some numbers ...>
 """
 import collections
+import concurrent.futures
+import contextlib
 import csv
+import hashlib
+import io
 import itertools
+import json
 import logging
+import os
 import pathlib
+import shutil
 import time
 import typing
 import zipfile
 
 import anyconfig
 import requests
+import sqlalchemy
 
-from . import constants, db, models
+from . import (
+    constants, crud, dataset, db, models, profiling, records, snapshot, trie,
+    utils
+)
 
 
 LOG = logging.getLogger(__name__)
@@ -79,6 +90,15 @@ ROW_KEYS_SET: tuple[tuple[str, ...], ...] = (
     KANA_ROW_KEYS
 )
 
+ADDRESS_KEYS: tuple[str, ...] = ("pref", "city_ward", "house_numbers")
+
+# Address models and the prefixes of the keys of zip code data for them.
+ADDRESS_MODEL_KEY_PREFIXES: tuple[tuple[typing.Any, str], ...] = (
+    (models.Address, ""),
+    (models.KanaAddress, "kana_"),
+    (models.RomanAddress, "roman_"),
+)
+
 
 def backup_if_it_exists(
     filepath: pathlib.Path,
@@ -88,28 +108,193 @@ def backup_if_it_exists(
     Backup the file if it exists.
     """
     if filepath.exists():
-        if suffix is None or not suffix:
-            suffix = f"{str(time.time()).replace('.', '_')}"
+        filepath.rename(get_backup_path(filepath, suffix))
+
+
+def get_backup_path(
+    filepath: pathlib.Path,
+    suffix: typing.Optional[str] = None
+) -> pathlib.Path:
+    """
+    Get the path of the backup of the file.
+    """
+    if suffix is None or not suffix:
+        suffix = f"{str(time.time()).replace('.', '_')}"
+
+    return pathlib.Path(f"{filepath!s}.{suffix}")
+
+
+def replace_file(srcpath: pathlib.Path, dstpath: pathlib.Path):
+    """
+    Replace the file ``dstpath`` with ``srcpath`` atomically and keep the
+    backup of the old one without moving it away, so that there is no time
+    ``dstpath`` does not exist and readers of it are not disturbed.
+    """
+    if dstpath.exists():
+        bpath = get_backup_path(dstpath)
+        try:
+            os.link(dstpath, bpath)
+        except OSError:
+            shutil.copy2(dstpath, bpath)
+
+    os.replace(srcpath, dstpath)
+
+
+@contextlib.contextmanager
+def make_database_atomically(
+    outpath: pathlib.Path,
+    profiler: typing.Optional[profiling.Profiler] = None
+) -> typing.Iterator[sqlalchemy.engine.Engine]:
+    """
+    Make a database in a temporary file and replace the database file
+    ``outpath`` with it atomically only if it was made successfully.
+
+    The trie of zip codes is made from the temporary file before it replaces
+    the database file, so that the trie is ready when it's swapped in.
+
+    :param profiler: Measure the stage to make the trie with it if given
+    """
+    if not outpath.parent.exists():
+        outpath.parent.mkdir(parents=True)
+
+    tmppath = utils.get_temporary_path(outpath)
+    if tmppath.exists():
+        tmppath.unlink()
+
+    engine = db.get_engine(tmppath)
+    try:
+        db.init(engine)
+        yield engine
+        engine.dispose()
+        with profiling.stage(profiler, "trie") as stage:
+            stage.rows = save_db_as_trie(tmppath, trie.get_path(outpath))
+        replace_file(tmppath, outpath)
+    finally:
+        engine.dispose()
+        if tmppath.exists():
+            tmppath.unlink()
+
+
+def get_validators_path(filepath: pathlib.Path) -> pathlib.Path:
+    """
+    Get the path of the file to save the validators, ETag and Last-Modified
+    of the file downloaded.
+    """
+    return filepath.with_name(f"{filepath.name}.validators.json")
+
+
+def load_validators(filepath: pathlib.Path) -> dict[str, str]:
+    """Load the validators of the file downloaded.
+    """
+    vpath = get_validators_path(filepath)
+    if not filepath.exists() or not vpath.exists():
+        return {}
+
+    try:
+        return json.loads(vpath.read_text())
+    except ValueError:
+        return {}
+
+
+def save_validators(filepath: pathlib.Path, resp: requests.Response):
+    """Save the validators of the file downloaded from the response.
+    """
+    validators = {
+        key: resp.headers[key] for key in constants.HTTP_VALIDATORS
+        if key in resp.headers
+    }
+    get_validators_path(filepath).write_text(json.dumps(validators))
+
+
+def get_conditional_headers(
+    opath: pathlib.Path, ppath: pathlib.Path
+) -> dict[str, str]:
+    """
+    Get the headers to download the file ``opath`` only if it was modified,
+    and to resume the download from the end of the partial file ``ppath``.
+    """
+    headers = {}
+    validators = load_validators(opath)
+    if "ETag" in validators:
+        headers["If-None-Match"] = validators["ETag"]
+    if "Last-Modified" in validators:
+        headers["If-Modified-Since"] = validators["Last-Modified"]
+
+    offset = ppath.stat().st_size if ppath.exists() else 0
+    pvalidators = load_validators(ppath)
+    if offset and pvalidators:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = pvalidators.get(
+            "ETag", pvalidators.get("Last-Modified", "")
+        )
 
-        filepath.rename(f"{filepath!s}.{suffix}")
+    return headers
 
 
 def download_file_from_url(
     url: str,
     outdir: pathlib.Path,
     outname: str,
+    chunk_size: int = constants.DOWNLOAD_CHUNK_SIZE,
     **req_options
-):
-    """Download the file of the url.
+) -> bool:
+    """
+    Download the file of the url if it was changed since the last download,
+    and return True if it was downloaded.
+
+    The response is saved in chunks into a partial file, ``outname`` +
+    '.part', and the download is resumed from the end of it next time if it
+    was interrupted, or restarted if the range to resume is not satisfiable.
     """
-    resp = requests.get(url, **req_options)
-    if resp.ok:
+    opath = outdir / outname
+    ppath = outdir / f"{outname}.part"
+
+    req_headers = req_options.pop("headers", None)
+    headers = dict(req_headers or {})
+    headers.update(get_conditional_headers(opath, ppath))
+
+    with requests.get(url, headers=headers, stream=True,
+                      **req_options) as resp:
+        if resp.status_code == requests.codes.not_modified:
+            LOG.info("Not modified: %s", url)
+            return False
+
+        if resp.status_code == requests.codes.range_not_satisfiable and \
+                "Range" in headers:
+            # e.g. The partial file was complete but not renamed.
+            LOG.warning("Restart to download: %s", url)
+            resp.close()
+            for path in (ppath, get_validators_path(ppath)):
+                if path.exists():
+                    path.unlink()
+
+            return download_file_from_url(
+                url, outdir, outname, chunk_size=chunk_size,
+                headers=req_headers, **req_options
+            )
+
+        if not resp.ok:
+            LOG.error("Failed to download: %s, %d", url, resp.status_code)
+            return False
+
         if not outdir.exists():
             outdir.mkdir(parents=True)
 
-        opath = outdir / outname
-        backup_if_it_exists(opath)
-        opath.write_bytes(resp.content)
+        if resp.status_code == requests.codes.partial_content:
+            LOG.info("Resume to download (%s): %s", headers["Range"], url)
+            mode = "ab"
+        else:
+            mode = "wb"
+            save_validators(ppath, resp)
+
+        with ppath.open(mode=mode) as bfd:
+            for chunk in resp.iter_content(chunk_size=chunk_size):
+                bfd.write(chunk)
+
+    replace_file(ppath, opath)
+    get_validators_path(ppath).rename(get_validators_path(opath))
+
+    return True
 
 
 def download_zipcode_zip_files(
@@ -117,11 +302,21 @@ def download_zipcode_zip_files(
     zip_urls: tuple[str, ...] = constants.ZIPCODE_ZIP_FILE_URLS,
     zip_filenames: tuple[str, ...] = constants.ZIPCODE_ZIP_FILENAMES,
     **req_options
-):
-    """Download zipcode zip files.
+) -> list[bool]:
     """
-    for url, filename in zip(zip_urls, zip_filenames):
-        download_file_from_url(url, outdir, filename, **req_options)
+    Download zipcode zip files concurrently, and return a list of flags if
+    each file was downloaded or skipped as it was not modified.
+    """
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(zip_urls) or None
+    ) as executor:
+        futures = [
+            executor.submit(
+                download_file_from_url, url, outdir, filename, **req_options
+            )
+            for url, filename in zip(zip_urls, zip_filenames)
+        ]
+        return [future.result() for future in futures]
 
 
 def extract_file_from_zip_file(
@@ -155,65 +350,260 @@ def parse_roman_or_kana_data(
         return default
 
 
+@contextlib.contextmanager
+def open_file(
+    filepath: pathlib.Path,
+    zip_filepath: typing.Optional[pathlib.Path] = None
+) -> typing.Iterator[typing.IO[bytes]]:
+    """
+    Open a file, or a file ``filepath`` in the zip file ``zip_filepath``
+    without extracting it if ``zip_filepath`` is given, in binary mode.
+
+    :raiess: FileNotFoundError, KeyError, zipfile.BadZipFile
+    """
+    if zip_filepath is None:
+        with filepath.open(mode="rb") as bfd:
+            yield bfd
+    else:
+        with zipfile.ZipFile(zip_filepath) as zipf:
+            with zipf.open(str(filepath)) as bfd:
+                yield bfd
+
+
+@contextlib.contextmanager
+def open_csv_file(
+    filepath: pathlib.Path,
+    zip_filepath: typing.Optional[pathlib.Path] = None
+) -> typing.Iterator[typing.TextIO]:
+    """
+    Open a csv file, or a csv file ``filepath`` in the zip file
+    ``zip_filepath`` without extracting it if ``zip_filepath`` is given.
+
+    :raiess: FileNotFoundError, KeyError, zipfile.BadZipFile
+    """
+    with open_file(filepath, zip_filepath) as bfd:
+        # It decodes the data read from the file incrementally.
+        yield io.TextIOWrapper(
+            bfd, encoding=constants.CSV_ENCODING, newline=""
+        )
+
+
+def read_lines_in_chunks(
+    filepath: pathlib.Path,
+    zip_filepath: typing.Optional[pathlib.Path] = None,
+    size: int = constants.CHUNK_SIZE
+) -> typing.Iterator[list[bytes]]:
+    """
+    Read lines of a file without decoding them and yield lists of them have
+    ``size`` lines at most.
+    """
+    with open_file(filepath, zip_filepath) as bfd:
+        yield from utils.chunks(bfd, size)
+
+
+def parse_lines(
+    lines: list[bytes], keys: tuple[str, ...]
+) -> list[typing.Optional[dict]]:
+    """
+    Parse lines of zip code data in csv format.
+
+    .. note:: This is called in worker processes.
+    """
+    csvf = io.StringIO(
+        b"".join(lines).decode(constants.CSV_ENCODING), newline=""
+    )
+    return [parse_roman_or_kana_data(row, keys) for row in csv.reader(csvf)]
+
+
+def load_and_parse_in_parallel(
+    executor: concurrent.futures.Executor,
+    filepath: pathlib.Path, keys: tuple[str, ...],
+    zip_filepath: typing.Optional[pathlib.Path] = None,
+    chunk_size: int = constants.CHUNK_SIZE
+) -> typing.Iterator[typing.Optional[dict]]:
+    """
+    Load zip code data in csv format and parse chunks of them in parallel
+    with ``executor``, and yield parsed data in the original order.
+    """
+    pending: collections.deque = collections.deque()
+
+    for lines in read_lines_in_chunks(filepath, zip_filepath, chunk_size):
+        pending.append(executor.submit(parse_lines, lines, keys))
+        if len(pending) >= constants.MAX_PENDING_CHUNKS:
+            yield from pending.popleft().result()
+
+    while pending:
+        yield from pending.popleft().result()
+
+
 def load_and_parse(
-    filepath: pathlib.Path, keys: tuple[str, ...]
+    filepath: pathlib.Path, keys: tuple[str, ...],
+    zip_filepath: typing.Optional[pathlib.Path] = None,
+    executor: typing.Optional[concurrent.futures.Executor] = None
 ) -> typing.Iterator[typing.Optional[dict]]:
     """Load zip code data in csv format.
     """
-    with filepath.open(encoding='shift_jis') as csvf:
+    if executor is not None:
+        yield from load_and_parse_in_parallel(
+            executor, filepath, keys, zip_filepath
+        )
+        return
+
+    with open_csv_file(filepath, zip_filepath) as csvf:
         for row in csv.reader(csvf):
             yield parse_roman_or_kana_data(row, keys)
 
 
+@contextlib.contextmanager
+def get_executor(
+    workers: int = 1
+) -> typing.Iterator[typing.Optional[concurrent.futures.Executor]]:
+    """
+    Get an executor to parse data in ``workers`` processes, or None if
+    ``workers`` is 1. The number of CPUs is used if ``workers`` is 0.
+
+    :raises: ValueError if ``workers`` is negative
+    """
+    if workers < 0:
+        raise ValueError(
+            f"The number of workers must be 0 or more: {workers}"
+        )
+
+    if workers == 1:
+        yield None
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers or None
+        ) as executor:
+            yield executor
+
+
+def load_and_parse_file(
+    datadir: pathlib.Path, filename: str, keys: tuple[str, ...],
+    zip_filename: typing.Optional[str] = None,
+    executor: typing.Optional[concurrent.futures.Executor] = None
+) -> typing.Iterator[dict]:
+    """Load zip code data in csv format and yield valid data only.
+    """
+    if zip_filename is None:
+        (filepath, zip_filepath) = (datadir / filename, None)
+    else:
+        (filepath, zip_filepath) = (
+            pathlib.Path(filename), datadir / zip_filename
+        )
+
+    zdatas = load_and_parse(filepath, keys, zip_filepath, executor=executor)
+    for idx, zdata in enumerate(zdatas):
+        if zdata is None:
+            LOG.warning(
+                "Failed to load and parse the line #%d in the file %s",
+                idx, filename
+            )
+            continue
+
+        yield zdata
+
+
+def get_sources(
+    csv_filenames: tuple[str, ...],
+    zip_filenames: typing.Optional[tuple[str, ...]] = None
+) -> list[tuple[tuple[str, ...], str, typing.Optional[str]]]:
+    """
+    Get a list of tuples of the keys of data, csv filenames and the zip
+    filenames contain them if given.
+    """
+    if zip_filenames is None:
+        zip_filenames = (None, ) * len(csv_filenames)  # type: ignore
+
+    return list(
+        zip(ROW_KEYS_SET, csv_filenames, zip_filenames)  # type: ignore
+    )
+
+
 def load_from_files(
     datadir: pathlib.Path,
-    csv_filenames: tuple[str, ...] = constants.ZIPCODE_CSV_FILENAMES
-) -> list[dict[str, str]]:
-    """
-    Load and parse zip code data files in csv format and return parsed data.
+    csv_filenames: tuple[str, ...] = constants.ZIPCODE_CSV_FILENAMES,
+    zip_filenames: typing.Optional[tuple[str, ...]] = None,
+    workers: int = 1
+) -> list[records.Record]:
     """
-    # zipcode: <zipcode dict>
-    zipcodes: typing.OrderedDict[str, dict] = collections.OrderedDict()
+    Load and parse zip code data files in csv format and return parsed data
+    as records can be used as read-only dicts.
 
-    all_keys = set(itertools.chain(*ROW_KEYS_SET))
+    :param zip_filenames:
+        Load csv files from these zip files in ``datadir`` if given
+    :param workers:
+        The number of worker processes to parse data; data are parsed in this
+        process if it's 1 and the number of CPUs are used if it's 0
+    """
+    with get_executor(workers) as executor:
+        return _load_from_files(
+            datadir, csv_filenames, zip_filenames, executor=executor
+        )
 
-    for keys, filename in zip(ROW_KEYS_SET, csv_filenames):
-        filepath = datadir / filename
 
-        for idx, zdata in enumerate(load_and_parse(filepath, keys)):
-            if zdata is None:
-                LOG.warning(
-                    "Failed to load and parse the line #%d in the file %s",
-                    idx, filename
-                )
-                continue
+def _load_from_files(
+    datadir: pathlib.Path,
+    csv_filenames: tuple[str, ...],
+    zip_filenames: typing.Optional[tuple[str, ...]] = None,
+    executor: typing.Optional[concurrent.futures.Executor] = None
+) -> list[records.Record]:
+    """Merge zip code data by zip code in the order of sources.
+    """
+    # zipcode: <zipcode record>
+    zipcodes: dict[str, records.Record] = {}
 
+    for keys, filename, zfname in get_sources(csv_filenames, zip_filenames):
+        for zdata in load_and_parse_file(
+            datadir, filename, keys, zfname, executor=executor
+        ):
             zipcode = zdata["zipcode"]
 
             if zipcode in zipcodes:
-                zipcodes[zipcode].update(**zdata)
+                zipcodes[zipcode].update(zdata)
             else:
-                # For cases corresponding another data is missing.
-                for key in all_keys:
-                    if key not in zdata:
-                        zdata[key] = ""
-
-                zipcodes[zipcode] = zdata
+                # Values of another data missing are "" in records.
+                zipcodes[zipcode] = records.Record(zdata)
 
     return list(zipcodes.values())
 
 
+def dump_as_json(
+    zipcodes: typing.Iterable[typing.Mapping[str, str]],
+    outpath: pathlib.Path
+):
+    """
+    Dump zip code data as a json file, a list of them, one by one.
+    """
+    with outpath.open(mode="w") as out:
+        out.write("[")
+        for idx, zdata in enumerate(zipcodes):
+            if idx:
+                out.write(", ")
+            json.dump(dict(zdata), out)
+        out.write("]")
+
+
 def load_and_save_as_json(
     datadir: pathlib.Path,
     outdir: pathlib.Path,
     csv_filenames: tuple[str, ...] = constants.ZIPCODE_CSV_FILENAMES,
-    outname: str = constants.JSON_FILENAME
+    outname: str = constants.JSON_FILENAME,
+    zip_filenames: typing.Optional[tuple[str, ...]] = None,
+    workers: int = 1,
+    profiler: typing.Optional[profiling.Profiler] = None
 ):
     """
     Load and parse zip code data files in csv format and dump parsed data to a
     json file.
+
+    :param profiler: Measure each stage with it if given
     """
-    res = load_from_files(datadir, csv_filenames)
+    with profiling.stage(profiler, "parse") as stage:
+        res = load_from_files(
+            datadir, csv_filenames, zip_filenames, workers=workers
+        )
+        stage.rows = len(res)
 
     if res:
         opath = outdir / outname
@@ -222,20 +612,447 @@ def load_and_save_as_json(
             outdir.mkdir(parents=True)
 
         backup_if_it_exists(opath)
-        anyconfig.dump(res, opath)  # type: ignore
+        with profiling.stage(profiler, "dump_json") as stage:
+            dump_as_json(res, opath)
+            stage.rows = len(res)
     else:
         LOG.error("Failed to get data from %s and %s", *csv_filenames)
 
 
+def make_rows_from_zipcode_data(
+    zid: int, zdata: typing.Mapping[str, str],
+    municipality_id: typing.Optional[int] = None
+) -> dict[str, dict[str, typing.Any]]:
+    """
+    Make rows of the tables, keyed by table names, from a zip code data.
+
+    The id ``zid`` is assigned up front to the rows of all tables so that
+    these can be inserted in bulk without refreshing ORM objects.
+
+    :param municipality_id:
+        The id of the municipality to refer pref and city_ward from instead
+        of keeping them in the rows if it's given
+    """
+    rows: dict[str, dict[str, typing.Any]] = {
+        models.Zipcode.__tablename__: dict(
+            id=zid, zipcode=zdata["zipcode"], address_id=zid
+        )
+    }
+    for model, prefix in ADDRESS_MODEL_KEY_PREFIXES:
+        row: dict[str, typing.Any] = {
+            key: zdata[f"{prefix}{key}"] for key in ADDRESS_KEYS
+        }
+        if municipality_id is not None:
+            row.update(pref=None, city_ward=None)
+
+        row["id"] = zid
+        if model is models.Address:
+            row["municipality_id"] = municipality_id
+        else:
+            row["address_id"] = zid
+
+        rows[model.__tablename__] = row
+
+    return rows
+
+
+class Dimensions:
+    """
+    Prefectures and municipalities to normalize addresses, with ids assigned
+    up front, and the rows of new ones to insert.
+    """
+    def __init__(self, conn: sqlalchemy.engine.Connection):
+        (ptable, mtable) = (
+            models.Prefecture.__table__, models.Municipality.__table__
+        )
+        self.prefectures: dict[tuple[str, ...], int] = {
+            tuple(row[1:]): row[0] for row in conn.execute(
+                sqlalchemy.select(
+                    ptable.c.id, *(ptable.c[k] for k in self.PREF_KEYS)
+                )
+            )
+        }
+        self.municipalities: dict[tuple[typing.Any, ...], int] = {
+            tuple(row[1:]): row[0] for row in conn.execute(
+                sqlalchemy.select(
+                    mtable.c.id, mtable.c.prefecture_id,
+                    *(mtable.c[k] for k in self.CITY_WARD_KEYS)
+                )
+            )
+        }
+        self.pending: dict[str, list[dict[str, typing.Any]]] = {
+            ptable.name: [], mtable.name: []
+        }
+
+    PREF_KEYS: tuple[str, ...] = ("pref", "kana_pref", "roman_pref")
+    CITY_WARD_KEYS: tuple[str, ...] = (
+        "city_ward", "kana_city_ward", "roman_city_ward"
+    )
+
+    @staticmethod
+    def are_used(conn: sqlalchemy.engine.Connection) -> bool:
+        """Test if the database is normalized.
+        """
+        return bool(
+            conn.execute(
+                sqlalchemy.select(models.Municipality.__table__.c.id)
+            ).first()
+        )
+
+    def get_municipality_id(self, zdata: typing.Mapping[str, str]) -> int:
+        """
+        Get the id of the municipality of the zip code data, assigned newly if
+        it's not found.
+        """
+        pkey = tuple(zdata[k] for k in self.PREF_KEYS)
+        pid = self.prefectures.get(pkey)
+        if pid is None:
+            pid = self.prefectures[pkey] = max(
+                self.prefectures.values(), default=0
+            ) + 1
+            self.pending[models.Prefecture.__tablename__].append(
+                dict(zip(self.PREF_KEYS, pkey), id=pid)
+            )
+
+        mkey = (pid, *(zdata[k] for k in self.CITY_WARD_KEYS))
+        mid = self.municipalities.get(mkey)
+        if mid is None:
+            mid = self.municipalities[mkey] = max(
+                self.municipalities.values(), default=0
+            ) + 1
+            self.pending[models.Municipality.__tablename__].append(
+                dict(zip(self.CITY_WARD_KEYS, mkey[1:]), id=mid,
+                     prefecture_id=pid)
+            )
+
+        return mid
+
+    def flush(self, conn: sqlalchemy.engine.Connection):
+        """Insert the rows of new prefectures and municipalities.
+        """
+        for model in (models.Prefecture, models.Municipality):
+            rows = self.pending[model.__tablename__]
+            if rows:
+                conn.execute(
+                    sqlalchemy.insert(model.__table__),
+                    rows
+                )
+                rows.clear()
+
+
+def make_rows_from_zipcode_data_list(
+    start: int, zipcodes: typing.Sequence[typing.Mapping[str, str]],
+    dims: typing.Optional[Dimensions] = None
+) -> list[dict[str, dict[str, typing.Any]]]:
+    """
+    Make rows of the tables from zip code data with ids assigned from
+    ``start``, and normalize them if ``dims`` is given.
+    """
+    return [
+        make_rows_from_zipcode_data(
+            zid, zdata,
+            None if dims is None else dims.get_municipality_id(zdata)
+        )
+        for zid, zdata in enumerate(zipcodes, start=start)
+    ]
+
+
+def get_tables() -> list[sqlalchemy.Table]:
+    """Get the tables to save zip code data in the order to insert rows.
+    """
+    return [
+        model.__table__ for model, _prefix in ADDRESS_MODEL_KEY_PREFIXES
+    ] + [models.Zipcode.__table__]
+
+
+def get_next_id(conn: sqlalchemy.engine.Connection) -> int:
+    """Get the next id to assign to the rows of the tables.
+    """
+    return max(
+        conn.execute(
+            sqlalchemy.select(sqlalchemy.func.max(table.c.id))
+        ).scalar() or 0
+        for table in get_tables()
+    ) + 1
+
+
+def refresh_lookup_table(
+    conn: sqlalchemy.engine.Connection,
+    zipcodes: typing.Optional[typing.Collection[str]] = None
+) -> int:
+    """
+    Materialize zip code data into the flat lookup table, all of them or only
+    the zip codes ``zipcodes`` given, and return the number of rows inserted.
+    """
+    if zipcodes is not None and len(zipcodes) > constants.BATCH_QUERY_SIZE:
+        return sum(
+            refresh_lookup_table(conn, chunk) for chunk
+            in utils.chunks(zipcodes, constants.BATCH_QUERY_SIZE)
+        )
+
+    table = models.ZipcodeLookup.__table__
+    select = crud.select_zipcode_data().order_by(None)
+    delete = sqlalchemy.delete(table)
+    if zipcodes is not None:
+        select = select.where(
+            models.Zipcode.__table__.c.zipcode.in_(zipcodes)
+        )
+        delete = delete.where(table.c.zipcode.in_(zipcodes))
+
+    conn.execute(delete)
+    res = conn.execute(
+        sqlalchemy.insert(table).from_select(
+            [col.name for col in select.selected_columns], select
+        )
+    )
+    refresh_address_index(conn, zipcodes)
+
+    return res.rowcount
+
+
+def is_lookup_table_filled(conn: sqlalchemy.engine.Connection) -> bool:
+    """
+    Test if the lookup table and the full-text search index if it's
+    available were filled, not made newly for databases made before these
+    were added.
+    """
+    for table in (models.ZipcodeLookup.__table__, models.ADDRESS_FTS):
+        if not sqlalchemy.inspect(conn).has_table(table.name):
+            continue
+
+        if conn.execute(
+            sqlalchemy.select(table.c.zipcode).limit(1)
+        ).first() is None:
+            return False
+
+    return True
+
+
+def make_address_text(zdata: typing.Mapping[str, typing.Any]) -> str:
+    """
+    Make the text of the address in kanji, kana and roman of zip code data
+    normalized with utils.normalize_text, to search zip codes by it.
+
+    Addresses are normalized here once on ingest so that only queries need
+    to be normalized on search.
+    """
+    return " ".join(
+        utils.normalize_text(
+            "".join(zdata[f"{prefix}{key}"] or "" for key in ADDRESS_KEYS)
+        )
+        for prefix in ("", "kana_", "roman_")
+    )
+
+
+def refresh_address_index(
+    conn: sqlalchemy.engine.Connection,
+    zipcodes: typing.Optional[typing.Collection[str]] = None,
+    batch_size: int = constants.BATCH_SIZE
+):
+    """
+    Make the full-text search index of addresses from the lookup table, all
+    of them or only the zip codes ``zipcodes`` given, if it's available.
+    """
+    fts = models.ADDRESS_FTS
+    if not sqlalchemy.inspect(conn).has_table(fts.name):
+        return
+
+    if zipcodes is not None and len(zipcodes) > constants.BATCH_QUERY_SIZE:
+        for chunk in utils.chunks(zipcodes, constants.BATCH_QUERY_SIZE):
+            refresh_address_index(conn, chunk, batch_size=batch_size)
+        return
+
+    table = models.ZipcodeLookup.__table__
+    select = sqlalchemy.select(table)
+    delete = sqlalchemy.delete(fts)
+    if zipcodes is not None:
+        select = select.where(table.c.zipcode.in_(zipcodes))
+        delete = delete.where(fts.c.zipcode.in_(zipcodes))
+
+    conn.execute(delete)
+    rows = conn.execute(select).mappings()
+    for batch in utils.chunks(rows, batch_size):
+        conn.execute(
+            sqlalchemy.insert(fts),
+            [dict(zipcode=zdata["zipcode"], text=make_address_text(zdata))
+             for zdata in batch]
+        )
+
+
+def save_zipcodes_as_db(
+    zipcodes: typing.Iterable[typing.Mapping[str, str]],
+    outpath: pathlib.Path,
+    batch_size: int = constants.BATCH_SIZE,
+    normalize: bool = False,
+    source_hash: typing.Optional[str] = None,
+    profiler: typing.Optional[profiling.Profiler] = None
+) -> int:
+    """
+    Save zip code data as a database file in a transaction and return the
+    number of zip codes saved.
+
+    :param normalize:
+        Save prefectures and municipalities once in their own tables and
+        refer them from addresses if True
+    :param source_hash:
+        Stamp the database with it as the version of the dataset in the same
+        transaction if given, see :func:`get_source_hash`
+    :param profiler:
+        Measure the stages to insert zip code data, to refresh the lookup
+        table and the full text search index, and to make the trie with it
+        if given
+    """
+    count = 0
+    start = time.monotonic()
+
+    with make_database_atomically(outpath, profiler=profiler) as engine:
+        with engine.begin() as conn:
+            dims = Dimensions(conn) if normalize else None
+            with profiling.stage(profiler, "insert") as stage:
+                for batch in utils.chunks(zipcodes, batch_size):
+                    rows = make_rows_from_zipcode_data_list(
+                        count + 1, batch, dims
+                    )
+                    if dims is not None:
+                        dims.flush(conn)
+
+                    for table in get_tables():
+                        conn.execute(
+                            sqlalchemy.insert(table),
+                            [row[table.name] for row in rows]
+                        )
+                    count += len(rows)
+                stage.rows = count
+
+            with profiling.stage(profiler, "refresh_lookup") as stage:
+                stage.rows = refresh_lookup_table(conn)
+            if source_hash is not None:
+                stamp_dataset_version(conn, source_hash)
+
+    elapsed = time.monotonic() - start
+    LOG.info(
+        "Saved %d zip codes in %.2f secs (%.1f rows/sec)",
+        count, elapsed, count / elapsed if elapsed else float(count)
+    )
+    return count
+
+
+def get_source_hash(
+    filepaths: typing.Iterable[pathlib.Path],
+    base: typing.Optional[str] = None
+) -> str:
+    """
+    Get the SHA-256 hash of the names and the contents of the source files
+    exist, following ``base``, the hash of the sources of the database
+    updated with them, if it's given.
+    """
+    hsh = hashlib.sha256()
+    if base:
+        hsh.update(base.encode("ascii"))
+
+    for fpath in filepaths:
+        if not fpath.exists():
+            continue
+
+        hsh.update(fpath.name.encode("utf-8"))
+        with fpath.open(mode="rb") as bfd:
+            for data in iter(lambda: bfd.read(1024 * 1024), b""):
+                hsh.update(data)
+
+    return hsh.hexdigest()
+
+
+def stamp_dataset_version(
+    conn: sqlalchemy.engine.Connection, source_hash: str,
+    built_at: typing.Optional[int] = None
+):
+    """Stamp the database with the version of the dataset.
+    """
+    table = models.DatasetVersion.__table__
+    conn.execute(sqlalchemy.delete(table))
+    conn.execute(
+        sqlalchemy.insert(table).values(
+            id=1, source_hash=source_hash,
+            built_at=int(time.time()) if built_at is None else built_at
+        )
+    )
+
+
+def save_db_as_snapshot(
+    db_path: pathlib.Path,
+    outpath: typing.Optional[pathlib.Path] = None
+) -> int:
+    """
+    Save zip code data in the database as a snapshot file to look up them
+    with mmap with the version of the dataset, and return the number of zip
+    codes saved.
+    """
+    if outpath is None:
+        outpath = snapshot.get_path(db_path)
+
+    engine = db.get_engine(db_path)
+    try:
+        with engine.connect() as conn:
+            version = dataset.get_dataset_version(conn)
+            rows = conn.execute(crud.select_zipcode_data())
+            return snapshot.save(
+                (row._mapping for row in rows), outpath, version=version
+            )
+    finally:
+        engine.dispose()
+
+
+def save_db_as_trie(
+    db_path: pathlib.Path,
+    outpath: typing.Optional[pathlib.Path] = None
+) -> int:
+    """
+    Save zip codes in the database as a trie file to count them by prefixes,
+    and return the number of zip codes saved.
+    """
+    if outpath is None:
+        outpath = trie.get_path(db_path)
+
+    engine = db.get_engine(db_path)
+    try:
+        with engine.connect() as conn:
+            return save_trie(conn, outpath)
+    finally:
+        engine.dispose()
+
+
+def save_trie(
+    conn: sqlalchemy.engine.Connection, outpath: pathlib.Path
+) -> int:
+    """
+    Save zip codes in the database as a trie file tagged with the version of
+    the dataset, and return the number of zip codes saved.
+    """
+    version = dataset.get_dataset_version(conn)
+    rows = conn.execute(
+        sqlalchemy.select(models.Zipcode.__table__.c.zipcode)
+    )
+    return trie.save(
+        (row[0] for row in rows), outpath,
+        tag="" if version is None else version.etag
+    )
+
+
 def load_json_and_save_as_db(
     datadir: pathlib.Path,
     outdir: pathlib.Path,
     filename: str = constants.JSON_FILENAME,
     outname: str = constants.DATABASE_FILENAME,
+    normalize: bool = False,
+    profiler: typing.Optional[profiling.Profiler] = None,
+    source_hash: typing.Optional[str] = None
 ):
     """
     Load zip code parsed data in a json file and dump its data as a database
     file.
+
+    :param profiler: Measure each stage with it if given
+    :param source_hash: See :func:`save_zipcodes_as_db`
     """
     filepath = datadir / filename
     outpath = outdir / outname
@@ -249,48 +1066,429 @@ def load_json_and_save_as_db(
             LOG.error("No data: %s", str(filepath))
             return
 
-    if not outdir.exists():
-        outdir.mkdir(parents=True)
+    with profiling.stage(profiler, "load_json") as stage:
+        zipcodes = typing.cast(
+            list[dict[str, str]], anyconfig.load(filepath)
+        )
+        stage.rows = len(zipcodes)
+
+    save_zipcodes_as_db(
+        zipcodes, outpath, normalize=normalize, source_hash=source_hash,
+        profiler=profiler
+    )
+
+
+def merge_zipcode_data_into_db(
+    conn: sqlalchemy.engine.Connection,
+    zipcodes: list[dict[str, str]],
+    dims: typing.Optional[Dimensions] = None
+) -> tuple[int, int]:
+    """
+    Merge a batch of zip code data into the database in the same way as
+    :func:`load_from_files` does, and return the numbers of zip codes
+    inserted and updated.
+
+    :param dims: Normalize zip code data with it if given
+    """
+    merged: typing.OrderedDict[str, dict] = collections.OrderedDict()
+    for zdata in zipcodes:
+        merged.setdefault(zdata["zipcode"], {}).update(zdata)
+
+    ztable = models.Zipcode.__table__
+    existings = {
+        row.zipcode: dict(row._mapping)
+        for chunk in utils.chunks(merged, constants.BATCH_QUERY_SIZE)
+        for row in conn.execute(
+            crud.select_zipcode_data().where(ztable.c.zipcode.in_(chunk))
+        )
+    }
+
+    news = [
+        records.Record(zdata) for zc, zdata in merged.items()
+        if zc not in existings
+    ]
+    if news:
+        rows = make_rows_from_zipcode_data_list(
+            get_next_id(conn), news, dims
+        )
+        if dims is not None:
+            dims.flush(conn)
+
+        for table in get_tables():
+            conn.execute(
+                sqlalchemy.insert(table),
+                [row[table.name] for row in rows]
+            )
 
-    backup_if_it_exists(outpath)
+    # Update all of the columns of the rows with the current data merged.
+    updates = [
+        (existings[zc]["address_id"], dict(existings[zc], **zdata))
+        for zc, zdata in merged.items() if zc in existings
+    ]
+    if updates:
+        rows = [
+            make_rows_from_zipcode_data(
+                aid, zdata,
+                None if dims is None else dims.get_municipality_id(zdata)
+            )
+            for aid, zdata in updates
+        ]
+        if dims is not None:
+            dims.flush(conn)
 
-    with db.get_session_ctx(outpath) as dbs_ctx:
-        for zdata in anyconfig.load(filepath):
-            addr = models.Address(
-                pref=zdata['pref'],
-                city_ward=zdata['city_ward'],
-                house_numbers=zdata['house_numbers']
+        for model, _prefix in ADDRESS_MODEL_KEY_PREFIXES:
+            table = model.__table__
+            idcol = (
+                table.c.id if model is models.Address
+                else table.c.address_id
             )
-            dbs_ctx.add(addr)
-            dbs_ctx.commit()
-            dbs_ctx.refresh(addr)
-
-            kana_addr = models.KanaAddress(
-                pref=zdata['kana_pref'],
-                city_ward=zdata['kana_city_ward'],
-                house_numbers=zdata['kana_house_numbers'],
-                address_id=addr.id
+            keys = [
+                key for key in rows[0][table.name]
+                if key not in ("id", "address_id")
+            ]
+            stmt = sqlalchemy.update(table).where(
+                idcol == sqlalchemy.bindparam("b_id")
+            ).values(
+                **{key: sqlalchemy.bindparam(f"b_{key}") for key in keys}
             )
-            dbs_ctx.add(kana_addr)
-            dbs_ctx.commit()
-            dbs_ctx.refresh(kana_addr)
-
-            roman_addr = models.KanaAddress(
-                pref=zdata['roman_pref'],
-                city_ward=zdata['roman_city_ward'],
-                house_numbers=zdata['roman_house_numbers'],
-                address_id=addr.id
+            conn.execute(
+                stmt,
+                [dict(b_id=aid,
+                      **{f"b_{key}": row[table.name][key] for key in keys})
+                 for (aid, _zdata), row in zip(updates, rows)]
             )
-            dbs_ctx.add(roman_addr)
-            dbs_ctx.commit()
-            dbs_ctx.refresh(roman_addr)
 
-            zipcode = models.Zipcode(
-                zipcode=zdata['zipcode'],
-                address_id=addr.id
+    return (len(news), len(updates))
+
+
+def stream_and_save_as_db(
+    datadir: pathlib.Path,
+    outdir: pathlib.Path,
+    csv_filenames: tuple[str, ...] = constants.ZIPCODE_CSV_FILENAMES,
+    outname: str = constants.DATABASE_FILENAME,
+    batch_size: int = constants.BATCH_SIZE,
+    zip_filenames: typing.Optional[tuple[str, ...]] = None,
+    workers: int = 1,
+    normalize: bool = False,
+    source_hash: typing.Optional[str] = None,
+    profiler: typing.Optional[profiling.Profiler] = None
+) -> int:
+    """
+    Load and parse zip code data files in csv format and save parsed data as
+    a database file in batches without keeping all of them in memory, and
+    return the number of zip codes saved.
+
+    :param normalize: See :func:`save_zipcodes_as_db`
+    :param source_hash: See :func:`save_zipcodes_as_db`
+    :param profiler:
+        Measure the stages to parse data and to insert them batch by batch,
+        and the others of :func:`save_zipcodes_as_db` with it if given. The
+        time to parse data is the time waited for them if they are parsed in
+        worker processes.
+    """
+    with get_executor(workers) as executor:
+        return _stream_and_save_as_db(
+            datadir, outdir, csv_filenames, outname, batch_size,
+            zip_filenames, executor=executor, normalize=normalize,
+            source_hash=source_hash, profiler=profiler
+        )
+
+
+def _stream_and_save_as_db(
+    datadir: pathlib.Path,
+    outdir: pathlib.Path,
+    csv_filenames: tuple[str, ...],
+    outname: str,
+    batch_size: int,
+    zip_filenames: typing.Optional[tuple[str, ...]] = None,
+    executor: typing.Optional[concurrent.futures.Executor] = None,
+    normalize: bool = False,
+    source_hash: typing.Optional[str] = None,
+    profiler: typing.Optional[profiling.Profiler] = None
+) -> int:
+    """Save zip code data into the database in batches.
+    """
+    batches = profiling.iterate(profiler, "parse", (
+        batch
+        for keys, filename, zfname in get_sources(csv_filenames, zip_filenames)
+        for batch in utils.chunks(
+            load_and_parse_file(
+                datadir, filename, keys, zfname, executor=executor
+            ),
+            batch_size
+        )
+    ))
+    first = next(batches, None)
+    if first is None:
+        LOG.error("Failed to get data from %s and %s", *csv_filenames)
+        return 0
+
+    count = 0
+    start = time.monotonic()
+
+    with make_database_atomically(
+        outdir / outname, profiler=profiler
+    ) as engine:
+        with engine.begin() as conn:
+            dims = Dimensions(conn) if normalize else None
+            for batch in itertools.chain([first], batches):
+                with profiling.stage(
+                    profiler, "insert", accumulate=True
+                ) as stage:
+                    (inserted, _updated) = merge_zipcode_data_into_db(
+                        conn, batch, dims
+                    )
+                    stage.rows = inserted
+                count += inserted
+
+            with profiling.stage(profiler, "refresh_lookup") as stage:
+                stage.rows = refresh_lookup_table(conn)
+            if source_hash is not None:
+                stamp_dataset_version(conn, source_hash)
+
+    elapsed = time.monotonic() - start
+    LOG.info(
+        "Saved %d zip codes in %.2f secs (%.1f rows/sec)",
+        count, elapsed, count / elapsed if elapsed else float(count)
+    )
+    return count
+
+
+def delete_zipcode_data_from_db(
+    conn: sqlalchemy.engine.Connection,
+    zipcodes: list[dict[str, str]]
+) -> int:
+    """
+    Delete zip code data from the database if their addresses match the ones
+    in the database, and return the number of zip codes deleted.
+
+    A zip code may have some rows in the source data but the database keeps
+    only the address of one of them, so that zip codes of which addresses
+    don't match are kept as the data deleted are of the other rows.
+    """
+    addresses: dict[str, set[tuple[str, ...]]] = collections.defaultdict(set)
+    for zdata in zipcodes:
+        addresses[zdata["zipcode"]].add(
+            tuple(zdata[key] for key in ADDRESS_KEYS)
+        )
+
+    ztable = models.Zipcode.__table__
+    aids = []
+    for chunk in utils.chunks(sorted(addresses), constants.BATCH_QUERY_SIZE):
+        for row in conn.execute(
+            crud.select_zipcode_data().where(ztable.c.zipcode.in_(chunk))
+        ).mappings():
+            if tuple(row[key] for key in ADDRESS_KEYS) in \
+                    addresses[row["zipcode"]]:
+                aids.append(row["address_id"])
+            else:
+                LOG.warning(
+                    "Keep %s as its address does not match", row["zipcode"]
+                )
+    if not aids:
+        return 0
+
+    for table in reversed(get_tables()):
+        idcol = (
+            table.c.id if table.name == models.Address.__tablename__
+            else table.c.address_id
+        )
+        for chunk in utils.chunks(aids, constants.BATCH_QUERY_SIZE):
+            conn.execute(
+                sqlalchemy.delete(table).where(idcol.in_(chunk))
             )
-            dbs_ctx.add(zipcode)
-            dbs_ctx.commit()
+
+    return len(aids)
+
+
+def get_delta_file_type(filepath: pathlib.Path) -> str:
+    """
+    Get the type of a delta file, 'add' or 'del', from its filename.
+
+    :raises: ValueError
+    """
+    for dtype in constants.DELTA_FILE_TYPES:
+        if filepath.name.lower().startswith(f"{dtype}_"):
+            return dtype
+
+    raise ValueError(f"Not a delta file: {filepath!s}")
+
+
+def get_delta_file_month(filepath: pathlib.Path) -> str:
+    """
+    Get the month of a delta file, 'YYMM', from its filename.
+
+    :raises: ValueError
+    """
+    dtype = get_delta_file_type(filepath)
+    return filepath.stem.lower()[len(dtype) + 1:]
+
+
+def sort_delta_files(
+    filepaths: typing.Iterable[pathlib.Path]
+) -> list[tuple[str, pathlib.Path]]:
+    """
+    Sort delta files by the months in their filenames, and deletions before
+    additions in the same month, and return the types and paths of them.
+
+    :raises: ValueError
+    """
+    deltas = [(get_delta_file_type(fpath), fpath) for fpath in filepaths]
+    return sorted(
+        deltas,
+        key=lambda delta: (get_delta_file_month(delta[1]), delta[0] != "del")
+    )
+
+
+def load_and_parse_delta_file(
+    filepath: pathlib.Path
+) -> typing.Iterator[dict]:
+    """
+    Load and parse a delta file in csv format, or a zip file contains it,
+    and yield valid data only.
+
+    :raiess: FileNotFoundError, KeyError, zipfile.BadZipFile
+    """
+    if zipfile.is_zipfile(filepath):
+        with zipfile.ZipFile(filepath) as zipf:
+            names = [
+                n for n in zipf.namelist() if n.lower().endswith(".csv")
+            ]
+        if not names:
+            raise KeyError(f"No csv files in the zip file: {filepath!s}")
+
+        yield from load_and_parse_file(
+            filepath.parent, names[0], KANA_ROW_KEYS, filepath.name
+        )
+    else:
+        yield from load_and_parse_file(
+            filepath.parent, filepath.name, KANA_ROW_KEYS
+        )
+
+
+def create_missing_indexes(engine: sqlalchemy.engine.Engine):
+    """
+    Create the indexes of the tables databases made before these were added
+    don't have, e.g. the ones of address_id of kana and roman addresses.
+    """
+    with engine.begin() as conn:
+        for table in db.Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def apply_delta_files_of_month(
+    conn: sqlalchemy.engine.Connection,
+    deltas: list[tuple[str, pathlib.Path]],
+    dims: typing.Optional[Dimensions] = None,
+    batch_size: int = constants.BATCH_SIZE,
+    refresh: bool = True
+) -> dict[str, int]:
+    """
+    Apply the delta files of the same month, and return the numbers of zip
+    codes added, updated and deleted.
+
+    Zip codes changed are in both of the del and the add files of the month,
+    and add files have kana data only, so that zip codes added again are
+    updated with the data in the add files to keep their roman data, and
+    only the rest of zip codes in the del files are deleted.
+
+    :param dims: Normalize zip code data with it if given
+    :param refresh: Refresh the lookup table of zip codes changed if True
+    """
+    stats = dict(added=0, updated=0, deleted=0)
+    dels = [
+        zdata for dtype, fpath in deltas if dtype == "del"
+        for zdata in load_and_parse_delta_file(fpath)
+    ]
+    readded: set[str] = set()
+
+    for dtype, fpath in deltas:
+        if dtype != "add":
+            continue
+
+        for batch in utils.chunks(load_and_parse_delta_file(fpath),
+                                  batch_size):
+            (added, updated) = merge_zipcode_data_into_db(conn, batch, dims)
+            stats["added"] += added
+            stats["updated"] += updated
+
+            zipcodes = {zdata["zipcode"] for zdata in batch}
+            readded.update(zipcodes)
+            if refresh:
+                refresh_lookup_table(conn, zipcodes)
+
+    gones = [zdata for zdata in dels if zdata["zipcode"] not in readded]
+    if gones:
+        stats["deleted"] = delete_zipcode_data_from_db(conn, gones)
+        if refresh:
+            refresh_lookup_table(conn, {zdata["zipcode"] for zdata in gones})
+
+    return stats
+
+
+def apply_delta_files(
+    db_path: pathlib.Path,
+    filepaths: typing.Iterable[pathlib.Path],
+    batch_size: int = constants.BATCH_SIZE
+) -> dict[str, int]:
+    """
+    Apply the monthly delta files, add_YYMM.zip and del_YYMM.zip for
+    example, to the database in a transaction month by month, see
+    :func:`apply_delta_files_of_month`, and return the numbers of zip codes
+    added, updated and deleted.
+
+    .. seealso:: https://www.post.japanpost.jp/zipcode/dl/kogaki-zip.html
+
+    :raiess: FileNotFoundError, ValueError, KeyError, zipfile.BadZipFile
+    """
+    if not db_path.exists():
+        raise FileNotFoundError(f"Not found: {db_path!s}")
+
+    deltas = sort_delta_files(filepaths)
+    stats = dict(added=0, updated=0, deleted=0)
+
+    engine = db.get_engine(db_path)
+    try:
+        # Databases made before the lookup table was added don't have it.
+        db.init(engine)
+        create_missing_indexes(engine)
+
+        with engine.begin() as conn:
+            dims = Dimensions(conn) if Dimensions.are_used(conn) else None
+            refresh_all = not is_lookup_table_filled(conn)
+            version = dataset.get_dataset_version(conn)
+
+            for _month, mdeltas in itertools.groupby(
+                deltas, key=lambda delta: get_delta_file_month(delta[1])
+            ):
+                mstats = apply_delta_files_of_month(
+                    conn, list(mdeltas), dims, batch_size,
+                    refresh=not refresh_all
+                )
+                for key, val in mstats.items():
+                    stats[key] += val
+
+            if refresh_all:
+                refresh_lookup_table(conn)
+
+            stamp_dataset_version(conn, get_source_hash(
+                [fpath for _dtype, fpath in deltas],
+                base=None if version is None else version.source_hash
+            ))
+            # The trie is replaced before the changes are committed, and
+            # it's not trusted until these are, as the tag does not match.
+            save_trie(conn, trie.get_path(db_path))
+    finally:
+        engine.dispose()
+
+    if snapshot.get_path(db_path).exists():
+        save_db_as_snapshot(db_path)
+
+    LOG.info(
+        "Applied the delta files to %s: %r", str(db_path), stats
+    )
+    return stats
 
 
 def make_database_from_zip_files(
@@ -299,14 +1497,71 @@ def make_database_from_zip_files(
     zip_filenames: tuple[str, ...] = constants.ZIPCODE_ZIP_FILENAMES,
     csv_filenames: tuple[str, ...] = constants.ZIPCODE_CSV_FILENAMES,
     outname: str = constants.DATABASE_FILENAME,
+    streaming: bool = False,
+    export_json: bool = False,
+    extract: bool = False,
+    workers: int = 1,
+    make_snapshot: bool = False,
+    normalize: bool = False,
+    profiler: typing.Optional[profiling.Profiler] = None
 ):
     """
     Load and parse zip code data files in csv format and return parsed data.
 
+    :param extract:
+        Extract csv files from zip files in ``datadir`` and load them if True,
+        or load csv files in zip files directly without extracting them
+    :param workers:
+        The number of worker processes to parse data, see
+        :func:`load_from_files`
+    :param make_snapshot:
+        Save data as a snapshot file also to look up them with mmap if True
+    :param streaming:
+        Save parsed data into the database in batches directly without
+        making an intermediate json file if True
+    :param export_json:
+        Export parsed data as a json file also if True in streaming mode
+    :param normalize:
+        Save prefectures and municipalities in their own tables to make the
+        database smaller if True
+    :param profiler:
+        Measure wall time, rows and peak memory of each stage with it if given
     :raiess: FileNotFoundError, KeyError, zipfile.BadZipFile
     """
-    for zname, fname in zip(zip_filenames, csv_filenames):
-        extract_file_from_zip_file(datadir / zname, datadir, fname)
+    source_hash = get_source_hash([
+        datadir / fname for fname in zip_filenames
+        if (datadir / fname).exists()
+    ] or [datadir / fname for fname in csv_filenames])
+
+    zfnames: typing.Optional[tuple[str, ...]] = zip_filenames
+    if extract:
+        with profiling.stage(profiler, "extract"):
+            for zname, fname in zip(zip_filenames, csv_filenames):
+                extract_file_from_zip_file(datadir / zname, datadir, fname)
+
+        zfnames = None
+
+    if streaming:
+        stream_and_save_as_db(
+            datadir, outdir, csv_filenames=csv_filenames,
+            outname=outname, zip_filenames=zfnames, workers=workers,
+            normalize=normalize, source_hash=source_hash, profiler=profiler
+        )
+        if export_json:
+            load_and_save_as_json(
+                datadir, outdir, csv_filenames=csv_filenames,
+                zip_filenames=zfnames, workers=workers, profiler=profiler
+            )
+    else:
+        load_and_save_as_json(
+            datadir, outdir, csv_filenames=csv_filenames,
+            zip_filenames=zfnames, workers=workers, profiler=profiler
+        )
+        load_json_and_save_as_db(
+            outdir, outdir, outname=outname, normalize=normalize,
+            profiler=profiler, source_hash=source_hash
+        )
 
-    load_and_save_as_json(datadir, outdir, csv_filenames=csv_filenames)
-    load_json_and_save_as_db(datadir, outdir, outname=outname)
+    if make_snapshot and (outdir / outname).exists():
+        with profiling.stage(profiler, "snapshot") as stage:
+            stage.rows = save_db_as_snapshot(outdir / outname)
@@ -0,0 +1,99 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh at gmail.com>
+# SPDX-License-Identifier: MIT
+#
+"""Version of the dataset in databases to answer conditional requests.
+"""
+import email.utils
+import pathlib
+import typing
+
+import sqlalchemy
+
+from . import constants, db, models
+
+
+# Versions cached with the signatures of the database files.
+_VERSIONS: "db.FileCache[typing.Optional[Version]]" = db.FileCache()
+
+
+class Version:
+    """The version of a dataset, and HTTP headers to validate caches of it.
+    """
+    __slots__ = ("source_hash", "built_at")
+
+    def __init__(self, source_hash: str, built_at: int):
+        (self.source_hash, self.built_at) = (source_hash, built_at)
+
+    @property
+    def etag(self) -> str:
+        """The strong entity tag of responses made from the dataset.
+        """
+        return f'"{self.source_hash[:16]}-{self.built_at}"'
+
+    @property
+    def last_modified(self) -> str:
+        """The time the dataset was built in the HTTP date format.
+        """
+        return email.utils.formatdate(self.built_at, usegmt=True)
+
+    def get_headers(self) -> dict[str, str]:
+        """Get the headers of responses to validate caches of them.
+        """
+        return {
+            "ETag": self.etag,
+            "Last-Modified": self.last_modified,
+            "Cache-Control": f"public, max-age={constants.HTTP_CACHE_MAX_AGE}",
+        }
+
+    def matches(self, if_none_match: str) -> bool:
+        """
+        Test if the value of the header If-None-Match matches the entity tag
+        with the weak comparison.
+        """
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or self.etag in (
+            tag[2:] if tag.startswith("W/") else tag for tag in tags
+        )
+
+
+def get_dataset_version(
+    conn: sqlalchemy.engine.Connection
+) -> typing.Optional[Version]:
+    """Get the version of the dataset in the database if it was stamped.
+    """
+    table = models.DatasetVersion.__table__
+    if not sqlalchemy.inspect(conn).has_table(table.name):
+        return None
+
+    row = conn.execute(sqlalchemy.select(table)).first()
+    if row is None:
+        return None
+
+    return Version(row.source_hash, row.built_at)
+
+
+def load(db_path: typing.Union[str, pathlib.Path]) -> typing.Optional[Version]:
+    """Load the version of the dataset from the database file.
+
+    :raises: sqlalchemy.exc.OperationalError
+    """
+    engine = db.get_engine(db_path, read_only=True)
+    try:
+        with engine.connect() as conn:
+            return get_dataset_version(conn)
+    finally:
+        engine.dispose()
+
+
+def get_version(
+    db_path: typing.Union[str, pathlib.Path]
+) -> typing.Optional[Version]:
+    """
+    Get the cached version of the dataset in the database file, or load it
+    again if the file was replaced or updated since the last call, or None
+    if the file does not exist or it's not stamped.
+    """
+    if not pathlib.Path(db_path).exists():
+        return None
+
+    return _VERSIONS.get(db_path, load)[0]
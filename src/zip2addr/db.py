@@ -2,30 +2,122 @@
 
 .. seealso:: https://fastapi.tiangolo.com/ja/tutorial/sql-databases/
 """
+import asyncio
 import contextlib
+import logging
+import os
 import pathlib
+import sqlite3
+import threading
 import typing
+import urllib.parse
 
+import aiosqlite
 import sqlalchemy
+import sqlalchemy.event
 import sqlalchemy.exc
+import sqlalchemy.ext.asyncio
 import sqlalchemy.orm
+import sqlalchemy.pool
 
-from . import constants, utils
+from . import config, constants, utils
 
 
+LOG = logging.getLogger(__name__)
+
 Base = sqlalchemy.orm.declarative_base()
 
+T = typing.TypeVar("T")
+
 
 def get_engine(
-    filepath: typing.Union[str, pathlib.Path] = constants.DATABASE_FILEPATH
+    filepath: typing.Union[str, pathlib.Path] = constants.DATABASE_FILEPATH,
+    read_only: bool = False, immutable: bool = False
 ):
     """Get an initialized database engine instance.
+
+    :param read_only:
+        Open the database file in read-only mode with the pragmas tuned to
+        look up, and pool connections for multi-threaded readers
+    :param immutable:
+        Open the database file as immutable not to lock it also if True in
+        read-only mode; it must not be modified while it's opened
     """
-    return sqlalchemy.create_engine(
-        f"sqlite:///{filepath}",
-        connect_args={"check_same_thread": False},
+    if not read_only:
+        return sqlalchemy.create_engine(
+            f"sqlite:///{filepath}",
+            connect_args={"check_same_thread": False},
+            echo=utils.is_verbose_mode()
+        )
+
+    uri = get_read_only_uri(filepath, immutable=immutable)
+    engine = sqlalchemy.create_engine(
+        "sqlite://",
+        creator=lambda: sqlite3.connect(
+            uri, uri=True, check_same_thread=False
+        ),
+        poolclass=sqlalchemy.pool.QueuePool,
+        pool_size=constants.DB_POOL_SIZE,
+        max_overflow=constants.DB_POOL_MAX_OVERFLOW,
         echo=utils.is_verbose_mode()
     )
+    set_read_only_pragmas_on_connect(engine)
+
+    return engine
+
+
+def get_read_only_uri(
+    filepath: typing.Union[str, pathlib.Path], immutable: bool = False
+) -> str:
+    """Get the URI to open the database file in read-only mode.
+    """
+    uri = f"file:{urllib.parse.quote(str(filepath))}?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+
+    return uri
+
+
+def set_read_only_pragmas_on_connect(engine):
+    """Set the pragmas tuned to look up when connected.
+    """
+    @sqlalchemy.event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for name, value in constants.SQLITE_READ_ONLY_PRAGMAS:
+            cur.execute(f"PRAGMA {name} = {value}")
+        cur.close()
+
+
+def get_async_engine(
+    filepath: typing.Union[str, pathlib.Path] = constants.DATABASE_FILEPATH,
+    read_only: bool = False, immutable: bool = False
+) -> sqlalchemy.ext.asyncio.AsyncEngine:
+    """Get a database engine instance to access it asynchronously.
+
+    :param read_only: See :func:`get_engine`
+    :param immutable: See :func:`get_engine`
+    """
+    if not read_only:
+        return sqlalchemy.ext.asyncio.create_async_engine(
+            f"sqlite+aiosqlite:///{filepath}",
+            echo=utils.is_verbose_mode()
+        )
+
+    uri = get_read_only_uri(filepath, immutable=immutable)
+    engine = sqlalchemy.ext.asyncio.create_async_engine(
+        "sqlite+aiosqlite://",
+        async_creator=lambda: aiosqlite.connect(
+            uri, uri=True, check_same_thread=False
+        ),
+        poolclass=sqlalchemy.pool.AsyncAdaptedQueuePool,
+        pool_size=constants.DB_POOL_SIZE,
+        max_overflow=constants.DB_POOL_MAX_OVERFLOW,
+        echo=utils.is_verbose_mode()
+    )
+    set_read_only_pragmas_on_connect(engine.sync_engine)
+
+    return engine
 
 
 def init(engine):
@@ -35,11 +127,14 @@ def init(engine):
 
 
 def get_session_class(
-    filepath: typing.Union[str, pathlib.Path], read_only: bool = False
+    filepath: typing.Union[str, pathlib.Path], read_only: bool = False,
+    engine_options: typing.Optional[dict[str, typing.Any]] = None
 ):
     """Get a database session class.
+
+    :param engine_options: Options of the engine, see :func:`get_engine`
     """
-    engine = get_engine(filepath)
+    engine = get_engine(filepath, **(engine_options or {}))
     if not read_only:
         init(engine)
 
@@ -48,12 +143,198 @@ def get_session_class(
     )
 
 
+def get_file_signature(
+    filepath: typing.Union[str, pathlib.Path]
+) -> typing.Optional[tuple[int, int, int]]:
+    """
+    Get the signature of the file changes if the file was replaced or updated.
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+
+
+class FileCache(typing.Generic[T]):
+    """
+    Objects made from files and cached with the signatures of the files, to
+    make them again only if the files were replaced or updated.
+    """
+    def __init__(self):
+        self._items: dict[str, tuple[typing.Any, T]] = {}
+        self._lock = threading.Lock()
+        self._reloads: dict[str, threading.Thread] = {}
+
+    def get(
+        self, filepath: typing.Union[str, pathlib.Path],
+        make: typing.Callable[[typing.Union[str, pathlib.Path]], T]
+    ) -> tuple[T, typing.Optional[T]]:
+        """
+        Get the object cached for the file, or make it again with ``make`` if
+        the file was replaced or updated since then, and return it and the
+        old one replaced by it if any.
+        """
+        key = str(filepath)
+        sig = get_file_signature(filepath)
+
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None and cached[0] == sig:
+                return (cached[1], None)
+
+            obj = make(filepath)
+            self._items[key] = (sig, obj)
+
+        return (obj, None if cached is None else cached[1])
+
+    def _reload(
+        self, filepath: typing.Union[str, pathlib.Path], sig: typing.Any,
+        make: typing.Callable[[typing.Union[str, pathlib.Path]], T]
+    ):
+        """Make the object again and replace the one cached with it.
+        """
+        key = str(filepath)
+        try:
+            obj = make(filepath)
+        except Exception:  # pylint: disable=broad-except
+            # Keep the old one and try again in the next call.
+            LOG.exception("Failed to reload: %s", key)
+            obj = None
+
+        with self._lock:
+            if obj is not None:
+                self._items[key] = (sig, obj)
+            del self._reloads[key]
+
+    def get_reloading(
+        self, filepath: typing.Union[str, pathlib.Path],
+        make: typing.Callable[[typing.Union[str, pathlib.Path]], T]
+    ) -> T:
+        """
+        Get the object cached for the file even if the file was replaced or
+        updated since then, and make it again in a background thread to
+        replace the old one once it's ready, or make it in this thread if it
+        was not cached yet.
+        """
+        key = str(filepath)
+        sig = get_file_signature(filepath)
+
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None:
+                if cached[0] != sig and sig is not None and \
+                        key not in self._reloads:
+                    thread = threading.Thread(
+                        target=self._reload, args=(filepath, sig, make),
+                        daemon=True
+                    )
+                    self._reloads[key] = thread
+                    thread.start()
+
+                return cached[1]
+
+        return self.get(filepath, make)[0]
+
+    def wait(self, timeout: typing.Optional[float] = None):
+        """Wait for the objects being made again in background.
+        """
+        with self._lock:
+            threads = list(self._reloads.values())
+
+        for thread in threads:
+            thread.join(timeout)
+
+    def clear(self) -> list[T]:
+        """Clear the cache and return the objects cached.
+        """
+        with self._lock:
+            objs = [obj for _sig, obj in self._items.values()]
+            self._items.clear()
+
+        return objs
+
+
+# Session classes cached with the signatures of the database files.
+_SESSION_CLASSES: FileCache[typing.Any] = FileCache()
+
+# Async session classes cached in the same way.
+_ASYNC_SESSION_CLASSES: FileCache[typing.Any] = FileCache()
+
+
+def get_reloadable_session_class(
+    filepath: typing.Union[str, pathlib.Path]
+):
+    """
+    Get a cached database session class, or a new one if the database file was
+    replaced or updated since the last call.
+
+    The engine of the old session class is disposed without closing
+    connections in use, so that the sessions already opened can keep reading
+    the old database file.
+
+    Options of the engine are configured with :func:`config.get_db_options`.
+    """
+    (cls, old) = _SESSION_CLASSES.get(
+        filepath,
+        lambda path: get_session_class(
+            path, read_only=True, engine_options=config.get_db_options()
+        )
+    )
+    if old is not None:
+        old.kw["bind"].dispose(close=False)
+
+    return cls
+
+
+def get_reloadable_async_session_class(
+    filepath: typing.Union[str, pathlib.Path]
+):
+    """
+    Get a cached async database session class in the same way as
+    :func:`get_reloadable_session_class`.
+    """
+    (cls, old) = _ASYNC_SESSION_CLASSES.get(
+        filepath,
+        lambda path: sqlalchemy.ext.asyncio.async_sessionmaker(
+            bind=get_async_engine(path, **config.get_db_options()),
+            autoflush=False, expire_on_commit=False
+        )
+    )
+    if old is not None:
+        old.kw["bind"].sync_engine.dispose(close=False)
+
+    return cls
+
+
+def dispose_engines():
+    """
+    Dispose the engines of all of the session classes cached, at shutdown
+    for example.
+    """
+    for cls in _SESSION_CLASSES.clear():
+        cls.kw["bind"].dispose()
+
+
+async def dispose_async_engines():
+    """Dispose the engines of all of the async session classes cached.
+    """
+    for cls in _ASYNC_SESSION_CLASSES.clear():
+        await cls.kw["bind"].dispose()
+
+
 def get_session(
-    filepath: typing.Union[str, pathlib.Path], read_only: bool = False
+    filepath: typing.Union[str, pathlib.Path], read_only: bool = False,
+    reloadable: bool = False
 ):
     """Get a database session.
     """
-    cls = get_session_class(filepath, read_only=read_only)
+    if reloadable:
+        cls = get_reloadable_session_class(filepath)
+    else:
+        cls = get_session_class(filepath, read_only=read_only)
+
     dbs = cls()
     try:
         yield dbs
@@ -70,13 +351,78 @@ def get_session(
 def get_default_session():
     """Get a default database session.
     """
-    yield from get_session(constants.DATABASE_FILEPATH)
+    yield from get_session(constants.DATABASE_FILEPATH, reloadable=True)
+
+
+async def get_default_async_session():
+    """Get a default async database session to read data.
+    """
+    cls = get_reloadable_async_session_class(constants.DATABASE_FILEPATH)
+    async with cls() as adbs:
+        yield adbs
+
+
+class Reader:
+    """
+    Run crud functions to read the database from async routes, sync ones
+    with a sync session in a worker thread not to block the event loop, or
+    async ones with an async session if it's given.
+    """
+    def __init__(
+        self, dbs: typing.Optional[sqlalchemy.orm.Session] = None,
+        adbs: typing.Optional[sqlalchemy.ext.asyncio.AsyncSession] = None
+    ):
+        (self.dbs, self.adbs) = (dbs, adbs)
+
+    async def run(
+        self, func: typing.Callable[..., T],
+        afunc: typing.Callable[..., typing.Awaitable[T]],
+        *args, **kwargs
+    ) -> T:
+        """
+        Run ``func`` with the sync session, or ``afunc`` with the async
+        session if it's given, and the arguments.
+        """
+        if self.adbs is not None:
+            return await afunc(self.adbs, *args, **kwargs)
+
+        return await asyncio.to_thread(func, self.dbs, *args, **kwargs)
+
+
+async def get_reader(
+    filepath: typing.Union[str, pathlib.Path], use_async: bool = False
+) -> typing.AsyncIterator[Reader]:
+    """
+    Get a reader of the database with a sync session, or an async session
+    if ``use_async``, of the cached session classes.
+    """
+    if use_async:
+        async with get_reloadable_async_session_class(filepath)() as adbs:
+            yield Reader(adbs=adbs)
+    else:
+        dbs = get_reloadable_session_class(filepath)()
+        try:
+            yield Reader(dbs=dbs)
+        finally:
+            dbs.close()
+
+
+async def get_default_reader() -> typing.AsyncIterator[Reader]:
+    """
+    Get a default reader of the database, with an async session if it's
+    configured, see :func:`zip2addr.config.is_db_async`.
+    """
+    async for reader in get_reader(
+        constants.DATABASE_FILEPATH, use_async=config.is_db_async()
+    ):
+        yield reader
 
 
 @contextlib.contextmanager
 def get_session_ctx(
-    filepath: typing.Union[str, pathlib.Path], read_only: bool = False
+    filepath: typing.Union[str, pathlib.Path], read_only: bool = False,
+    reloadable: bool = False
 ):
     """Get a database session can be used with 'with' statement.
     """
-    yield from get_session(filepath, read_only)
+    yield from get_session(filepath, read_only, reloadable=reloadable)
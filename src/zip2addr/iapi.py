@@ -3,13 +3,20 @@
 """Internal APIs used commonly from web ui and cli.
 """
 import pathlib
+import re
 import typing
 
+import sqlalchemy.exc
+
 from . import (
     constants,
     crud,
     datagen,
     db,
+    memory,
+    profiling,
+    snapshot,
+    trie,
     utils
 )
 
@@ -24,34 +31,126 @@ def set_verbose_mode():
 def initdb(
     datadir: str, output: str,
     zip_filenames: tuple[str, ...] = constants.ZIPCODE_ZIP_FILENAMES,
-    csv_filenames: tuple[str, ...] = constants.ZIPCODE_CSV_FILENAMES
-):
+    csv_filenames: tuple[str, ...] = constants.ZIPCODE_CSV_FILENAMES,
+    streaming: bool = False,
+    export_json: bool = False,
+    extract: bool = False,
+    workers: int = 1,
+    make_snapshot: bool = True,
+    normalize: bool = False,
+    profile: bool = False,
+    profile_dir: typing.Optional[str] = None,
+    trace_memory: bool = False,
+) -> typing.Optional[profiling.Profiler]:
     """
     Prase csv files extracted from zip files, save resutl data as a db file.
+
+    :param profile:
+        Measure each stage and return the profiler has the results if True
+    :param profile_dir:
+        Save the results and cProfile stats of each stage in this dir also
+    :param trace_memory:
+        Measure peak memory of each stage also if True, which makes stages
+        slower
     """
     opath = pathlib.Path(output)
     (outdir, outname) = (opath.parent, opath.name)
 
+    profiler = None
+    if profile:
+        profiler = profiling.Profiler(
+            None if profile_dir is None else pathlib.Path(profile_dir),
+            trace_memory=trace_memory
+        )
+
     datagen.make_database_from_zip_files(
         pathlib.Path(datadir), outdir, zip_filenames=zip_filenames,
-        csv_filenames=csv_filenames, outname=outname
+        csv_filenames=csv_filenames, outname=outname,
+        streaming=streaming, export_json=export_json, extract=extract,
+        workers=workers, make_snapshot=make_snapshot, normalize=normalize,
+        profiler=profiler
+    )
+
+    if profiler is not None and profiler.profile_dir is not None:
+        profiler.save(profiler.profile_dir / profiling.REPORT_FILENAME)
+
+    return profiler
+
+
+def update_db(
+    db_path: str, delta_files: typing.Iterable[str]
+) -> dict[str, int]:
+    """
+    Apply the monthly delta files to the database file.
+    """
+    dpath = pathlib.Path(db_path)
+    if not dpath.exists():
+        utils.get_logger().error(f"Not found: {db_path}")
+        return {}
+
+    return datagen.apply_delta_files(
+        dpath, [pathlib.Path(f) for f in delta_files]
     )
 
 
 def search_by_zipcode(
     zipcode: str,
     db_path: str,
-    skip: int = 0, limit: int = constants.LIMIT
+    skip: int = 0, limit: int = constants.LIMIT,
+    engine: str = constants.LOOKUP_ENGINE
 ) -> list[typing.Any]:
     """
     Search address info from rhe database file by given zip code.
+
+    :param engine:
+        The engine to look up zip codes, 'sql', 'mmap' or 'memory' to load
+        all of them from the database file into memory
     """
+    if not re.fullmatch(constants.PARTIAL_ZIPCODE_PATTERN, zipcode):
+        utils.get_logger().error(f"Invalid zip code: {zipcode}")
+        return []
+
     dpath = pathlib.Path(db_path)
+    if engine == "mmap":
+        dpath = snapshot.get_path(dpath)
+
     if not dpath.exists():
-        utils.get_logger().error(f"Not found: {db_path}")
+        utils.get_logger().error(f"Not found: {dpath!s}")
         return []
 
-    with db.get_session_ctx(dpath, read_only=True) as dbs_ctx:
+    # Zip codes not in the trie are not looked up if it's available.
+    ztrie = trie.get_trie_of_db(db_path)
+    if ztrie is not None and not ztrie.count(zipcode):
+        utils.get_logger().warning(
+            f"Not found {zipcode} in {trie.get_path(db_path)!s}"
+        )
+        return []
+
+    res: list[typing.Any]
+    if engine == "mmap":
+        with snapshot.Snapshot(dpath) as snap:
+            res = snap.get_zipcodes_by_partial_zipcode(
+                zipcode, skip=skip, limit=limit
+            )
+            if not res:
+                utils.get_logger().warning(
+                    f"Not found {zipcode} in {dpath!s}"
+                )
+
+            return [r.as_dict() for r in res]
+
+    if engine == "memory":
+        res = memory.get_store(dpath).get_zipcodes_by_partial_zipcode(
+            zipcode, skip=skip, limit=limit
+        )
+        if not res:
+            utils.get_logger().warning(f"Not found {zipcode} in {db_path}")
+
+        return [r.as_dict() for r in res]
+
+    with db.get_session_ctx(
+        dpath, read_only=True, reloadable=True
+    ) as dbs_ctx:
         res = crud.get_zipcodes_by_partial_zipcode(
             dbs_ctx, zipcode, skip=skip, limit=limit
         )
@@ -60,3 +159,79 @@ def search_by_zipcode(
             return []
 
         return [r.as_dict() for r in res]
+
+
+def search_by_zipcodes(
+    zipcodes: typing.Sequence[str],
+    db_path: str,
+    engine: str = constants.LOOKUP_ENGINE
+) -> list[dict[str, typing.Any]]:
+    """
+    Search address info of zip codes from the database file at once, and
+    return the results in the order of them with the markers of zip codes
+    not found, see :func:`zip2addr.crud.make_batch_results`.
+
+    :param engine: The engine to look up zip codes, see
+        :func:`search_by_zipcode`
+    """
+    dpath = pathlib.Path(db_path)
+    if engine == "mmap":
+        dpath = snapshot.get_path(dpath)
+
+    if not dpath.exists():
+        utils.get_logger().error(f"Not found: {dpath!s}")
+        return []
+
+    if engine == "mmap":
+        with snapshot.Snapshot(dpath) as snap:
+            return crud.make_batch_results(
+                zipcodes, crud.lookup_zipcodes(snap, zipcodes)
+            )
+
+    if engine == "memory":
+        return crud.make_batch_results(
+            zipcodes, crud.lookup_zipcodes(memory.get_store(dpath), zipcodes)
+        )
+
+    with db.get_session_ctx(
+        dpath, read_only=True, reloadable=True
+    ) as dbs_ctx:
+        return crud.make_batch_results(
+            zipcodes, crud.get_zipcodes_by_zipcodes(dbs_ctx, zipcodes)
+        )
+
+
+def search_by_address(
+    query: str, db_path: str, limit: int = constants.LIMIT,
+    fuzzy: bool = False
+) -> list[dict[str, str]]:
+    """
+    Search zip codes and address info from the database file by (partial)
+    address in kanji, kana or roman, or similar addresses if ``fuzzy``.
+    """
+    dpath = pathlib.Path(db_path)
+    if not dpath.exists():
+        utils.get_logger().error(f"Not found: {db_path}")
+        return []
+
+    with db.get_session_ctx(
+        dpath, read_only=True, reloadable=True
+    ) as dbs_ctx:
+        try:
+            res = crud.search_zipcodes_by_address(
+                dbs_ctx, query, limit=limit, fuzzy=fuzzy
+            )
+        except ValueError as exc:
+            utils.get_logger().error(str(exc))
+            return []
+        except sqlalchemy.exc.OperationalError as exc:
+            utils.get_logger().error(
+                f"Failed to search addresses in {db_path}; the full-text "
+                f"search index may not be available: {exc}"
+            )
+            return []
+
+        if not res:
+            utils.get_logger().warning(f"Not found {query} in {db_path}")
+
+        return [r.as_dict() for r in res]
@@ -1,13 +1,43 @@
 """Web app entry point.
 """
+import contextlib
+import typing
+
 import fastapi
 
+from . import config, constants, db, memory
 from .routers import (
+    address,
     ping,
+    stats,
     zipcode,
 )
 
 
-APP = fastapi.FastAPI()
+@contextlib.asynccontextmanager
+async def lifespan(_app: fastapi.FastAPI) -> typing.AsyncIterator[None]:
+    """
+    Create the engines and the session classes of the database once at
+    startup to share them among requests, and dispose them at shutdown.
+
+    All zip code data are loaded at startup also if the lookup engine is
+    'memory', and the time and the max RSS of it are available at /stats/.
+    """
+    if config.is_db_async():
+        db.get_reloadable_async_session_class(constants.DATABASE_FILEPATH)
+    else:
+        db.get_reloadable_session_class(constants.DATABASE_FILEPATH)
+
+    if config.get_lookup_engine() == "memory":
+        memory.get_store(constants.DATABASE_FILEPATH)
+
+    yield
+    db.dispose_engines()
+    await db.dispose_async_engines()
+
+
+APP = fastapi.FastAPI(lifespan=lifespan)
+APP.include_router(address.ROUTER)
 APP.include_router(ping.ROUTER)
+APP.include_router(stats.ROUTER)
 APP.include_router(zipcode.ROUTER)
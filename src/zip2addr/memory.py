@@ -0,0 +1,128 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh at gmail.com>
+# SPDX-License-Identifier: MIT
+#
+"""In-memory store of zip code data loaded from the database at once.
+
+Zip codes are kept in a dict to look up them exactly and in a sorted list to
+look up them by prefixes with binary search, and address info of them are
+kept in records have strings repeated interned, see
+:class:`zip2addr.records.Record`, so that all of them can be served without
+the database.
+"""
+import bisect
+import logging
+import pathlib
+import time
+import typing
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None  # type: ignore
+
+from . import crud, dataset, db, snapshot
+
+
+LOG = logging.getLogger(__name__)
+
+# Stores cached with the signatures of the database files.
+_STORES: "db.FileCache[Store]" = db.FileCache()
+
+
+def get_max_rss() -> typing.Optional[int]:
+    """Get the max resident set size of this process in bytes if possible.
+    """
+    if resource is None:
+        return None
+
+    # It's in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Store(snapshot.SortedZipcodes):
+    """Zip code data in memory, can be used instead of snapshot.Snapshot.
+    """
+    def __init__(
+        self, zipcodes: typing.Iterable[typing.Mapping[str, typing.Any]]
+    ):
+        """
+        :param zipcodes:
+            Zip code data have id, zipcode, address_id and snapshot.FIELDS
+        """
+        records: dict[str, snapshot.Zipcode] = {}
+        for zdata in zipcodes:
+            records[zdata["zipcode"]] = snapshot.Zipcode(zdata)
+
+        self._records = records
+        self._zipcodes = sorted(records)
+        self.signature: typing.Any = None
+        self.version: typing.Optional[dataset.Version] = None
+        self.load_time: float = 0.0
+        self.max_rss: typing.Optional[int] = None
+
+    @classmethod
+    def load(cls, db_path: typing.Union[str, pathlib.Path]) -> "Store":
+        """
+        Load all zip code data and the version of the dataset from the
+        database file.
+
+        :raises: sqlalchemy.exc.OperationalError
+        """
+        start = time.perf_counter()
+        sig = db.get_file_signature(db_path)
+        engine = db.get_engine(db_path, read_only=True)
+        try:
+            with engine.connect() as conn:
+                version = dataset.get_dataset_version(conn)
+                rows = conn.execute(crud.select_zipcode_data())
+                store = cls(row._mapping for row in rows)
+        finally:
+            engine.dispose()
+
+        store.signature = sig
+        store.version = version
+        store.load_time = time.perf_counter() - start
+        store.max_rss = get_max_rss()
+        LOG.info(
+            "Loaded %d zip codes from %s in %.3f secs, max RSS=%s",
+            len(store), db_path, store.load_time, store.max_rss
+        )
+        return store
+
+    def __len__(self) -> int:
+        return len(self._zipcodes)
+
+    def stats(self) -> dict[str, typing.Any]:
+        """Get the number of zip codes, the time to load them and max RSS.
+        """
+        return dict(
+            size=len(self), load_time=self.load_time, max_rss=self.max_rss
+        )
+
+    def _get(self, idx: int) -> snapshot.Zipcode:
+        return self._records[self._zipcodes[idx]]
+
+    def _find(self, prefix: str, right: bool = False) -> int:
+        # Zip codes are digits, so that ones start with the prefix are less
+        # than it followed by the last ASCII character.
+        return bisect.bisect_left(
+            self._zipcodes, prefix + "\x7f" if right else prefix
+        )
+
+    def get_zipcode(self, zipcode: str) -> typing.Optional[snapshot.Zipcode]:
+        """Get a zip code.
+        """
+        return self._records.get(zipcode)
+
+
+def get_store(db_path: typing.Union[str, pathlib.Path]) -> Store:
+    """
+    Get a cached store, or load it if it's not loaded yet.
+
+    The store is loaded again in background if the database file was
+    replaced or modified since it was loaded, and the old one is served until
+    the new one is ready.
+
+    :raises: OSError, sqlalchemy.exc.OperationalError
+    """
+    return _STORES.get_reloading(db_path, Store.load)
@@ -8,14 +8,60 @@
 .. seealso::
    https://docs.sqlalchemy.org/en/14/orm/basic_relationships.html
 """
+import sqlite3
+
 import sqlalchemy
+import sqlalchemy.event
 import sqlalchemy.orm
 
 from . import db
 
 
+class Prefecture(db.Base):
+    """
+    A model represents a database of prefectures referred from municipalities
+    in normalized databases.
+    """
+    __tablename__ = "prefectures"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, index=True)
+
+    pref = sqlalchemy.Column(sqlalchemy.String)
+    kana_pref = sqlalchemy.Column(sqlalchemy.String)
+    roman_pref = sqlalchemy.Column(sqlalchemy.String)
+
+    municipalities = sqlalchemy.orm.relationship(
+        "Municipality", back_populates="prefecture"
+    )
+
+
+class Municipality(db.Base):
+    """
+    A model represents a database of municipalities, cities and wards,
+    referred from addresses in normalized databases.
+    """
+    __tablename__ = "municipalities"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, index=True)
+
+    city_ward = sqlalchemy.Column(sqlalchemy.String)
+    kana_city_ward = sqlalchemy.Column(sqlalchemy.String)
+    roman_city_ward = sqlalchemy.Column(sqlalchemy.String)
+
+    prefecture_id = sqlalchemy.Column(
+        sqlalchemy.Integer, sqlalchemy.ForeignKey("prefectures.id")
+    )
+    prefecture = sqlalchemy.orm.relationship(
+        "Prefecture", back_populates="municipalities", uselist=False
+    )
+
+
 class Address(db.Base):
     """A model represents a database of addresses.
+
+    .. note::
+       pref and city_ward of addresses, kana and roman addresses are NULL and
+       these are referred from the municipality in normalized databases.
     """
     __tablename__ = "addresses"
 
@@ -25,6 +71,14 @@ class Address(db.Base):
     city_ward = sqlalchemy.Column(sqlalchemy.String)
     house_numbers = sqlalchemy.Column(sqlalchemy.String)
 
+    municipality_id = sqlalchemy.Column(
+        sqlalchemy.Integer, sqlalchemy.ForeignKey("municipalities.id"),
+        nullable=True
+    )
+    municipality = sqlalchemy.orm.relationship(
+        "Municipality", uselist=False
+    )
+
     kana = sqlalchemy.orm.relationship(
         "KanaAddress", back_populates="address", uselist=False
     )
@@ -47,8 +101,9 @@ class KanaAddress(db.Base):
     city_ward = sqlalchemy.Column(sqlalchemy.String)
     house_numbers = sqlalchemy.Column(sqlalchemy.String)
 
+    # Indexed to update rows by it on merging zip code data.
     address_id = sqlalchemy.Column(
-        sqlalchemy.Integer, sqlalchemy.ForeignKey("addresses.id")
+        sqlalchemy.Integer, sqlalchemy.ForeignKey("addresses.id"), index=True
     )
     address = sqlalchemy.orm.relationship(
         "Address", back_populates="kana", uselist=False
@@ -66,8 +121,9 @@ class RomanAddress(db.Base):
     city_ward = sqlalchemy.Column(sqlalchemy.String)
     house_numbers = sqlalchemy.Column(sqlalchemy.String)
 
+    # Indexed to update rows by it on merging zip code data.
     address_id = sqlalchemy.Column(
-        sqlalchemy.Integer, sqlalchemy.ForeignKey("addresses.id")
+        sqlalchemy.Integer, sqlalchemy.ForeignKey("addresses.id"), index=True
     )
     address = sqlalchemy.orm.relationship(
         "Address", back_populates="roman", uselist=False
@@ -94,25 +150,99 @@ class Zipcode(db.Base):
 
         .. todo:: https://docs.sqlalchemy.org/en/14/orm/dataclasses.html
         """
-        def get_addr_child_attr(child: str, attr: str):
-            """Get an address' child's attr.
-            """
-            # .. todo:: SAWarning: Multiple rows returned with uselist=False...
-            child = getattr(self.address, child, None)
-            return "" if child is None else getattr(child, attr)
-
-        return dict(
-            zipcode=self.zipcode,
-
-            pref=self.address.pref,
-            city_ward=self.address.city_ward,
-            house_numbers=self.address.house_numbers,
-
-            roman_pref=get_addr_child_attr("roman", "pref"),
-            roman_city_ward=get_addr_child_attr("roman", "city_ward"),
-            roman_house_numbers=get_addr_child_attr("roman", "house_numbers"),
-
-            kana_pref=get_addr_child_attr("kana", "pref"),
-            kana_city_ward=get_addr_child_attr("kana", "city_ward"),
-            kana_house_numbers=get_addr_child_attr("kana", "house_numbers")
-        )
+        addr = self.address
+        muni = addr.municipality
+
+        res = dict(zipcode=self.zipcode)
+        for prefix, child in (("", addr),
+                              ("roman_", addr.roman),
+                              ("kana_", addr.kana)):
+            for attr in ("pref", "city_ward", "house_numbers"):
+                val = None if child is None else getattr(child, attr)
+
+                # It's referred from the municipality if it's normalized.
+                if val is None and muni is not None and \
+                        attr != "house_numbers":
+                    val = getattr(
+                        muni.prefecture if attr == "pref" else muni,
+                        f"{prefix}{attr}"
+                    )
+
+                res[f"{prefix}{attr}"] = "" if val is None else val
+
+        return res
+
+
+class ZipcodeLookup(db.Base):
+    """
+    A model represents a flat table of zip codes and address info of them
+    materialized from the other tables, to look up zip codes without joins.
+
+    Address info are duplicated in it even if prefectures and cities are
+    normalized in the other tables, so that it trades the size of databases
+    for lookups.
+    """
+    __tablename__ = "zipcode_lookup"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    zipcode = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+    id = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+    address_id = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+
+    pref = sqlalchemy.Column(sqlalchemy.String, default="")
+    city_ward = sqlalchemy.Column(sqlalchemy.String, default="")
+    house_numbers = sqlalchemy.Column(sqlalchemy.String, default="")
+    roman_pref = sqlalchemy.Column(sqlalchemy.String, default="")
+    roman_city_ward = sqlalchemy.Column(sqlalchemy.String, default="")
+    roman_house_numbers = sqlalchemy.Column(sqlalchemy.String, default="")
+    kana_pref = sqlalchemy.Column(sqlalchemy.String, default="")
+    kana_city_ward = sqlalchemy.Column(sqlalchemy.String, default="")
+    kana_house_numbers = sqlalchemy.Column(sqlalchemy.String, default="")
+
+    def as_dict(self):
+        """Represents self as a dict object same as Zipcode.as_dict().
+        """
+        return {
+            col.name: getattr(self, col.name)
+            for col in self.__table__.columns
+            if col.name not in ("id", "address_id")
+        }
+
+
+class DatasetVersion(db.Base):
+    """
+    A model represents the version of the dataset in the database, the hash
+    of the source files and the time it was built or updated.
+    """
+    __tablename__ = "dataset_version"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+
+    source_hash = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    built_at = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+
+
+def has_fts5_trigram(*_args, **_kwargs) -> bool:
+    """
+    Test if SQLite supports FTS5 with the trigram tokenizer, 3.34.0 or later.
+    """
+    return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+# A full-text search index of addresses in kanji, kana and roman of zip
+# codes with the trigram tokenizer, made from the lookup table. It's a
+# virtual table of FTS5 created with DDL as it cannot be declared as a model.
+ADDRESS_FTS = sqlalchemy.table(
+    "address_fts",
+    sqlalchemy.column("zipcode"),
+    sqlalchemy.column("text"),
+    sqlalchemy.column("rank"),
+)
+
+sqlalchemy.event.listen(
+    db.Base.metadata, "after_create",
+    sqlalchemy.DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {ADDRESS_FTS.name} "
+        "USING fts5(zipcode UNINDEXED, text, tokenize='trigram')"
+    ).execute_if(callable_=has_fts5_trigram)
+)
@@ -0,0 +1,206 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh at gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=too-few-public-methods
+#
+"""Measure wall time, the number of rows and peak memory of stages.
+
+Stages done in batches, parsing and inserting data in streaming mode for
+example, are measured batch by batch and added up.
+
+.. note::
+   Peak memory is traced with tracemalloc in this process only, so memory
+   allocated in worker processes to parse data is not counted. It's traced
+   only if it's enabled as it makes stages some times slower, and wall time
+   measured with it or cProfile should not be compared with the one without
+   them. Stages cannot be nested.
+"""
+import contextlib
+import cProfile
+import json
+import logging
+import pathlib
+import time
+import tracemalloc
+import typing
+
+
+T = typing.TypeVar("T")
+
+
+LOG = logging.getLogger(__name__)
+
+REPORT_FILENAME: str = "report.json"
+
+
+class Stage:
+    """Measured results of a stage.
+    """
+    __slots__ = ("name", "rows", "elapsed", "peak_memory")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: typing.Optional[int] = None
+        self.elapsed: float = 0.0
+        self.peak_memory: typing.Optional[int] = None
+
+    def as_dict(self) -> dict[str, typing.Any]:
+        """Represents self as a dict object.
+        """
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def add(self, other: "Stage"):
+        """Add the results of another batch of the stage up.
+        """
+        self.elapsed += other.elapsed
+        if other.rows is not None:
+            self.rows = (self.rows or 0) + other.rows
+        if other.peak_memory is not None:
+            self.peak_memory = max(self.peak_memory or 0, other.peak_memory)
+
+
+class Profiler:
+    """Measure stages one by one and keep the results.
+    """
+    def __init__(
+        self, profile_dir: typing.Optional[pathlib.Path] = None,
+        trace_memory: bool = False
+    ):
+        """
+        :param profile_dir:
+            Profile each stage with cProfile and save stats as
+            <index>_<stage>.pstats in this dir if it's given
+        :param trace_memory:
+            Measure peak memory of each stage with tracemalloc if True
+        """
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.stages: list[Stage] = []
+        self._profiles: dict[int, cProfile.Profile] = {}
+
+    def _find(self, name: str) -> typing.Optional[int]:
+        """Find the index of the last stage of the name.
+        """
+        for idx in range(len(self.stages) - 1, -1, -1):
+            if self.stages[idx].name == name:
+                return idx
+
+        return None
+
+    @contextlib.contextmanager
+    def stage(
+        self, name: str, accumulate: bool = False
+    ) -> typing.Iterator[Stage]:
+        """Measure a stage; the number of rows can be set to the stage.
+
+        :param accumulate:
+            Add the results up to the last stage of the same name if True,
+            to measure a stage done in batches
+        """
+        idx = self._find(name) if accumulate else None
+        if idx is None:
+            idx = len(self.stages)
+            self.stages.append(Stage(name))
+
+        stage = Stage(name)
+        profile = None
+        if self.profile_dir is not None:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            profile = self._profiles.setdefault(idx, cProfile.Profile())
+
+        if self.trace_memory:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield stage
+        finally:
+            if profile is not None:
+                profile.disable()
+
+            stage.elapsed = time.perf_counter() - start
+            if self.trace_memory:
+                stage.peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            if profile is not None and self.profile_dir is not None:
+                profile.dump_stats(
+                    self.profile_dir / f"{idx:02d}_{name}.pstats"
+                )
+
+            self.stages[idx].add(stage)
+            LOG.debug(
+                "%s: %.3f secs, rows=%s, peak memory=%s",
+                name, stage.elapsed, stage.rows, stage.peak_memory
+            )
+
+    def report(self) -> str:
+        """Format the results of stages as a table.
+        """
+        lines = [f"{'stage':<16} {'secs':>10} {'rows':>10} {'peak KiB':>12}"]
+        for stage in self.stages:
+            rows = "-" if stage.rows is None else str(stage.rows)
+            peak = (
+                "-" if stage.peak_memory is None
+                else f"{stage.peak_memory / 1024:.1f}"
+            )
+            lines.append(
+                f"{stage.name:<16} {stage.elapsed:>10.3f} {rows:>10} "
+                f"{peak:>12}"
+            )
+
+        total = sum(stage.elapsed for stage in self.stages)
+        lines.append(f"{'total':<16} {total:>10.3f}")
+        return "\n".join(lines)
+
+    def save(self, outpath: pathlib.Path):
+        """Save the results of stages as a json file.
+        """
+        with outpath.open(mode="w") as out:
+            json.dump([stage.as_dict() for stage in self.stages], out)
+
+
+@contextlib.contextmanager
+def stage(
+    profiler: typing.Optional[Profiler], name: str, accumulate: bool = False
+) -> typing.Iterator[Stage]:
+    """Measure a stage with ``profiler`` if it's given.
+
+    :param accumulate: See :meth:`Profiler.stage`
+    """
+    if profiler is None:
+        yield Stage(name)
+    else:
+        with profiler.stage(name, accumulate=accumulate) as res:
+            yield res
+
+
+def iterate(
+    profiler: typing.Optional[Profiler], name: str,
+    items: typing.Iterable[T],
+    count: typing.Callable[[T], int] = len  # type: ignore[assignment]
+) -> typing.Iterator[T]:
+    """
+    Yield items measuring the time to get each of them as a batch of the
+    stage ``name`` with ``profiler`` if it's given, to measure data loaded
+    and parsed lazily for example.
+
+    :param count: Get the number of rows in an item
+    """
+    if profiler is None:
+        yield from items
+        return
+
+    iterator = iter(items)
+    while True:
+        with profiler.stage(name, accumulate=True) as res:
+            item = next(iterator, None)
+            if item is not None:
+                res.rows = count(item)
+
+        if item is None:
+            return
+
+        yield item
@@ -0,0 +1,87 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh at gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=too-few-public-methods
+#
+"""Compact in-memory representation of zip code data.
+"""
+import collections.abc
+import sys
+import typing
+
+
+KEYS: tuple[str, ...] = (
+    "zipcode",
+    "pref", "city_ward", "house_numbers",
+    "roman_pref", "roman_city_ward", "roman_house_numbers",
+    "kana_pref", "kana_city_ward", "kana_house_numbers",
+    "_city_id_or_something", "_partial_zip_code",
+)
+
+# Values of these keys are repeated in many records, e.g. "北海道" and
+# "札幌市　中央区", so that these are interned and shared among records.
+INTERNED_KEYS: frozenset[str] = frozenset("""
+pref
+city_ward
+roman_pref
+roman_city_ward
+kana_pref
+kana_city_ward
+_city_id_or_something
+_partial_zip_code
+""".split())
+
+
+class Record(collections.abc.Mapping):
+    """
+    A record of zip code data has slots instead of a dict, can be used as a
+    read-only dict of which keys are KEYS and values missing are "".
+
+    Subclasses may use some of KEYS only by overriding ``_keys``.
+    """
+    __slots__ = KEYS
+
+    _keys: typing.ClassVar[tuple[str, ...]] = KEYS
+
+    def __init__(
+        self, zdata: typing.Optional[typing.Mapping[str, typing.Any]] = None
+    ):
+        for key in self._keys:
+            setattr(self, key, "")
+
+        if zdata is not None:
+            self.update(zdata)
+
+    def update(self, zdata: typing.Mapping[str, typing.Any]):
+        """Update values with ``zdata`` ignoring unknown keys in it.
+        """
+        for key, val in zdata.items():
+            if key not in self._keys:
+                continue
+
+            if val is None:
+                val = ""
+            elif key in INTERNED_KEYS and isinstance(val, str):
+                val = sys.intern(val)
+
+            setattr(self, key, val)
+
+    def __getitem__(self, key: str) -> str:
+        if key not in self._keys:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.as_dict()!r})"
+
+    def as_dict(self) -> dict[str, str]:
+        """Represents self as a dict object.
+        """
+        return {key: getattr(self, key) for key in self._keys}
@@ -0,0 +1,49 @@
+"""Routers to search zip codes by addresses.
+"""
+import fastapi
+import fastapi.encoders
+import fastapi.responses
+import sqlalchemy.exc
+
+from .. import (
+    constants,
+    crud,
+    db,
+)
+
+
+ROUTER = fastapi.APIRouter()
+
+
+@ROUTER.get("/addresses/search")
+async def search_addresses(
+    q: str = fastapi.Query(min_length=1, max_length=constants.QUERY_LENGTH),
+    limit: int = fastapi.Query(
+        constants.LIMIT, ge=1, le=constants.MAX_LIMIT
+    ),
+    fuzzy: bool = False,
+    reader: db.Reader = fastapi.Depends(db.get_default_reader),
+):
+    """API: Search zip codes by (partial) addresses in kanji, kana or roman.
+
+    Addresses similar to ``q`` are found even if it has typos if ``fuzzy``.
+    """
+    try:
+        res = await reader.run(
+            crud.search_zipcodes_by_address,
+            crud.search_zipcodes_by_address_async,
+            q, limit=limit, fuzzy=fuzzy
+        )
+    except ValueError as exc:
+        raise fastapi.HTTPException(
+            status_code=fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(exc)
+        ) from exc
+    except sqlalchemy.exc.OperationalError as exc:
+        raise fastapi.HTTPException(
+            status_code=fastapi.status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The full-text search index of addresses is not available"
+        ) from exc
+
+    data = fastapi.encoders.jsonable_encoder([r.as_dict() for r in res])
+    return fastapi.responses.JSONResponse(content=data)
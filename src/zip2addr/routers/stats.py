@@ -0,0 +1,24 @@
+"""Routers to get the statistics of the web app.
+"""
+import fastapi
+
+from .. import cache, config, constants, memory
+
+
+ROUTER = fastapi.APIRouter()
+
+
+@ROUTER.get("/stats/")
+async def get_stats(
+    response_cache: cache.ResponseCache = fastapi.Depends(
+        cache.get_response_cache
+    )
+):
+    """API: Get the counters of the cache of responses, and the stats of
+    the in-memory store if the lookup engine is 'memory'.
+    """
+    res = dict(cache=response_cache.stats())
+    if config.get_lookup_engine() == "memory":
+        res["store"] = memory.get_store(constants.DATABASE_FILEPATH).stats()
+
+    return res
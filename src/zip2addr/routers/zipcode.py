@@ -1,48 +1,289 @@
 """Routers.
 """
+import base64
+import binascii
+import re
+import typing
+
 import fastapi
 import fastapi.encoders
 import fastapi.responses
-import sqlalchemy
-import sqlalchemy.orm
 
 from .. import (
+    cache,
+    config,
     constants,
     crud,
+    dataset,
     db,
+    memory,
     schemas,
+    snapshot,
+    trie,
 )
 
 
 ROUTER = fastapi.APIRouter()
 
+LookupEngine = typing.Union[snapshot.Snapshot, memory.Store]
+
+
+def get_lookup_engine() -> typing.Optional[LookupEngine]:
+    """
+    Get the engine to look up zip codes instead of the database if it's
+    configured, see :func:`zip2addr.config.get_lookup_engine`.
+    """
+    engine = config.get_lookup_engine()
+    if engine == "mmap":
+        return snapshot.get_snapshot(
+            snapshot.get_path(constants.DATABASE_FILEPATH)
+        )
+
+    if engine == "memory":
+        return memory.get_store(constants.DATABASE_FILEPATH)
+
+    return None
+
+
+def get_data_signature(
+    engine: typing.Optional[LookupEngine] = None
+) -> typing.Any:
+    """
+    Get the signature of the file zip codes are looked up from, to drop
+    responses cached if it was replaced or updated.
+
+    :param engine: The engine to look up zip codes if it's used
+    """
+    if isinstance(engine, memory.Store):
+        # It may be older than the file while a new one is being loaded.
+        return engine.signature
+
+    if config.get_lookup_engine() == "mmap":
+        return db.get_file_signature(
+            snapshot.get_path(constants.DATABASE_FILEPATH)
+        )
+
+    return db.get_file_signature(constants.DATABASE_FILEPATH)
+
+
+def get_dataset_version(
+    engine: typing.Optional[LookupEngine] = fastapi.Depends(
+        get_lookup_engine
+    )
+) -> typing.Optional[dataset.Version]:
+    """
+    Get the version of the dataset zip codes are looked up from, the one
+    loaded with the engine if it's used as it may be older than the database
+    while it's being reloaded or made again, or the one in the database.
+    """
+    if engine is not None:
+        return engine.version
+
+    return dataset.get_version(constants.DATABASE_FILEPATH)
+
+
+def check_dataset_version(
+    request: fastapi.Request, response: fastapi.Response,
+    version: typing.Optional[dataset.Version] = fastapi.Depends(
+        get_dataset_version
+    )
+) -> dict[str, str]:
+    """
+    Set the headers to validate caches of responses, ETag, Last-Modified and
+    Cache-Control, from the version of the dataset if it's available, and
+    answer 304 before looking up zip codes if If-None-Match matches it.
+    """
+    if version is None:
+        return {}
+
+    headers = version.get_headers()
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and version.matches(if_none_match):
+        raise fastapi.HTTPException(
+            status_code=fastapi.status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+
+    response.headers.update(headers)
+    return headers
+
+
+def get_trie(
+    version: typing.Optional[dataset.Version] = fastapi.Depends(
+        get_dataset_version
+    )
+) -> typing.Optional[trie.Trie]:
+    """
+    Get the trie of zip codes to count them if it's available and made from
+    the version of the dataset zip codes are looked up from.
+    """
+    return trie.get_trie_of_version(
+        trie.get_path(constants.DATABASE_FILEPATH), version
+    )
+
+
+def set_total_count(
+    response: fastapi.Response, zipcode_trie: typing.Optional[trie.Trie],
+    prefix: str = ""
+) -> typing.Optional[int]:
+    """
+    Set the total number of zip codes start with ``prefix`` in the header
+    and return it if the trie is available.
+    """
+    if zipcode_trie is None:
+        return None
+
+    total = zipcode_trie.count(prefix)
+    response.headers[constants.TOTAL_COUNT_HEADER] = str(total)
+    return total
+
+
+def encode_cursor(zipcode: str) -> str:
+    """Encode the zip code as an opaque cursor to get the next page.
+    """
+    return base64.urlsafe_b64encode(zipcode.encode("ascii")).decode("ascii")
+
+
+def decode_cursor(
+    after: typing.Optional[str] = None
+) -> typing.Optional[str]:
+    """
+    Decode the cursor given as a query parameter 'after' to get the zip code.
+    """
+    if after is None:
+        return None
+
+    try:
+        zipcode = base64.urlsafe_b64decode(after.encode("ascii")).decode(
+            "ascii"
+        )
+    except (binascii.Error, UnicodeError, ValueError):
+        zipcode = ""
+
+    if not re.fullmatch(constants.PARTIAL_ZIPCODE_PATTERN, zipcode) or \
+            len(zipcode) != constants.ZIPCODE_LENGTH:
+        raise fastapi.HTTPException(
+            status_code=fastapi.status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor: {after}"
+        )
+
+    return zipcode
+
+
+def set_next_cursor(
+    response: fastapi.Response, results: list[typing.Any], limit: int
+) -> list[typing.Any]:
+    """
+    Set the cursor to get the next page in the header if there may be more.
+    """
+    if results and 0 < limit <= len(results):
+        response.headers[constants.NEXT_CURSOR_HEADER] = encode_cursor(
+            results[-1].zipcode
+        )
+
+    return results
+
 
 @ROUTER.get("/zipcodes/", response_model=list[schemas.Zipcode])
 async def get_zipcodes(
+    response: fastapi.Response,
     skip: int = 0, limit: int = constants.LIMIT,
-    dbs: sqlalchemy.orm.Session = fastapi.Depends(db.get_default_session)
+    after: typing.Optional[str] = fastapi.Depends(decode_cursor),
+    reader: db.Reader = fastapi.Depends(db.get_default_reader),
+    engine: typing.Optional[LookupEngine] = fastapi.Depends(
+        get_lookup_engine
+    ),
+    zipcode_trie: typing.Optional[trie.Trie] = fastapi.Depends(get_trie),
+    _headers: dict[str, str] = fastapi.Depends(check_dataset_version)
 ):
     """API: usage.
+
+    Pass the cursor in the header X-Next-Cursor of the response as the query
+    parameter 'after' to get the next page. The total number of zip codes is
+    in the header X-Total-Count if the trie of them is available.
+
+    Responses have the headers ETag, Last-Modified and Cache-Control made
+    from the version of the dataset, and 304 is answered to requests have
+    If-None-Match matches the ETag, see :func:`check_dataset_version`.
+    """
+    set_total_count(response, zipcode_trie)
+    res: list[typing.Any]
+    if engine is not None:
+        res = engine.get_zipcodes(skip=skip, limit=limit, after=after)
+    else:
+        res = await reader.run(
+            crud.get_zipcodes, crud.get_zipcodes_async,
+            skip=skip, limit=limit, after=after
+        )
+
+    return set_next_cursor(response, res, limit)
+
+
+@ROUTER.post("/zipcodes/batch")
+async def get_zipcodes_by_zipcodes(
+    batch: schemas.ZipcodeBatch,
+    reader: db.Reader = fastapi.Depends(db.get_default_reader),
+    engine: typing.Optional[LookupEngine] = fastapi.Depends(
+        get_lookup_engine
+    )
+):
+    """API: Look up zip codes at once.
+
+    Results are in the order of the zip codes given, and have 'found' and
+    'result' which is null if the zip code was not found.
     """
-    return crud.get_zipcodes(dbs, skip=skip, limit=limit)
+    if engine is not None:
+        found = crud.lookup_zipcodes(engine, batch.zipcodes)
+    else:
+        found = await reader.run(
+            crud.get_zipcodes_by_zipcodes,
+            crud.get_zipcodes_by_zipcodes_async, batch.zipcodes
+        )
+
+    data = fastapi.encoders.jsonable_encoder(
+        crud.make_batch_results(batch.zipcodes, found)
+    )
+    return fastapi.responses.JSONResponse(content=data)
 
 
 # @ROUTER.get("/zipcodes/{zipcode}", response_model=schemas.Zipcode)
 @ROUTER.get("/zipcodes/{zipcode}")
 async def get_zipcode(
     zipcode: str,
-    dbs: sqlalchemy.orm.Session = fastapi.Depends(db.get_default_session)
+    reader: db.Reader = fastapi.Depends(db.get_default_reader),
+    engine: typing.Optional[LookupEngine] = fastapi.Depends(
+        get_lookup_engine
+    ),
+    response_cache: cache.ResponseCache = fastapi.Depends(
+        cache.get_response_cache
+    ),
+    headers: dict[str, str] = fastapi.Depends(check_dataset_version)
 ):
     """API: usage.
+
+    Responses are cached until the data file is replaced or updated.
     """
-    res = crud.get_zipcode(dbs, zipcode)
-    if res is None:
-        raise fastapi.HTTPException(
-            status_code=fastapi.status.HTTP_404_NOT_FOUND,
-            detail=f"Zip code was not found: {zipcode}"
-        )
-    data = fastapi.encoders.jsonable_encoder(res.as_dict())
-    return fastapi.responses.JSONResponse(content=data)
+    response_cache.validate(get_data_signature(engine))
+    body = response_cache.get(zipcode)
+    if body is None:
+        if engine is not None:
+            res = engine.get_zipcode(zipcode)
+        else:
+            res = await reader.run(
+                crud.get_zipcode, crud.get_zipcode_async, zipcode
+            )
+
+        if res is None:
+            raise fastapi.HTTPException(
+                status_code=fastapi.status.HTTP_404_NOT_FOUND,
+                detail=f"Zip code was not found: {zipcode}"
+            )
+        data = fastapi.encoders.jsonable_encoder(res.as_dict())
+        body = bytes(fastapi.responses.JSONResponse(content=data).body)
+        response_cache.set(zipcode, body)
+
+    return fastapi.Response(
+        content=body, media_type="application/json", headers=headers
+    )
 
 
 @ROUTER.get(
@@ -50,12 +291,37 @@ async def get_zipcode(
     response_model=list[schemas.Zipcode]
 )
 async def get_zipcodes_by_partial_zipcode(
-    partial_zipcode: str,
+    response: fastapi.Response,
+    partial_zipcode: str = fastapi.Path(
+        pattern=constants.PARTIAL_ZIPCODE_PATTERN
+    ),
     skip: int = 0, limit: int = constants.LIMIT,
-    dbs: sqlalchemy.orm.Session = fastapi.Depends(db.get_default_session)
+    after: typing.Optional[str] = fastapi.Depends(decode_cursor),
+    reader: db.Reader = fastapi.Depends(db.get_default_reader),
+    engine: typing.Optional[LookupEngine] = fastapi.Depends(
+        get_lookup_engine
+    ),
+    zipcode_trie: typing.Optional[trie.Trie] = fastapi.Depends(get_trie),
+    _headers: dict[str, str] = fastapi.Depends(check_dataset_version)
 ):
     """API: usage.
+
+    See :func:`get_zipcodes` about the cursor to get the next page, the
+    total number of zip codes found and the headers to validate caches.
     """
-    return crud.get_zipcodes_by_partial_zipcode(
-        dbs, partial_zipcode, skip=skip, limit=limit
-    )
+    if set_total_count(response, zipcode_trie, partial_zipcode) == 0:
+        return []
+
+    res: list[typing.Any]
+    if engine is not None:
+        res = engine.get_zipcodes_by_partial_zipcode(
+            partial_zipcode, skip=skip, limit=limit, after=after
+        )
+    else:
+        res = await reader.run(
+            crud.get_zipcodes_by_partial_zipcode,
+            crud.get_zipcodes_by_partial_zipcode_async,
+            partial_zipcode, skip=skip, limit=limit, after=after
+        )
+
+    return set_next_cursor(response, res, limit)
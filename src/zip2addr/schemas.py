@@ -68,6 +68,13 @@ class ZipcodeCreate(pydantic.BaseModel):
     zipcode: str
 
 
+class ZipcodeBatch(pydantic.BaseModel):
+    """Zip codes to look up at once."""
+    zipcodes: list[str] = pydantic.Field(
+        max_length=constants.BATCH_LOOKUP_LIMIT
+    )
+
+
 class Zipcode(ZipcodeCreate):
     """Zip code and address info."""
     id: int
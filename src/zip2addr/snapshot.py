@@ -0,0 +1,331 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh at gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=too-few-public-methods
+#
+"""Read-only binary snapshot of zip code data looked up with mmap.
+
+Format (all integers are unsigned 32 bit in little endian):
+
+- header: magic b"Z2AS", version (u16), the number of fields (u16), the
+  number of zip codes (n), the number of strings (m), the time the dataset
+  was built and the length of the hash of its sources (h)
+- source hash: h ASCII characters of the hash of the sources of the
+  dataset, and padding to align to 4 bytes; the version of the dataset,
+  see :class:`zip2addr.dataset.Version`, is not available if h is 0
+- zip codes: n zip codes of ZIPCODE_LENGTH ASCII characters sorted, and
+  padding to align to 4 bytes
+- records: n records of id, address_id and string ids of fields
+- string offsets: m + 1 offsets of strings in the string table
+- string table: deduplicated strings encoded in UTF-8
+
+Zip codes are looked up by binary search on the mmap-ed file and only the
+strings of the results are decoded, so that processes share one page-cached
+copy of the file.
+
+The version of the dataset is kept in the snapshot as it may be made from
+the database later than the database was updated, so that responses made
+from the snapshot are validated with the version of the data in it.
+"""
+import abc
+import mmap
+import pathlib
+import struct
+import typing
+
+from . import constants, dataset, db, records, utils
+
+
+MAGIC: typing.Final[bytes] = b"Z2AS"
+FORMAT_VERSION: typing.Final[int] = 2
+
+HEADER = struct.Struct("<4sHHIIII")
+
+FIELDS: tuple[str, ...] = (
+    "pref", "city_ward", "house_numbers",
+    "roman_pref", "roman_city_ward", "roman_house_numbers",
+    "kana_pref", "kana_city_ward", "kana_house_numbers",
+)
+
+# Snapshots cached with the signatures of the snapshot files.
+_SNAPSHOTS: "db.FileCache[Snapshot]" = db.FileCache()
+
+
+def get_path(db_path: typing.Union[str, pathlib.Path]) -> pathlib.Path:
+    """Get the path of the snapshot file of the database file.
+    """
+    return pathlib.Path(db_path).with_suffix(constants.SNAPSHOT_SUFFIX)
+
+
+def save(
+    zipcodes: typing.Iterable[typing.Mapping[str, typing.Any]],
+    filepath: pathlib.Path,
+    version: typing.Optional[dataset.Version] = None
+) -> int:
+    """
+    Save zip code data have id, zipcode, address_id and FIELDS as a snapshot
+    file atomically and return the number of zip codes saved.
+
+    :param version: The version of the dataset zip code data are from
+    :raises: ValueError if zip codes are not in the expected length
+    """
+    records: dict[bytes, tuple[int, ...]] = {}
+    strings: dict[str, int] = {}
+
+    for zdata in zipcodes:
+        zipcode = zdata["zipcode"].encode("ascii")
+        if len(zipcode) != constants.ZIPCODE_LENGTH:
+            raise ValueError(f"Invalid zip code: {zdata['zipcode']}")
+
+        if zipcode in records:
+            continue
+
+        records[zipcode] = (
+            zdata["id"], zdata["address_id"],
+            *(strings.setdefault(zdata[key] or "", len(strings))
+              for key in FIELDS)
+        )
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+
+    zipcodes_s = b"".join(sorted(records))
+    record = struct.Struct(f"<{2 + len(FIELDS)}I")
+    (source_hash, built_at) = (
+        (b"", 0) if version is None
+        else (version.source_hash.encode("ascii"), version.built_at)
+    )
+
+    with utils.open_atomically(filepath) as bfd:
+        bfd.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, len(FIELDS), len(records), len(strings),
+            built_at, len(source_hash)
+        ))
+        bfd.write(source_hash.ljust(utils.align(len(source_hash)), b"\0"))
+        bfd.write(zipcodes_s.ljust(utils.align(len(zipcodes_s)), b"\0"))
+        for zipcode in sorted(records):
+            bfd.write(record.pack(*records[zipcode]))
+        bfd.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        bfd.write(b"".join(encoded))
+
+    return len(records)
+
+
+class Zipcode(records.Record):
+    """
+    A record of a zip code and address info has the ids of them in the
+    database, can be used instead of models.ZipcodeLookup.
+    """
+    __slots__ = ("id", "address_id")
+
+    _keys = ("id", "address_id", "zipcode", *FIELDS)
+
+    def as_dict(self) -> dict[str, str]:
+        """Represents self as a dict object without ids.
+        """
+        return {key: getattr(self, key) for key in self._keys[2:]}
+
+
+class SortedZipcodes(abc.ABC):
+    """
+    Base class of zip code data sorted by zip codes and looked up by
+    prefixes of them with binary search.
+    """
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """Get the number of zip codes.
+        """
+
+    @abc.abstractmethod
+    def _get(self, idx: int) -> Zipcode:
+        """Get the zip code at ``idx``.
+        """
+
+    @abc.abstractmethod
+    def _find(self, prefix: str, right: bool = False) -> int:
+        """
+        Find the index of the first zip code starts with ``prefix`` or
+        greater than it, or the first one greater than all of zip codes start
+        with it if ``right``.
+        """
+
+    def _get_range(
+        self, start: int, end: int, skip: int = 0, limit: int = 0
+    ) -> list[Zipcode]:
+        """Get zip codes in the range [start + skip, end) up to ``limit``.
+        """
+        start += skip
+        if limit > 0:
+            end = min(end, start + limit)
+
+        return [self._get(idx) for idx in range(start, end)]
+
+    def _after(self, start: int, after: typing.Optional[str]) -> int:
+        """Get the index of the first zip code greater than ``after``.
+        """
+        if after is None:
+            return start
+
+        return max(start, self._find(after, right=True))
+
+    @abc.abstractmethod
+    def get_zipcode(self, zipcode: str) -> typing.Optional[Zipcode]:
+        """Get a zip code.
+        """
+
+    def get_zipcodes(
+        self, skip: int = 0, limit: int = constants.LIMIT,
+        after: typing.Optional[str] = None
+    ) -> list[Zipcode]:
+        """Get zip codes, greater than ``after`` if it's given.
+        """
+        if limit <= 0:
+            return []
+
+        return self._get_range(
+            self._after(0, after), len(self), skip=skip, limit=limit
+        )
+
+    def get_zipcodes_by_partial_zipcode(
+        self, partial_zipcode: str,
+        skip: int = 0, limit: int = constants.LIMIT,
+        after: typing.Optional[str] = None
+    ) -> list[Zipcode]:
+        """Get zip codes start with ``partial_zipcode``.
+        """
+        return self._get_range(
+            self._after(self._find(partial_zipcode), after),
+            self._find(partial_zipcode, right=True),
+            skip=skip, limit=limit
+        )
+
+
+class Snapshot(SortedZipcodes):
+    """A snapshot of zip code data mmap-ed.
+    """
+    def __init__(self, filepath: typing.Union[str, pathlib.Path]):
+        """
+        :raises: OSError, ValueError if the file is not a snapshot
+        """
+        with open(filepath, mode="rb") as bfd:
+            self._mmap = mmap.mmap(bfd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, nfields, self._size, nstrings, built_at,
+         hash_size) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != FORMAT_VERSION or \
+                nfields != len(FIELDS):
+            self._mmap.close()
+            raise ValueError(f"Not a snapshot: {filepath!s}")
+
+        self.version: typing.Optional[dataset.Version] = None
+        if hash_size:
+            self.version = dataset.Version(
+                self._mmap[HEADER.size:HEADER.size + hash_size].decode(
+                    "ascii"
+                ),
+                built_at
+            )
+
+        self._record = struct.Struct(f"<{2 + nfields}I")
+        self._zipcodes_offset = HEADER.size + utils.align(hash_size)
+        self._records_offset = self._zipcodes_offset + utils.align(
+            self._size * constants.ZIPCODE_LENGTH
+        )
+        self._offsets_offset = (
+            self._records_offset + self._size * self._record.size
+        )
+        self._strings_offset = self._offsets_offset + (nstrings + 1) * 4
+        self._view = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the mmap-ed file.
+        """
+        self._view.release()
+        self._mmap.close()
+
+    def _zipcode_at(self, idx: int, length: int) -> bytes:
+        """Get the first ``length`` bytes of the zip code at ``idx``.
+        """
+        start = self._zipcodes_offset + idx * constants.ZIPCODE_LENGTH
+        return self._mmap[start:start + length]
+
+    def _bisect(self, key: bytes, right: bool = False) -> int:
+        """
+        Find the index of the first zip code starts with ``key`` or greater
+        than it, or the first one greater than ``key`` if ``right``.
+        """
+        (low, high, length) = (0, self._size, len(key))
+        while low < high:
+            mid = (low + high) // 2
+            zipcode = self._zipcode_at(mid, length)
+            if zipcode < key or (right and zipcode == key):
+                low = mid + 1
+            else:
+                high = mid
+
+        return low
+
+    def _string(self, sid: int) -> str:
+        """Get the string of the id ``sid``.
+        """
+        (start, end) = struct.unpack_from(
+            "<II", self._mmap, self._offsets_offset + sid * 4
+        )
+        return str(
+            self._view[self._strings_offset + start:
+                       self._strings_offset + end],
+            "utf-8"
+        )
+
+    def _get(self, idx: int) -> Zipcode:
+        """Get the zip code at ``idx``.
+        """
+        (id_, address_id, *sids) = self._record.unpack_from(
+            self._mmap, self._records_offset + idx * self._record.size
+        )
+        zdata = dict(zip(FIELDS, (self._string(sid) for sid in sids)))
+        zdata.update(
+            id=id_, address_id=address_id,
+            zipcode=self._zipcode_at(
+                idx, constants.ZIPCODE_LENGTH
+            ).decode("ascii")
+        )
+        return Zipcode(zdata)
+
+    def _find(self, prefix: str, right: bool = False) -> int:
+        return self._bisect(
+            prefix.encode("ascii", errors="replace"), right=right
+        )
+
+    def get_zipcode(self, zipcode: str) -> typing.Optional[Zipcode]:
+        """Get a zip code.
+        """
+        key = zipcode.encode("ascii", errors="replace")
+        idx = self._bisect(key)
+        if idx < self._size and \
+                self._zipcode_at(idx, constants.ZIPCODE_LENGTH) == key:
+            return self._get(idx)
+
+        return None
+
+
+def get_snapshot(filepath: typing.Union[str, pathlib.Path]) -> Snapshot:
+    """
+    Get a cached snapshot, or open it again if the snapshot file was replaced
+    since the last call.
+
+    :raises: OSError, ValueError
+    """
+    # The old one is not closed explicitly as it may be in use yet.
+    return _SNAPSHOTS.get(filepath, Snapshot)[0]
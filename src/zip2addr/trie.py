@@ -0,0 +1,246 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh at gmail.com>
+# SPDX-License-Identifier: MIT
+#
+"""Digit trie of zip codes with the counts of them under each node.
+
+Zip codes are fixed length digits, so that these are indexed with a 10-ary
+tree, and the number of zip codes start with a prefix is found by walking
+down the tree in O(length of the prefix).
+
+Format (all integers are unsigned 32 bit in little endian):
+
+- header: magic b"Z2AT", version (u16), the depth (u16), the number of
+  inner nodes (i), the number of all nodes (n) and the length of the tag
+  (t)
+- tag: t bytes of the version of the dataset the trie was made from, see
+  :attr:`zip2addr.dataset.Version.etag`, and padding to align to 4 bytes
+- children: i x 10 node ids of the children of inner nodes for each digit,
+  or 0 if there is no child as the root (0) is not a child of any nodes
+- counts: n numbers of zip codes under nodes
+
+Nodes are numbered in breadth-first order, so that the leaves come last.
+
+Tries are made and replaced separately from databases, so that counts in a
+trie should be trusted only if its tag matches the version of the dataset in
+the database, see :func:`get_trie_of_db`.
+"""
+import mmap
+import pathlib
+import struct
+import typing
+
+from . import constants, dataset, db, utils
+
+
+MAGIC: typing.Final[bytes] = b"Z2AT"
+FORMAT_VERSION: typing.Final[int] = 3
+
+HEADER = struct.Struct("<4sHHIII")
+UINT = struct.Struct("<I")
+
+# Tries cached with the signatures of the trie files.
+_TRIES: "db.FileCache[Trie]" = db.FileCache()
+
+
+def get_path(db_path: typing.Union[str, pathlib.Path]) -> pathlib.Path:
+    """Get the path of the trie file of the database file.
+    """
+    return pathlib.Path(db_path).with_suffix(constants.TRIE_SUFFIX)
+
+
+def _get_levels(
+    keys: list[str], depth: int
+) -> list[tuple[list[str], list[int]]]:
+    """
+    Get the prefixes of each depth of sorted keys and the ranks of the first
+    keys start with them.
+    """
+    levels: list[tuple[list[str], list[int]]] = [([""], [0])]
+    for dep in range(1, depth + 1):
+        prefixes: list[str] = []
+        starts: list[int] = []
+        for idx, key in enumerate(keys):
+            if not prefixes or prefixes[-1] != key[:dep]:
+                prefixes.append(key[:dep])
+                starts.append(idx)
+        levels.append((prefixes, starts))
+
+    return levels
+
+
+def _get_children(
+    levels: list[tuple[list[str], list[int]]], bases: list[int]
+) -> list[int]:
+    """
+    Get the node ids of the children of inner nodes numbered from ``bases``,
+    the ids of the first nodes of each depth.
+    """
+    depth = len(levels) - 1
+    children = [0] * (bases[depth] * 10)
+    for dep in range(depth):
+        parents = levels[dep][0]
+        parent = 0
+        for idx, prefix in enumerate(levels[dep + 1][0]):
+            while parents[parent] != prefix[:dep]:
+                parent += 1
+
+            children[(bases[dep] + parent) * 10 + int(prefix[dep])] = (
+                bases[dep + 1] + idx
+            )
+
+    return children
+
+
+def save(
+    zipcodes: typing.Iterable[str], filepath: pathlib.Path, tag: str = ""
+) -> int:
+    """
+    Save the trie of zip codes as a file atomically and return the number of
+    zip codes saved.
+
+    :param tag: The version of the dataset zip codes are from
+    :raises: ValueError if zip codes are not digits in the expected length
+    """
+    keys = sorted(set(zipcodes))
+    depth = constants.ZIPCODE_LENGTH
+    for key in keys:
+        if len(key) != depth or not key.isdigit() or not key.isascii():
+            raise ValueError(f"Invalid zip code: {key}")
+
+    levels = _get_levels(keys, depth)
+    bases = [0]
+    for prefixes, _starts in levels:
+        bases.append(bases[-1] + len(prefixes))
+
+    counts: list[int] = []
+    for _prefixes, starts in levels:
+        counts.extend(
+            end - start
+            for start, end in zip(starts, starts[1:] + [len(keys)])
+        )
+
+    tag_b = tag.encode("utf-8")
+    with utils.open_atomically(filepath) as bfd:
+        bfd.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, depth, bases[depth], bases[-1], len(tag_b)
+        ))
+        bfd.write(tag_b.ljust(utils.align(len(tag_b)), b"\0"))
+        for values in (_get_children(levels, bases), counts):
+            bfd.write(struct.pack(f"<{len(values)}I", *values))
+
+    return len(keys)
+
+
+class Trie:
+    """A trie of zip codes mmap-ed.
+    """
+    def __init__(self, filepath: typing.Union[str, pathlib.Path]):
+        """
+        :raises: OSError, ValueError if the file is not a trie
+        """
+        with open(filepath, mode="rb") as bfd:
+            self._mmap = mmap.mmap(bfd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self._depth, ninners, _nnodes, tag_size) = (
+            HEADER.unpack_from(self._mmap)
+        )
+        if magic != MAGIC or version != FORMAT_VERSION or \
+                self._depth != constants.ZIPCODE_LENGTH:
+            self._mmap.close()
+            raise ValueError(f"Not a trie: {filepath!s}")
+
+        self.tag: str = self._mmap[
+            HEADER.size:HEADER.size + tag_size
+        ].decode("utf-8")
+        self._children_offset = HEADER.size + utils.align(tag_size)
+        self._counts_offset = self._children_offset + ninners * 10 * UINT.size
+
+    def __len__(self) -> int:
+        return self.count("")
+
+    def __enter__(self) -> "Trie":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the mmap-ed file.
+        """
+        self._mmap.close()
+
+    def _uint(self, offset: int, idx: int) -> int:
+        """Get the ``idx``-th integer of the array at ``offset``.
+        """
+        return UINT.unpack_from(self._mmap, offset + idx * UINT.size)[0]
+
+    def _find_node(self, prefix: str) -> typing.Optional[int]:
+        """Find the node of ``prefix`` by walking down from the root.
+        """
+        if len(prefix) > self._depth:
+            return None
+
+        node = 0
+        for char in prefix:
+            if not "0" <= char <= "9":
+                return None
+
+            node = self._uint(self._children_offset, node * 10 + int(char))
+            if node == 0:
+                return None
+
+        return node
+
+    def count(self, prefix: str) -> int:
+        """Get the number of zip codes start with ``prefix``.
+        """
+        node = self._find_node(prefix)
+        if node is None:
+            return 0
+
+        return self._uint(self._counts_offset, node)
+
+
+def get_trie(filepath: typing.Union[str, pathlib.Path]) -> Trie:
+    """
+    Get a cached trie, or open it again if the trie file was replaced since
+    the last call.
+
+    :raises: OSError, ValueError
+    """
+    # The old one is not closed explicitly as it may be in use yet.
+    return _TRIES.get(filepath, Trie)[0]
+
+
+def get_trie_of_version(
+    filepath: typing.Union[str, pathlib.Path],
+    version: typing.Optional[dataset.Version]
+) -> typing.Optional[Trie]:
+    """
+    Get the cached trie if it's available and it was made from the version
+    of the dataset ``version``, or None.
+    """
+    if version is None:
+        return None
+
+    try:
+        ztrie = get_trie(filepath)
+    except (OSError, ValueError):
+        return None
+
+    return ztrie if ztrie.tag == version.etag else None
+
+
+def get_trie_of_db(
+    db_path: typing.Union[str, pathlib.Path]
+) -> typing.Optional[Trie]:
+    """
+    Get the cached trie of the database file if it's available and it was
+    made from the same version of the dataset in the database, or None.
+    """
+    try:
+        version = dataset.get_version(db_path)
+    except (OSError, ValueError):
+        return None
+
+    return get_trie_of_version(get_path(db_path), version)
@@ -2,12 +2,27 @@
 
 pylint: disable=bare-except
 """
+import contextlib
+import itertools
 import logging
 import os
+import pathlib
+import re
+import typing
+import unicodedata
 
 from . import constants
 
 
+# Hiragana to katakana to match kana in either of them.
+HIRAGANA_TO_KATAKANA: dict[int, int] = {
+    code: code + 0x60 for code in range(ord("ぁ"), ord("ゖ") + 1)
+}
+
+# White spaces and hyphens users may or may not type in addresses.
+IGNORED_CHARS_RE = re.compile(r"[\s\-‐‑‒–—―−]+")
+
+
 def get_logger(name: str = constants.NAME):
     """Get logger instance.
     """
@@ -17,7 +32,10 @@ def get_logger(name: str = constants.NAME):
 def set_verbose_mode():
     """Make it running in verbose mode.
     """
-    get_logger().setLevel(logging.INFO)
+    logger = get_logger()
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
 
 
 def is_verbose_mode():
@@ -34,3 +52,70 @@ def get_term_lines():
         return os.get_terminal_size().lines
     except BaseException:
         return 50
+
+
+def chunks(
+    iterable: typing.Iterable[typing.Any], size: int
+) -> typing.Iterator[list[typing.Any]]:
+    """
+    Split an iterable into lists have ``size`` items at most.
+    """
+    itr = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(itr, size))
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def align(size: int, alignment: int = 4) -> int:
+    """Get the size aligned.
+    """
+    return (size + alignment - 1) // alignment * alignment
+
+
+def get_temporary_path(filepath: pathlib.Path) -> pathlib.Path:
+    """
+    Get the path of the temporary file of this process to make the file
+    ``filepath`` in the same dir, to replace it atomically.
+    """
+    return filepath.with_name(f".{filepath.name}.{os.getpid()}.tmp")
+
+
+@contextlib.contextmanager
+def open_atomically(
+    filepath: pathlib.Path
+) -> typing.Iterator[typing.BinaryIO]:
+    """
+    Open a temporary file to write and replace the file ``filepath`` with it
+    atomically only if it was written successfully.
+    """
+    tmppath = get_temporary_path(filepath)
+    try:
+        with tmppath.open(mode="wb") as bfd:
+            yield bfd
+
+        os.replace(tmppath, filepath)
+    finally:
+        if tmppath.exists():
+            tmppath.unlink()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text to match addresses users typed, e.g. 'ｻｯﾎﾟﾛ' and 'さっぽろ'
+    to 'サッポロ' and 'Kita 7-Jo' to 'kita7jo'.
+
+    It applies NFKC normalization, which unifies the widths of kana and
+    alphanumerics, case folding, and converting hiragana to katakana, and
+    removes white spaces and hyphens.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return IGNORED_CHARS_RE.sub("", text.translate(HIRAGANA_TO_KATAKANA))
+
+
+def get_trigrams(text: str) -> set[str]:
+    """Get trigrams, substrings of three characters, of text.
+    """
+    return {text[idx:idx + 3] for idx in range(len(text) - 2)}
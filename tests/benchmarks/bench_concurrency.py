@@ -0,0 +1,228 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=missing-function-docstring
+"""Benchmark concurrent lookups to the web app with sync and async sessions.
+
+Each app is served with uvicorn in its own process and requests are sent
+from this process, so that the cost of the client is not in the event loop
+of the app. Apps have the same routes reading the database with
+zip2addr.db.Reader, without the response cache and the other dependencies
+of the web app:
+
+- sync: sync sessions in the event loop, blocks it as the app did before
+- thread: sync sessions in worker threads, the default of the app
+- async: async sessions over aiosqlite, if ZIP2ADDR_DB_ASYNC is true
+
+It measures the throughput and the latency to answer concurrent requests,
+of single zip codes and pages of zip codes start with prefixes large enough
+to make the time of queries matter, and the longest time the event loop of
+the app was blocked while answering them.
+
+Usage: python tests/benchmarks/bench_concurrency.py [NUMBER [CONCURRENCY]]
+"""
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+
+import fastapi
+import httpx
+import uvicorn
+
+from zip2addr import constants, crud, datagen, db
+
+
+HOST = "127.0.0.1"
+PORT = 8765
+PAGE_SIZE = 500
+
+# Routes and the numbers of requests to them.
+ROUTES = (("zipcode", 2000), ("partial", 200))
+
+
+def make_zipcodes(number: int):
+    """Make synthetic zip code data have distinct zip codes."""
+    for idx in range(number):
+        pref = f"県{idx % 47}"
+        city_ward = f"市{idx % 1000}"
+        yield dict(
+            zipcode=f"{idx * (10 ** 7 // number):07d}",
+            pref=pref, city_ward=city_ward, house_numbers=f"町{idx}",
+            roman_pref=f"KEN{idx % 47}", roman_city_ward=f"SHI{idx % 1000}",
+            roman_house_numbers=f"CHO{idx}",
+            kana_pref=f"ｹﾝ{idx % 47}", kana_city_ward=f"ｼ{idx % 1000}",
+            kana_house_numbers=f"ﾁｮｳ{idx}",
+        )
+
+
+def watch_loop_lag(app: fastapi.FastAPI, interval: float = 0.001):
+    """Measure the longest delay of the event loop of the app."""
+    app.state.lag = 0.0
+
+    @contextlib.asynccontextmanager
+    async def lifespan(_app):
+        async def watch():
+            while True:
+                start = time.perf_counter()
+                await asyncio.sleep(interval)
+                app.state.lag = max(
+                    app.state.lag, time.perf_counter() - start - interval
+                )
+
+        task = asyncio.create_task(watch())
+        yield
+        task.cancel()
+        await db.dispose_async_engines()
+        db.dispose_engines()
+
+    app.router.lifespan_context = lifespan
+
+    @app.get("/lag")
+    async def get_lag():
+        (lag, app.state.lag) = (app.state.lag, 0.0)
+        return dict(lag=lag)
+
+
+class BlockingReader(db.Reader):
+    """Run sync crud functions in the event loop as before."""
+    async def run(self, func, afunc, *args, **kwargs):
+        return func(self.dbs, *args, **kwargs)
+
+
+def make_app(mode: str, db_path: str) -> fastapi.FastAPI:
+    app = fastapi.FastAPI()
+    watch_loop_lag(app)
+
+    async def get_reader():
+        async for reader in db.get_reader(
+            db_path, use_async=mode == "async"
+        ):
+            if mode == "sync":
+                reader = BlockingReader(dbs=reader.dbs)
+            yield reader
+
+    @app.get("/zipcodes/{zipcode}")
+    async def get_zipcode(
+        zipcode: str, reader: db.Reader = fastapi.Depends(get_reader)
+    ):
+        res = await reader.run(
+            crud.get_zipcode, crud.get_zipcode_async, zipcode
+        )
+        return res.as_dict()
+
+    @app.get("/zipcodes/partial/{prefix}")
+    async def get_zipcodes(
+        prefix: str, limit: int = PAGE_SIZE,
+        reader: db.Reader = fastapi.Depends(get_reader)
+    ):
+        res = await reader.run(
+            crud.get_zipcodes_by_partial_zipcode,
+            crud.get_zipcodes_by_partial_zipcode_async, prefix, limit=limit
+        )
+        return [z.as_dict() for z in res]
+
+    return app
+
+
+def serve(mode: str, db_path: str):
+    uvicorn.run(
+        make_app(mode, db_path), host=HOST, port=PORT, log_level="warning"
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.get("/lag")
+            return
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise
+
+            await asyncio.sleep(0.05)
+
+
+async def run(
+    paths: list[str], concurrency: int
+) -> tuple[float, list[float], float]:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=f"http://{HOST}:{PORT}", limits=limits, timeout=60
+    ) as client:
+        await wait_until_ready(client)
+        for path in paths[:concurrency]:  # warm up.
+            await client.get(path)
+        await client.get("/lag")
+
+        latencies: list[float] = []
+        pending = iter(paths)
+
+        async def worker():
+            for path in pending:
+                start = time.perf_counter()
+                resp = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                assert resp.status_code == 200, resp.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        lag = (await client.get("/lag")).json()["lag"]
+
+    return (elapsed, latencies, lag)
+
+
+def get_paths(route: str, requests: int, zipcodes: list[str]) -> list[str]:
+    if route == "zipcode":
+        return [
+            f"/zipcodes/{zipcodes[i * 7919 % len(zipcodes)]}"
+            for i in range(requests)
+        ]
+
+    return [f"/zipcodes/partial/{i % 100:02d}" for i in range(requests)]
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    number = int(args[0]) if args else 100_000
+    concurrency = int(args[1]) if len(args) > 1 else 50
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = pathlib.Path(tmpdir) / constants.DATABASE_FILENAME
+        datagen.save_zipcodes_as_db(make_zipcodes(number), db_path)
+        zipcodes = [z["zipcode"] for z in make_zipcodes(number)]
+
+        print(f"{number} zip codes, {concurrency} concurrent requests, "
+              f"{PAGE_SIZE} zip codes per page of partial searches, "
+              f"{os.cpu_count()} CPUs shared with the client")
+        for route, requests in ROUTES:
+            paths = get_paths(route, requests, zipcodes)
+            for mode in ("sync", "thread", "async"):
+                proc = multiprocessing.Process(
+                    target=serve, args=(mode, str(db_path)), daemon=True
+                )
+                proc.start()
+                try:
+                    (elapsed, lats, lag) = asyncio.run(
+                        run(paths, concurrency)
+                    )
+                finally:
+                    proc.terminate()
+                    proc.join()
+
+                lats.sort()
+                print(f"{route:<8} {mode:<7} {len(paths) / elapsed:8.1f} "
+                      f"req/s, p50 {statistics.median(lats) * 1e3:7.1f} ms, "
+                      f"p99 {lats[int(len(lats) * 0.99)] * 1e3:7.1f} ms, "
+                      f"the loop was blocked {lag * 1e3:6.1f} ms at most")
+
+
+if __name__ == "__main__":
+    main()
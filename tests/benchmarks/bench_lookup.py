@@ -0,0 +1,104 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=missing-function-docstring
+"""Benchmark the latency of zip code lookups with some ways to get sessions.
+
+Usage: python tests/benchmarks/bench_lookup.py [DB_PATH [NUMBER]]
+"""
+import pathlib
+import sys
+import timeit
+import typing
+
+from zip2addr import crud, db, memory
+
+
+DATADIR = pathlib.Path(__file__).parent.parent / "data"
+ZIPCODE = "0600000"
+
+
+def lookup(session_class):
+    dbs = session_class()
+    try:
+        return crud.get_zipcode(dbs, ZIPCODE).as_dict()
+    finally:
+        dbs.close()
+
+
+def per_request(db_path):
+    """A new engine and a session class per request."""
+    cls = db.get_session_class(db_path)
+    try:
+        return lookup(cls)
+    finally:
+        cls.kw["bind"].dispose()
+
+
+def registry(db_path):
+    """The engine and the session class shared among requests."""
+    return lookup(db.get_reloadable_session_class(db_path))
+
+
+SESSION_CLASSES: dict[str, typing.Any] = {}
+
+
+def shared(db_path, **options):
+    key = f"{db_path}:{options!r}"
+    if key not in SESSION_CLASSES:
+        SESSION_CLASSES[key] = db.get_session_class(
+            db_path, read_only=True, engine_options=options
+        )
+
+    return lookup(SESSION_CLASSES[key])
+
+
+def read_write(db_path):
+    """The shared engine opens the file in read-write mode."""
+    return shared(db_path)
+
+
+def read_only(db_path):
+    """The shared engine opens the file in read-only mode, tuned."""
+    return shared(db_path, read_only=True)
+
+
+def immutable(db_path):
+    """The shared engine opens the file as immutable."""
+    return shared(db_path, read_only=True, immutable=True)
+
+
+def in_memory(db_path):
+    """All zip codes loaded into memory once."""
+    return memory.get_store(db_path).get_zipcode(ZIPCODE).as_dict()
+
+
+BENCHMARKS = (
+    per_request, registry, read_write, read_only, immutable, in_memory
+)
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    db_path = args[0] if args else str(DATADIR / "zipcodes.db")
+    number = int(args[1]) if len(args) > 1 else 1000
+
+    for bench in BENCHMARKS:
+        secs = min(
+            timeit.repeat(lambda: bench(db_path), number=number, repeat=3)
+        )
+        print(f"{bench.__name__:<16} {secs / number * 1e6:10.1f} usec/lookup")
+
+    store = memory.get_store(db_path)
+    print(
+        f"memory: loaded {len(store)} zip codes in {store.load_time:.3f} "
+        f"secs, max RSS={store.max_rss}"
+    )
+
+    db.dispose_engines()
+    for cls in SESSION_CLASSES.values():
+        cls.kw["bind"].dispose()
+
+
+if __name__ == "__main__":
+    main()
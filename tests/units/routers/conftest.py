@@ -7,10 +7,76 @@
 # pylint: disable=missing-class-docstring
 # pylint: disable=missing-function-docstring
 import pathlib
+import shutil
 
 import pytest
+import sqlalchemy
+import sqlalchemy.ext.asyncio
+import sqlalchemy.pool
+
+from zip2addr import (
+    cache,
+    constants,
+    db,
+    main,
+)
 
 
 @pytest.fixture(name="my_datadir")
 def get_datadir(request) -> pathlib.Path:
     return pathlib.Path(request.fspath).parent.parent.parent / "data"
+
+
+@pytest.fixture(scope="function", name="my_db", params=("sync", "async"))
+def db_session(my_datadir, tmp_path, request):
+    """
+    .. seealso::
+
+       - https://fastapi.tiangolo.com/ja/advanced/testing-database/
+       - zip2addr.db.get_default_reader
+    """
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    shutil.copyfile(my_datadir / constants.DATABASE_FILENAME, db_path)
+
+    if request.param == "async":
+        # Connections are not pooled to close them in the event loop used
+        # them.
+        engine = sqlalchemy.ext.asyncio.create_async_engine(
+            f"sqlite+aiosqlite:///{db_path}",
+            poolclass=sqlalchemy.pool.NullPool
+        )
+        acls = sqlalchemy.ext.asyncio.async_sessionmaker(bind=engine)
+
+        async def get_reader():
+            """For tests.
+            """
+            async with acls() as adbs:
+                yield db.Reader(adbs=adbs)
+    else:
+        cls = db.get_session_class(
+            db_path, read_only=True, engine_options=dict(read_only=True)
+        )
+
+        async def get_reader():
+            """For tests.
+            """
+            dbs = cls()
+            try:
+                yield db.Reader(dbs=dbs)
+            finally:
+                dbs.close()
+
+    main.APP.dependency_overrides[db.get_default_reader] = get_reader
+
+    # Responses are not shared among tests.
+    response_cache = cache.ResponseCache(maxsize=16, ttl=60)
+    main.APP.dependency_overrides[
+        cache.get_response_cache
+    ] = lambda: response_cache
+
+    yield db_path
+
+    del main.APP.dependency_overrides[db.get_default_reader]
+    del main.APP.dependency_overrides[cache.get_response_cache]
+    if request.param != "async":
+        cls.kw["bind"].dispose()
@@ -0,0 +1,88 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+import fastapi
+import fastapi.testclient
+import pytest
+import sqlalchemy
+
+from zip2addr import constants, main, models
+
+
+CLIENT = fastapi.testclient.TestClient(main.APP)
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    (("与那国", ["9071800", "9071801"]),
+     ("ﾖﾅｸﾞﾆ", ["9071800", "9071801"]),
+     ("yonaguni", ["9071800", "9071801"]),
+     ("札幌市 中央区 旭", ["0640941"]),
+     ("存在しない住所", []),
+     )
+)
+def test_search_addresses(query, expected, my_db):
+    resp = CLIENT.get("/addresses/search", params=dict(q=query))
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert sorted(r["zipcode"] for r in resp.json()) == expected
+
+
+def test_search_addresses_limit(my_db):
+    resp = CLIENT.get("/addresses/search", params=dict(q="沖縄", limit=2))
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert len(resp.json()) == 2
+    assert all(r["pref"] == "沖縄県" for r in resp.json())
+
+
+@pytest.mark.parametrize("fuzzy", (False, True))
+@pytest.mark.parametrize(
+    ("limit", ),
+    ((0, ),
+     (-1, ),
+     (constants.MAX_LIMIT + 1, ),
+     )
+)
+def test_search_addresses_invalid_limit(limit, fuzzy, my_db):
+    resp = CLIENT.get(
+        "/addresses/search", params=dict(q="与那国町", limit=limit, fuzzy=fuzzy)
+    )
+    assert resp.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_search_addresses_without_index(my_db):
+    engine = sqlalchemy.create_engine(f"sqlite:///{my_db}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE {models.ADDRESS_FTS.name}")
+    engine.dispose()
+
+    resp = CLIENT.get("/addresses/search", params=dict(q="与那国"))
+    assert resp.status_code == fastapi.status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    (("yonagni cho yonaguni", "9071801"),
+     ("札悼市中央区旭ケ丘", "0640941"),
+     )
+)
+def test_search_addresses_fuzzily(query, expected, my_db):
+    resp = CLIENT.get(
+        "/addresses/search", params=dict(q=query, fuzzy=True, limit=1)
+    )
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert [r["zipcode"] for r in resp.json()] == [expected]
+
+
+@pytest.mark.parametrize(
+    ("query", ),
+    (("", ),
+     ("  ", ),
+     ("x" * 101, ),
+     )
+)
+def test_search_addresses_invalid(query, my_db):
+    resp = CLIENT.get("/addresses/search", params=dict(q=query))
+    assert resp.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
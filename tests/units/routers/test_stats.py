@@ -0,0 +1,42 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+import fastapi
+import fastapi.testclient
+
+from zip2addr import (
+    constants,
+    main,
+    memory,
+)
+
+
+CLIENT = fastapi.testclient.TestClient(main.APP)
+
+
+def test_get_stats(my_db):
+    for zipcode in ("9071801", "9071801", "0000000"):
+        CLIENT.get(f"/zipcodes/{zipcode}")
+
+    resp = CLIENT.get("/stats/")
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert resp.json()["cache"] == dict(
+        size=1, maxsize=16, hits=1, misses=2, evictions=0, expirations=0,
+        invalidations=0
+    )
+    assert "store" not in resp.json()
+
+
+def test_get_stats_memory(my_db, monkeypatch):
+    monkeypatch.setattr(constants, "DATABASE_FILEPATH", str(my_db))
+    monkeypatch.setenv("ZIP2ADDR_LOOKUP_ENGINE", "memory")
+
+    resp = CLIENT.get("/stats/")
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    store = memory.get_store(my_db)
+    assert resp.json()["store"] == dict(
+        size=len(store), load_time=store.load_time, max_rss=store.max_rss
+    )
@@ -12,57 +12,30 @@
 # .. seealso::
 #    https://fastapi.tiangolo.com/tutorial/testing/
 #
-import shutil
+import os
 import typing
 
 import fastapi
 import fastapi.testclient
-import sqlalchemy
 import pytest
 
 from zip2addr import (
+    cache,
     constants,
+    dataset,
+    datagen,
     db,
     main,
+    memory,
+    snapshot,
+    trie,
 )
-# from zip2addr.routers import zipcode as TT
+from zip2addr.routers import zipcode as TT
 
 
 CLIENT = fastapi.testclient.TestClient(main.APP)
 
 
-@pytest.fixture(scope="function", name="my_db")
-def db_session(my_datadir, tmp_path):
-    """
-    .. seealso::
-
-       - https://fastapi.tiangolo.com/ja/advanced/testing-database/
-       - zip2addr.db.get_session_ctx
-    """
-    db_path = tmp_path / constants.DATABASE_FILENAME
-    shutil.copyfile(my_datadir / constants.DATABASE_FILENAME, db_path)
-
-    dbs = db.get_session_class(db_path)()
-
-    def get_session():
-        """For tests.
-        """
-        try:
-            yield dbs
-        except sqlalchemy.exc.SQLAlchemyError as exc:
-            assert exc is not None
-            dbs.rollback()
-        finally:
-            dbs.rollback()
-            dbs.close()
-
-    main.APP.dependency_overrides[
-        db.get_default_session
-    ] = get_session
-
-    yield dbs
-
-
 def test_get_zipcodes(my_db):
     resp = CLIENT.get("/zipcodes/")
     assert resp.status_code == 200
@@ -145,3 +118,339 @@ def test_get_zipcodes_by_partial_zipcode(
         assert not resp.json()
     else:
         assert len(resp.json()) >= min_n_results
+
+
+@pytest.mark.parametrize(
+    ("partial_zipcode", ),
+    (("06a", ),
+     ("０６", ),
+     ("06000001", ),
+     )
+)
+def test_get_zipcodes_by_partial_zipcode_invalid(partial_zipcode, my_db):
+    resp = CLIENT.get(f"/zipcodes/partial/{partial_zipcode}")
+    assert resp.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def _walk_pages(path, limit):
+    (pages, after) = ([], None)
+    while True:
+        params = dict(limit=limit)
+        if after is not None:
+            params["after"] = after
+
+        resp = CLIENT.get(path, params=params)
+        assert resp.status_code == fastapi.status.HTTP_200_OK
+        pages.append([z["zipcode"] for z in resp.json()])
+
+        after = resp.headers.get(constants.NEXT_CURSOR_HEADER)
+        if after is None:
+            return pages
+
+
+@pytest.mark.parametrize(
+    ("path", ),
+    (("/zipcodes/", ),
+     ("/zipcodes/partial/0", ),
+     )
+)
+def test_get_zipcodes_with_cursor(path, my_db):
+    resp = CLIENT.get(path, params=dict(limit=1000))
+    expected = [z["zipcode"] for z in resp.json()]
+    assert expected
+    assert constants.NEXT_CURSOR_HEADER not in resp.headers
+
+    pages = _walk_pages(path, 5)
+    assert all(len(page) == 5 for page in pages[:-1])
+    assert sum(pages, []) == expected
+
+
+def test_get_zipcodes_with_invalid_cursor(my_db):
+    for after in ("!!", TT.encode_cursor("060"), TT.encode_cursor("abcdefg")):
+        resp = CLIENT.get("/zipcodes/", params=dict(after=after))
+        assert resp.status_code == fastapi.status.HTTP_400_BAD_REQUEST
+
+
+@pytest.fixture(name="my_snapshot")
+def get_snapshot(my_db, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    datagen.save_db_as_snapshot(db_path)
+    snap = snapshot.Snapshot(snapshot.get_path(db_path))
+
+    main.APP.dependency_overrides[TT.get_lookup_engine] = lambda: snap
+    yield snap
+
+    del main.APP.dependency_overrides[TT.get_lookup_engine]
+    snap.close()
+
+
+def test_get_lookup_engine(my_db, monkeypatch):
+    monkeypatch.setenv("ZIP2ADDR_LOOKUP_ENGINE", "sql")
+    assert TT.get_lookup_engine() is None
+
+    monkeypatch.setattr(constants, "DATABASE_FILEPATH", str(my_db))
+    monkeypatch.setenv("ZIP2ADDR_LOOKUP_ENGINE", "memory")
+    assert isinstance(TT.get_lookup_engine(), memory.Store)
+
+
+def test_mmap_engine(my_snapshot, my_db):
+    resp = CLIENT.get("/zipcodes/?limit=5")
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert [z["zipcode"] for z in resp.json()] == [
+        z.zipcode for z in my_snapshot.get_zipcodes(limit=5)
+    ]
+
+    resp = CLIENT.get("/zipcodes/9071801")
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert resp.json() == my_snapshot.get_zipcode("9071801").as_dict()
+    assert resp.json()["pref"] == "沖縄県"
+
+    resp = CLIENT.get("/zipcodes/0000000")
+    assert resp.status_code == fastapi.status.HTTP_404_NOT_FOUND
+
+    resp = CLIENT.get("/zipcodes/partial/907")
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert resp.json()
+    assert all(z["zipcode"].startswith("907") for z in resp.json())
+
+    assert sum(_walk_pages("/zipcodes/", 5), []) == [
+        z.zipcode for z in my_snapshot.get_zipcodes(limit=len(my_snapshot))
+    ]
+
+
+def test_get_data_signature_memory(my_db):
+    store = memory.Store.load(my_db)
+    assert TT.get_data_signature(store) == db.get_file_signature(my_db)
+
+    # The store is older than the file while a new one is being loaded.
+    stat = my_db.stat()
+    os.utime(my_db, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert TT.get_data_signature(store) == store.signature
+    assert store.signature != db.get_file_signature(my_db)
+
+
+def test_memory_engine(my_db):
+    store = memory.Store.load(my_db)
+    main.APP.dependency_overrides[TT.get_lookup_engine] = lambda: store
+    try:
+        resp = CLIENT.get("/zipcodes/9071801")
+        assert resp.status_code == fastapi.status.HTTP_200_OK
+        assert resp.json() == store.get_zipcode("9071801").as_dict()
+
+        resp = CLIENT.get("/zipcodes/0000000")
+        assert resp.status_code == fastapi.status.HTTP_404_NOT_FOUND
+
+        resp = CLIENT.get("/zipcodes/partial/907")
+        assert [z["zipcode"] for z in resp.json()] == [
+            z.zipcode for z in store.get_zipcodes_by_partial_zipcode("907")
+        ]
+
+        assert sum(_walk_pages("/zipcodes/", 5), []) == [
+            z.zipcode for z in store.get_zipcodes(limit=len(store))
+        ]
+    finally:
+        del main.APP.dependency_overrides[TT.get_lookup_engine]
+
+
+@pytest.fixture(name="my_trie")
+def get_trie(my_db):
+    datagen.save_db_as_trie(my_db)
+    ztrie = trie.Trie(trie.get_path(my_db))
+
+    main.APP.dependency_overrides[TT.get_trie] = lambda: ztrie
+    yield ztrie
+
+    del main.APP.dependency_overrides[TT.get_trie]
+    ztrie.close()
+
+
+def test_get_trie(my_db, monkeypatch):
+    monkeypatch.setattr(constants, "DATABASE_FILEPATH", str(my_db))
+    version = dataset.get_version(my_db)
+    assert TT.get_trie(version) is None
+
+    datagen.save_db_as_trie(my_db)
+    assert isinstance(TT.get_trie(version), trie.Trie)
+    assert TT.get_trie(None) is None
+
+    # Zip codes are looked up if the trie is stale, not made from the
+    # dataset in the database.
+    trie.save([], trie.get_path(my_db), tag='"stale"')
+    assert TT.get_trie(version) is None
+
+    resp = CLIENT.get("/zipcodes/partial/907")
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert resp.json()
+    assert constants.TOTAL_COUNT_HEADER not in resp.headers
+
+
+@pytest.mark.parametrize(
+    ("path", "prefix"),
+    (("/zipcodes/", ""),
+     ("/zipcodes/partial/0", "0"),
+     ("/zipcodes/partial/907", "907"),
+     ("/zipcodes/partial/9071801", "9071801"),
+     )
+)
+def test_get_zipcodes_total_count(path, prefix, my_trie):
+    resp = CLIENT.get(path, params=dict(limit=2))
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert len(resp.json()) <= 2
+
+    total = int(resp.headers[constants.TOTAL_COUNT_HEADER])
+    assert total == my_trie.count(prefix)
+    assert total == len(sum(_walk_pages(path, 5), []))
+
+
+def test_get_zipcodes_total_count_not_found(my_trie):
+    resp = CLIENT.get("/zipcodes/partial/000")
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert resp.json() == []
+    assert resp.headers[constants.TOTAL_COUNT_HEADER] == "0"
+
+
+def test_get_zipcodes_without_trie(my_db):
+    main.APP.dependency_overrides[TT.get_trie] = lambda: None
+    try:
+        resp = CLIENT.get("/zipcodes/partial/907")
+        assert resp.json()
+        assert constants.TOTAL_COUNT_HEADER not in resp.headers
+    finally:
+        del main.APP.dependency_overrides[TT.get_trie]
+
+
+def test_get_zipcode_cached(my_db, monkeypatch):
+    monkeypatch.setattr(constants, "DATABASE_FILEPATH", str(my_db))
+    rcache = main.APP.dependency_overrides[cache.get_response_cache]()
+
+    resp = CLIENT.get("/zipcodes/9071801")
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert (rcache.hits, rcache.misses) == (0, 1)
+
+    cached = CLIENT.get("/zipcodes/9071801")
+    assert cached.json() == resp.json()
+    assert cached.headers["content-type"] == "application/json"
+    assert (rcache.hits, rcache.misses) == (1, 1)
+
+    # Responses cached are dropped if the database file was updated.
+    stat = my_db.stat()
+    os.utime(my_db, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert CLIENT.get("/zipcodes/9071801").json() == resp.json()
+    assert (rcache.hits, rcache.misses) == (1, 2)
+    assert rcache.invalidations == 1
+
+
+@pytest.mark.parametrize(
+    ("path", ),
+    (("/zipcodes/", ),
+     ("/zipcodes/9071801", ),
+     ("/zipcodes/partial/907", ),
+     )
+)
+def test_conditional_requests(path, my_db, monkeypatch):
+    monkeypatch.setattr(constants, "DATABASE_FILEPATH", str(my_db))
+    version = dataset.get_version(my_db)
+
+    resp = CLIENT.get(path)
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert resp.json()
+    for key, val in version.get_headers().items():
+        assert resp.headers[key] == val
+
+    resp = CLIENT.get(path, headers={"If-None-Match": version.etag})
+    assert resp.status_code == fastapi.status.HTTP_304_NOT_MODIFIED
+    assert not resp.content
+    assert resp.headers["ETag"] == version.etag
+
+    resp = CLIENT.get(path, headers={"If-None-Match": '"other"'})
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert resp.json()
+
+
+@pytest.mark.parametrize(
+    ("engine", ),
+    (("mmap", ),
+     ("memory", ),
+     )
+)
+def test_conditional_requests_with_engine(engine, my_db, monkeypatch):
+    monkeypatch.setattr(constants, "DATABASE_FILEPATH", str(my_db))
+    if engine == "mmap":
+        datagen.save_db_as_snapshot(my_db)
+        leng = snapshot.Snapshot(snapshot.get_path(my_db))
+    else:
+        leng = memory.Store.load(my_db)
+
+    # The database was updated but the engine is not reloaded yet.
+    sql_engine = db.get_engine(my_db)
+    with sql_engine.begin() as conn:
+        datagen.stamp_dataset_version(conn, "0" * 64, built_at=1)
+    sql_engine.dispose()
+
+    version = leng.version
+    assert version is not None
+    assert version.etag != dataset.load(my_db).etag
+
+    main.APP.dependency_overrides[TT.get_lookup_engine] = lambda: leng
+    try:
+        resp = CLIENT.get("/zipcodes/9071801")
+        assert resp.status_code == fastapi.status.HTTP_200_OK
+        assert resp.headers["ETag"] == version.etag
+        assert resp.headers["Last-Modified"] == version.last_modified
+
+        resp = CLIENT.get(
+            "/zipcodes/9071801", headers={"If-None-Match": version.etag}
+        )
+        assert resp.status_code == fastapi.status.HTTP_304_NOT_MODIFIED
+    finally:
+        del main.APP.dependency_overrides[TT.get_lookup_engine]
+        if engine == "mmap":
+            leng.close()
+
+
+def test_conditional_requests_without_version(my_db):
+    resp = CLIENT.get("/zipcodes/9071801")
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert "ETag" not in resp.headers
+
+    resp = CLIENT.get("/zipcodes/9071801", headers={"If-None-Match": "*"})
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+
+
+def test_get_zipcodes_by_zipcodes(my_db):
+    zipcodes = ["9071801", "0000000", "abc", "0600000", "9071801"]
+    resp = CLIENT.post("/zipcodes/batch", json=dict(zipcodes=zipcodes))
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+
+    res = resp.json()
+    assert [r["zipcode"] for r in res] == zipcodes
+    assert [r["found"] for r in res] == [True, False, False, True, True]
+    assert res[0]["result"] == CLIENT.get("/zipcodes/9071801").json()
+    assert res[1]["result"] is None
+
+    resp = CLIENT.post("/zipcodes/batch", json=dict(zipcodes=[]))
+    assert resp.json() == []
+
+
+def test_get_zipcodes_by_zipcodes_with_engine(my_snapshot):
+    resp = CLIENT.post(
+        "/zipcodes/batch", json=dict(zipcodes=["9071801", "0000000"])
+    )
+    assert resp.status_code == fastapi.status.HTTP_200_OK
+    assert resp.json() == [
+        dict(zipcode="9071801", found=True,
+             result=my_snapshot.get_zipcode("9071801").as_dict()),
+        dict(zipcode="0000000", found=False, result=None),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("body", ),
+    (({}, ),
+     (dict(zipcodes="9071801"), ),
+     (dict(zipcodes=["0600000"] * (constants.BATCH_LOOKUP_LIMIT + 1)), ),
+     )
+)
+def test_get_zipcodes_by_zipcodes_invalid(body, my_db):
+    resp = CLIENT.post("/zipcodes/batch", json=body)
+    assert resp.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
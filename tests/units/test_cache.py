@@ -0,0 +1,79 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+from zip2addr import (
+    cache as TT,
+)
+
+
+class Timer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_response_cache_lru():
+    rcache = TT.ResponseCache(maxsize=2, ttl=60)
+    assert rcache.get("a") is None
+
+    rcache.set("a", b"A")
+    rcache.set("b", b"B")
+    assert rcache.get("a") == b"A"
+
+    rcache.set("c", b"C")  # "b" is the least recently used one.
+    assert len(rcache) == 2
+    assert rcache.get("b") is None
+    assert rcache.get("c") == b"C"
+
+    assert rcache.stats() == dict(
+        size=2, maxsize=2, hits=2, misses=2, evictions=1, expirations=0,
+        invalidations=0
+    )
+
+
+def test_response_cache_ttl():
+    timer = Timer()
+    rcache = TT.ResponseCache(maxsize=2, ttl=10, timer=timer)
+    rcache.set("a", b"A")
+
+    timer.now = 10
+    assert rcache.get("a") == b"A"
+
+    timer.now = 10.1
+    assert rcache.get("a") is None
+    assert len(rcache) == 0
+    assert rcache.expirations == 1
+
+
+def test_response_cache_validate():
+    rcache = TT.ResponseCache(maxsize=2, ttl=60)
+    rcache.validate((1, 2, 3))
+    rcache.set("a", b"A")
+
+    rcache.validate((1, 2, 3))
+    assert rcache.get("a") == b"A"
+
+    rcache.validate((1, 2, 4))
+    assert rcache.get("a") is None
+    assert rcache.invalidations == 1
+
+
+def test_response_cache_disabled():
+    rcache = TT.ResponseCache(maxsize=0, ttl=60)
+    rcache.set("a", b"A")
+    assert rcache.get("a") is None
+    assert len(rcache) == 0
+
+
+def test_get_response_cache(monkeypatch):
+    monkeypatch.setattr(TT, "_CACHE", None)
+    monkeypatch.setenv("ZIP2ADDR_CACHE_SIZE", "3")
+
+    rcache = TT.get_response_cache()
+    assert rcache.maxsize == 3
+    assert TT.get_response_cache() is rcache
@@ -0,0 +1,60 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=too-few-public-methods
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+import pytest
+
+from zip2addr import (
+    config as TT,
+    constants,
+)
+
+
+def test_get_lookup_engine(monkeypatch):
+    monkeypatch.delenv("ZIP2ADDR_LOOKUP_ENGINE", raising=False)
+    assert TT.get_lookup_engine() == constants.LOOKUP_ENGINE
+
+    monkeypatch.setenv("ZIP2ADDR_LOOKUP_ENGINE", "mmap")
+    assert TT.get_lookup_engine() == "mmap"
+
+    monkeypatch.setenv("ZIP2ADDR_LOOKUP_ENGINE", "unknown")
+    with pytest.raises(ValueError):
+        TT.get_lookup_engine()
+
+
+def test_get_db_options(monkeypatch):
+    monkeypatch.delenv("ZIP2ADDR_DB_READ_ONLY", raising=False)
+    monkeypatch.delenv("ZIP2ADDR_DB_IMMUTABLE", raising=False)
+    assert TT.get_db_options() == dict(read_only=True, immutable=False)
+
+    monkeypatch.setenv("ZIP2ADDR_DB_READ_ONLY", "no")
+    monkeypatch.setenv("ZIP2ADDR_DB_IMMUTABLE", "1")
+    assert TT.get_db_options() == dict(read_only=False, immutable=True)
+
+
+def test_is_db_async(monkeypatch):
+    monkeypatch.delenv("ZIP2ADDR_DB_ASYNC", raising=False)
+    assert TT.is_db_async() is constants.DB_ASYNC
+
+    monkeypatch.setenv("ZIP2ADDR_DB_ASYNC", "true")
+    assert TT.is_db_async()
+
+
+def test_get_cache_options(monkeypatch):
+    monkeypatch.delenv("ZIP2ADDR_CACHE_SIZE", raising=False)
+    monkeypatch.delenv("ZIP2ADDR_CACHE_TTL", raising=False)
+    assert TT.get_cache_options() == dict(
+        maxsize=constants.CACHE_SIZE, ttl=constants.CACHE_TTL
+    )
+
+    monkeypatch.setenv("ZIP2ADDR_CACHE_SIZE", "0")
+    monkeypatch.setenv("ZIP2ADDR_CACHE_TTL", "10")
+    assert TT.get_cache_options() == dict(maxsize=0, ttl=10)
+
+    monkeypatch.setenv("ZIP2ADDR_CACHE_SIZE", "many")
+    with pytest.raises(ValueError):
+        TT.get_cache_options()
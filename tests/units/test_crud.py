@@ -0,0 +1,324 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+import asyncio
+
+import pytest
+import sqlalchemy
+import sqlalchemy.ext.asyncio
+import sqlalchemy.event
+
+from zip2addr import (
+    constants,
+    crud as TT,
+    datagen,
+    db,
+    models,
+)
+
+
+@pytest.fixture(name="db_path", params=(False, True))
+def make_db(request, my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    datagen.save_zipcodes_as_db(
+        datagen.load_from_files(my_datadir), db_path, normalize=request.param
+    )
+    return db_path
+
+
+def _as_dicts_with_statements(db_path, func, *args, **kwargs):
+    """Call func and as_dict of results and count the statements executed.
+    """
+    statements = []
+
+    with db.get_session_ctx(db_path, read_only=True) as dbs:
+        engine = dbs.get_bind()
+
+        def count(*_args):
+            statements.append(_args[2])
+
+        sqlalchemy.event.listen(engine, "before_cursor_execute", count)
+        try:
+            res = func(dbs, *args, **kwargs)
+            if not isinstance(res, list):
+                res = [res]
+
+            assert all("JOIN" not in stmt for stmt in statements)
+            return ([r.as_dict() for r in res], len(statements))
+        finally:
+            sqlalchemy.event.remove(engine, "before_cursor_execute", count)
+
+
+def _load_as_dicts(db_path):
+    with db.get_engine(db_path).connect() as conn:
+        return {
+            row.zipcode: {
+                key: val for key, val in row._mapping.items()
+                if key not in ("id", "address_id")
+            }
+            for row in conn.execute(TT.select_zipcode_data())
+        }
+
+
+def test_get_zipcode(db_path):
+    expected = _load_as_dicts(db_path)
+    (res, nstmts) = _as_dicts_with_statements(
+        db_path, TT.get_zipcode, "9071801"
+    )
+    assert res == [expected["9071801"]]
+    assert nstmts == 1
+
+
+@pytest.mark.parametrize(
+    ("chunk_size", "nstmts"),
+    ((constants.BATCH_QUERY_SIZE, 1),
+     (2, 2),
+     )
+)
+def test_get_zipcodes_by_zipcodes(chunk_size, nstmts, db_path):
+    expected = _load_as_dicts(db_path)
+    zipcodes = ["9071801", "0000000", "0600000", "9071801", "9071800"]
+
+    (res, count) = _as_dicts_with_statements(
+        db_path, lambda dbs: list(TT.get_zipcodes_by_zipcodes(
+            dbs, zipcodes, chunk_size=chunk_size
+        ).values())
+    )
+    assert sorted(res, key=lambda r: r["zipcode"]) == [
+        expected[zc] for zc in ("0600000", "9071800", "9071801")
+    ]
+    assert count == nstmts
+
+    with db.get_session_ctx(db_path, read_only=True) as dbs:
+        results = TT.make_batch_results(
+            zipcodes, TT.get_zipcodes_by_zipcodes(dbs, zipcodes)
+        )
+    assert [r["zipcode"] for r in results] == zipcodes
+    assert [r["found"] for r in results] == [True, False, True, True, True]
+    assert results[1]["result"] is None
+    assert results[0]["result"] == expected["9071801"]
+
+
+@pytest.mark.parametrize(
+    ("limit", ),
+    ((0, ),
+     (5, ),
+     (constants.LIMIT, ),
+     )
+)
+def test_get_zipcodes_by_partial_zipcode(limit, db_path):
+    expected = _load_as_dicts(db_path)
+    (res, nstmts) = _as_dicts_with_statements(
+        db_path, TT.get_zipcodes_by_partial_zipcode, "0", limit=limit
+    )
+    assert res
+    assert all(r == expected[r["zipcode"]] for r in res)
+    assert nstmts == 1
+
+
+def test_get_zipcodes_after(db_path):
+    expected = sorted(_load_as_dicts(db_path))
+    with db.get_session_ctx(db_path, read_only=True) as dbs:
+        assert [
+            r.zipcode for r in TT.get_zipcodes(dbs, limit=5, after=expected[2])
+        ] == expected[3:8]
+        assert [
+            r.zipcode for r in TT.get_zipcodes_by_partial_zipcode(
+                dbs, "0", limit=0, after=expected[0]
+            )
+        ] == [zc for zc in expected[1:] if zc.startswith("0")]
+
+
+def test_get_zipcodes(db_path):
+    expected = _load_as_dicts(db_path)
+    (res, nstmts) = _as_dicts_with_statements(
+        db_path, TT.get_zipcodes, limit=constants.LIMIT
+    )
+    assert len(res) == len(expected)
+    assert all(r == expected[r["zipcode"]] for r in res)
+    assert nstmts == 1
+
+
+@pytest.mark.parametrize(
+    ("prefix", "expected"),
+    (("0", "1"),
+     ("0599", "06"),
+     ("9071801", "9071802"),
+     ("99", None),
+     ("", None),
+     )
+)
+def test_get_next_prefix(prefix, expected):
+    assert TT.get_next_prefix(prefix) == expected
+
+
+@pytest.mark.parametrize(
+    ("prefix", ),
+    (("06a", ),
+     ("０６", ),
+     ("06\n", ),
+     ("06000001", ),
+     )
+)
+def test_get_prefix_condition_invalid(prefix):
+    with pytest.raises(ValueError):
+        TT.get_prefix_condition(models.ZipcodeLookup.zipcode, prefix)
+
+
+@pytest.mark.parametrize(
+    ("prefix", ),
+    (("0", ),
+     ("060", ),
+     ("9", ),
+     )
+)
+def test_get_prefix_condition_uses_index(prefix, db_path):
+    table = models.ZipcodeLookup.__table__
+    stmt = sqlalchemy.select(table).where(
+        TT.get_prefix_condition(table.c.zipcode, prefix)
+    )
+    sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+
+    with db.get_engine(db_path).connect() as conn:
+        plan = " ".join(
+            row[-1] for row
+            in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+        )
+        zipcodes = [row.zipcode for row in conn.execute(stmt)]
+
+    assert "SEARCH" in plan and "PRIMARY KEY" in plan, plan
+    assert "SCAN" not in plan, plan
+    assert zipcodes
+    assert all(zc.startswith(prefix) for zc in zipcodes)
+
+
+def test_async_functions(db_path):
+    expected = _load_as_dicts(db_path)
+
+    async def get():
+        engine = db.get_async_engine(db_path, read_only=True)
+        try:
+            async with sqlalchemy.ext.asyncio.AsyncSession(engine) as adbs:
+                return (
+                    await TT.get_zipcode_async(adbs, "9071801"),
+                    await TT.get_zipcodes_async(adbs, limit=5),
+                    await TT.get_zipcodes_by_partial_zipcode_async(
+                        adbs, "0", limit=0
+                    ),
+                    await TT.get_zipcodes_by_zipcodes_async(
+                        adbs, ["9071801", "0000000"], chunk_size=1
+                    ),
+                )
+        finally:
+            await engine.dispose()
+
+    (zipcode, zipcodes, partials, found) = asyncio.run(get())
+    assert zipcode.as_dict() == expected["9071801"]
+    assert [z.as_dict() for z in zipcodes] == [
+        expected[zc] for zc in sorted(expected)[:5]
+    ]
+    assert [z.zipcode for z in partials] == [
+        zc for zc in sorted(expected) if zc.startswith("0")
+    ]
+    assert {zc: z.as_dict() for zc, z in found.items()} == {
+        "9071801": expected["9071801"]
+    }
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    (("与那国", ["9071800", "9071801"]),
+     ("OKINAWA yonaguni", ["9071800", "9071801"]),
+     ("中央区 旭", ["0640941"]),
+     ("ｻｯﾎﾟﾛｼ", ["0600000", "0600041", "0600042", "0640941"]),
+     ("さっぽろし あさひ", ["0640941"]),
+     ("Chuo-Ku ASAHIGAOKA", ["0640941"]),
+     )
+)
+def test_search_zipcodes_by_address(query, expected, db_path):
+    with db.get_session_ctx(db_path, read_only=True) as dbs:
+        res = TT.search_zipcodes_by_address(dbs, query)
+        assert sorted(r.zipcode for r in res) == expected
+
+        assert len(TT.search_zipcodes_by_address(dbs, query, limit=1)) == 1
+
+        with pytest.raises(ValueError):
+            TT.search_zipcodes_by_address(dbs, " ")
+
+
+def test_select_zipcodes_by_address_uses_index(db_path):
+    stmt = TT.select_zipcodes_by_address("札幌市")
+    sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+
+    with db.get_engine(db_path).connect() as conn:
+        plan = " ".join(
+            row[-1] for row
+            in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+        )
+
+    assert "VIRTUAL TABLE INDEX 0:M" in plan, plan
+    assert "SEARCH zipcode_lookup USING PRIMARY KEY" in plan, plan
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    (("与那国町与那国", "9071801"),
+     ("八重山郡与那因町与那国", "9071801"),
+     ("yonaguni cho yonaguni", "9071801"),
+     ("yonagni-cho yonaguni", "9071801"),
+     ("ﾖﾅｸﾆﾁｮｳ ﾖﾅｸﾞﾆ", "9071801"),
+     ("与那国町 以下に掲載がない場合", "9071800"),
+     ("札悼市中央区旭ケ丘", "0640941"),
+     ("sappporo asahigaoka", "0640941"),
+     )
+)
+def test_search_zipcodes_by_address_fuzzily(query, expected, db_path):
+    with db.get_session_ctx(db_path, read_only=True) as dbs:
+        res = TT.search_zipcodes_by_address(dbs, query, fuzzy=True)
+        assert res and res[0].zipcode == expected
+
+        res = TT.search_zipcodes_by_address(dbs, query, limit=1, fuzzy=True)
+        assert [r.zipcode for r in res] == [expected]
+
+
+def test_search_zipcodes_by_address_fuzzily_not_found(db_path):
+    with db.get_session_ctx(db_path, read_only=True) as dbs:
+        assert not TT.search_zipcodes_by_address(
+            dbs, "存在しない住所", fuzzy=True
+        )
+        # It falls back to the exact search as there are no trigrams.
+        assert [
+            r.zipcode for r in TT.search_zipcodes_by_address(
+                dbs, "旭", fuzzy=True
+            )
+        ] == ["0640941"]
+
+        with pytest.raises(ValueError):
+            TT.select_zipcodes_by_address_fuzzily("旭")
+
+
+def test_rank_by_similarity():
+    rows = [("a", "sapporo chuo"), ("b", "sapporo"), ("c", "tokyo")]
+    assert TT.rank_by_similarity(rows, "sapporo chuo") == ["a", "b"]
+    assert TT.rank_by_similarity(rows, "saporo", limit=1) == ["a"]
+
+    rows = [(str(i), "sapporo") for i in range(constants.MAX_LIMIT + 1)]
+    assert len(TT.rank_by_similarity(rows, "sapporo", limit=0)) == (
+        constants.MAX_LIMIT
+    )
+
+
+@pytest.mark.parametrize(
+    ("limit", "expected"),
+    ((1, 1),
+     (constants.MAX_LIMIT, constants.MAX_LIMIT),
+     (0, constants.MAX_LIMIT),
+     (-1, constants.MAX_LIMIT),
+     (constants.MAX_LIMIT + 1, constants.MAX_LIMIT),
+     )
+)
+def test_get_fuzzy_limit(limit, expected):
+    assert TT.get_fuzzy_limit(limit) == expected
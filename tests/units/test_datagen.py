@@ -6,19 +6,28 @@
 # pylint: disable=missing-module-docstring
 # pylint: disable=missing-class-docstring
 # pylint: disable=missing-function-docstring
+import concurrent.futures
+import http.server
 import pathlib
+import re
 import shutil
+import threading
 import time
 import zipfile
 
 import pytest
 import requests_mock
+import sqlalchemy
 
 from zip2addr import (
     constants,
+    crud,
     datagen as TT,
     db,
-    models
+    dataset,
+    models,
+    snapshot,
+    trie,
 )
 
 
@@ -53,6 +62,38 @@ def test_backup_if_it_exists(suffix, tmp_path):
     assert backup.exists()
 
 
+def test_replace_file(tmp_path):
+    (srcpath, dstpath) = (tmp_path / "src.db", tmp_path / "dst.db")
+
+    srcpath.write_text("0")
+    TT.replace_file(srcpath, dstpath)
+    assert not srcpath.exists()
+    assert dstpath.read_text() == "0"
+
+    srcpath.write_text("1")
+    with dstpath.open() as fobj:  # A reader of the old file.
+        TT.replace_file(srcpath, dstpath)
+        assert fobj.read() == "0"
+
+    assert dstpath.read_text() == "1"
+    backups = list(tmp_path.glob("dst.db.*"))
+    assert len(backups) == 1
+    assert backups[0].read_text() == "0"
+
+
+def test_make_database_atomically_failure(tmp_path):
+    outpath = tmp_path / constants.DATABASE_FILENAME
+    outpath.write_text("old")
+
+    with pytest.raises(RuntimeError):
+        with TT.make_database_atomically(outpath) as engine:
+            assert engine is not None
+            raise RuntimeError("Failed to make it")
+
+    assert outpath.read_text() == "old"
+    assert [p.name for p in tmp_path.iterdir()] == [outpath.name]
+
+
 _ZIP_URL_FILENAME_PAIRS = (
     (constants.ROMAN_ZIPCODE_URL, constants.ROMAN_ZIPCODE_ZIP_FILENAME),
     (constants.KANA_ZIPCODE_URL, constants.KANA_ZIPCODE_ZIP_FILENAME),
@@ -78,6 +119,142 @@ def test_download_file_from_url(url, filename, my_datadir, tmp_path):
             assert zipf.testzip() is None
 
 
+def test_download_file_from_url_errors(tmp_path):
+    url = constants.KANA_ZIPCODE_URL
+    with requests_mock.Mocker() as mocked_requests:
+        mocked_requests.get(url, status_code=404)
+        assert not TT.download_file_from_url(url, tmp_path, "test.zip")
+        assert not (tmp_path / "test.zip").exists()
+
+
+class _HTTPRequestHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP request handler supports ETag and Range only for tests.
+    """
+    def do_GET(self):
+        (content, etag) = (self.server.content, self.server.etag)
+        self.server.requests.append(dict(self.headers))
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        if self.headers.get("Range") and \
+                self.headers.get("If-Range") == etag:
+            start = int(self.headers["Range"][len("bytes="):].rstrip("-"))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(content)}")
+                self.end_headers()
+                return
+
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                f"bytes {start}-{len(content) - 1}/{len(content)}"
+            )
+        else:
+            self.send_response(200)
+
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+        self.wfile.write(content[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="http_server")
+def get_http_server(my_datadir):
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), _HTTPRequestHandler
+    )
+    server.content = (
+        my_datadir / constants.KANA_ZIPCODE_ZIP_FILENAME
+    ).read_bytes()
+    server.etag = '"v1"'
+    server.requests = []
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_file_from_url_conditionally(http_server, tmp_path):
+    url = f"http://127.0.0.1:{http_server.server_address[1]}/ken_all.zip"
+    filename = constants.KANA_ZIPCODE_ZIP_FILENAME
+    opath = tmp_path / filename
+
+    assert TT.download_file_from_url(url, tmp_path, filename, chunk_size=64)
+    assert opath.read_bytes() == http_server.content
+    assert not (tmp_path / f"{filename}.part").exists()
+
+    # Not modified.
+    assert not TT.download_file_from_url(url, tmp_path, filename)
+    assert http_server.requests[-1]["If-None-Match"] == '"v1"'
+    assert len(list(tmp_path.glob(f"{filename}.*"))) == 1  # validators
+
+    # Modified.
+    http_server.content = http_server.content + b"\0"
+    http_server.etag = '"v2"'
+    assert TT.download_file_from_url(url, tmp_path, filename)
+    assert opath.read_bytes() == http_server.content
+    assert len(list(tmp_path.glob(f"{filename}.*"))) == 2  # backup
+
+
+def test_download_file_from_url_resume(http_server, tmp_path):
+    url = f"http://127.0.0.1:{http_server.server_address[1]}/ken_all.zip"
+    filename = constants.KANA_ZIPCODE_ZIP_FILENAME
+    ppath = tmp_path / f"{filename}.part"
+
+    # Simulate an interrupted download.
+    ppath.write_bytes(http_server.content[:100])
+    TT.get_validators_path(ppath).write_text('{"ETag": "\\"v1\\""}')
+
+    assert TT.download_file_from_url(url, tmp_path, filename)
+    assert http_server.requests[-1]["Range"] == "bytes=100-"
+    assert (tmp_path / filename).read_bytes() == http_server.content
+    assert not ppath.exists()
+
+
+def test_download_file_from_url_restart(http_server, tmp_path):
+    url = f"http://127.0.0.1:{http_server.server_address[1]}/ken_all.zip"
+    filename = constants.KANA_ZIPCODE_ZIP_FILENAME
+    ppath = tmp_path / f"{filename}.part"
+
+    # Simulate a download completed but not renamed.
+    ppath.write_bytes(http_server.content)
+    TT.get_validators_path(ppath).write_text('{"ETag": "\\"v1\\""}')
+
+    assert TT.download_file_from_url(url, tmp_path, filename)
+    assert len(http_server.requests) == 2
+    assert http_server.requests[0]["Range"] == (
+        f"bytes={len(http_server.content)}-"
+    )
+    assert "Range" not in http_server.requests[1]
+    assert (tmp_path / filename).read_bytes() == http_server.content
+    assert not ppath.exists()
+
+    # Not modified since then.
+    assert not TT.download_file_from_url(url, tmp_path, filename)
+
+
+def test_download_zipcode_zip_files(http_server, tmp_path):
+    base_url = f"http://127.0.0.1:{http_server.server_address[1]}"
+    urls = (f"{base_url}/a.zip", f"{base_url}/b.zip")
+
+    assert TT.download_zipcode_zip_files(tmp_path, urls) == [True, True]
+    for filename in constants.ZIPCODE_ZIP_FILENAMES:
+        assert (tmp_path / filename).read_bytes() == http_server.content
+
+    assert TT.download_zipcode_zip_files(tmp_path, urls) == [False, False]
+
+
 @pytest.mark.parametrize(
     ("subdir", ),
     (("out", ),
@@ -153,6 +330,61 @@ def test_load_and_parse(filename, keys, my_datadir):
     assert len(res) == len((filepath.open(encoding='shift_jis')).readlines())
 
 
+@pytest.mark.parametrize(
+    ("filename", "zip_filename", "keys"),
+    ((constants.ROMAN_ZIPCODE_FILENAME,
+      constants.ROMAN_ZIPCODE_ZIP_FILENAME, TT.ROMAN_ROW_KEYS),
+     (constants.KANA_ZIPCODE_FILENAME,
+      constants.KANA_ZIPCODE_ZIP_FILENAME, TT.KANA_ROW_KEYS),
+     ),
+)
+def test_load_and_parse_from_zip_file(
+    filename, zip_filename, keys, my_datadir
+):
+    res = list(
+        TT.load_and_parse(
+            pathlib.Path(filename), keys, my_datadir / zip_filename
+        )
+    )
+    assert res
+    assert res == list(TT.load_and_parse(my_datadir / filename, keys))
+
+
+def test_load_and_parse_from_zip_file_errors(my_datadir, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(TT.load_and_parse(
+            pathlib.Path(constants.KANA_ZIPCODE_FILENAME), TT.KANA_ROW_KEYS,
+            tmp_path / constants.KANA_ZIPCODE_ZIP_FILENAME
+        ))
+
+    with pytest.raises(KeyError):
+        list(TT.load_and_parse(
+            pathlib.Path("it_does_not_exist.csv"), TT.KANA_ROW_KEYS,
+            my_datadir / constants.KANA_ZIPCODE_ZIP_FILENAME
+        ))
+
+
+@pytest.mark.parametrize(
+    ("chunk_size", ),
+    ((1, ),
+     (4, ),
+     (constants.CHUNK_SIZE, ),
+     )
+)
+def test_load_and_parse_in_parallel(chunk_size, my_datadir):
+    filepath = my_datadir / constants.KANA_ZIPCODE_FILENAME
+    keys = TT.KANA_ROW_KEYS
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        res = list(
+            TT.load_and_parse_in_parallel(
+                executor, filepath, keys, chunk_size=chunk_size
+            )
+        )
+    assert res
+    assert res == list(TT.load_and_parse(filepath, keys))
+
+
 def test_load_from_files_have_no_data(tmp_path):
     for fname in constants.ZIPCODE_CSV_FILENAMES:
         (tmp_path / fname).touch()
@@ -174,6 +406,35 @@ def test_load_from_files(my_datadir, tmp_path):
     assert TT.load_from_files(tmp_path, alt_filenames)
 
 
+def test_load_from_files_in_zip_files(my_datadir):
+    res = TT.load_from_files(
+        my_datadir, zip_filenames=constants.ZIPCODE_ZIP_FILENAMES
+    )
+    assert res
+    assert res == TT.load_from_files(my_datadir)
+
+
+@pytest.mark.parametrize(
+    ("workers", ),
+    ((0, ),
+     (2, ),
+     )
+)
+def test_load_from_files_in_parallel(workers, my_datadir):
+    res = TT.load_from_files(
+        my_datadir, zip_filenames=constants.ZIPCODE_ZIP_FILENAMES,
+        workers=workers
+    )
+    assert res
+    assert res == TT.load_from_files(my_datadir)
+
+
+def test_get_executor_invalid_workers():
+    with pytest.raises(ValueError, match="workers"):
+        with TT.get_executor(-1):
+            pass
+
+
 def test_load_and_save_as_json_no_data(tmp_path):
     for fname in constants.ZIPCODE_CSV_FILENAMES:
         (tmp_path / fname).touch()
@@ -198,6 +459,141 @@ def test_load_and_save_as_json(outname, my_datadir, tmp_path):
     assert TT.anyconfig.load(outdir / outname)
 
 
+def test_make_address_text():
+    zdata = dict(
+        zipcode="9071801", pref="沖縄県", city_ward="八重山郡　与那国町",
+        house_numbers="与那国",
+        roman_pref="OKINAWA KEN", roman_city_ward="YAEYAMA GUN YONAGUNI CHO",
+        roman_house_numbers="YONAGUNI",
+        kana_pref="ｵｷﾅﾜｹﾝ", kana_city_ward="ﾔｴﾔﾏｸﾞﾝﾖﾅｸﾞﾆﾁｮｳ",
+        kana_house_numbers=None,
+    )
+    assert TT.make_address_text(zdata) == (
+        "沖縄県八重山郡与那国町与那国 オキナワケンヤエヤマグンヨナグニチョウ "
+        "okinawakenyaeyamagunyonagunichoyonaguni"
+    )
+
+
+def test_make_rows_from_zipcode_data():
+    zdata = dict(
+        zipcode="9071801", pref="沖縄県", city_ward="八重山郡　与那国町",
+        house_numbers="与那国",
+        roman_pref="OKINAWA KEN", roman_city_ward="YAEYAMA GUN YONAGUNI CHO",
+        roman_house_numbers="YONAGUNI",
+        kana_pref="ｵｷﾅﾜｹﾝ", kana_city_ward="ﾔｴﾔﾏｸﾞﾝﾖﾅｸﾞﾆﾁｮｳ",
+        kana_house_numbers="ﾖﾅｸﾞﾆ",
+    )
+    rows = TT.make_rows_from_zipcode_data(3, zdata)
+
+    assert rows["zipcodes"] == dict(id=3, zipcode="9071801", address_id=3)
+    assert rows["addresses"] == dict(
+        id=3, pref="沖縄県", city_ward="八重山郡　与那国町",
+        house_numbers="与那国", municipality_id=None
+    )
+    assert rows["roman_addresses"] == dict(
+        id=3, address_id=3, pref="OKINAWA KEN",
+        city_ward="YAEYAMA GUN YONAGUNI CHO", house_numbers="YONAGUNI"
+    )
+    assert rows["kana_addresses"]["pref"] == "ｵｷﾅﾜｹﾝ"
+
+    rows = TT.make_rows_from_zipcode_data(3, zdata, municipality_id=2)
+    assert rows["addresses"] == dict(
+        id=3, pref=None, city_ward=None, house_numbers="与那国",
+        municipality_id=2
+    )
+    assert rows["kana_addresses"]["city_ward"] is None
+    assert rows["kana_addresses"]["house_numbers"] == "ﾖﾅｸﾞﾆ"
+
+
+@pytest.mark.parametrize(
+    ("batch_size", ),
+    ((1, ),
+     (7, ),
+     (constants.BATCH_SIZE, ),
+     )
+)
+def test_save_zipcodes_as_db(batch_size, my_datadir, tmp_path):
+    zipcodes = TT.load_from_files(my_datadir)
+    outpath = tmp_path / constants.DATABASE_FILENAME
+
+    count = TT.save_zipcodes_as_db(zipcodes, outpath, batch_size=batch_size)
+    assert count == len(zipcodes)
+
+    with db.get_session_ctx(outpath) as dbs_ctx:
+        res = dbs_ctx.query(models.Zipcode).all()
+        assert len(res) == count
+        assert dbs_ctx.query(models.KanaAddress).count() == count
+        assert dbs_ctx.query(models.RomanAddress).count() == count
+
+        zipd = [r.as_dict() for r in res if r.zipcode == "9071801"][0]
+        assert zipd["roman_pref"] == "OKINAWA KEN"
+        assert zipd["kana_pref"] == "ｵｷﾅﾜｹﾝ"
+
+
+def test_save_zipcodes_as_db_normalized(my_datadir, tmp_path):
+    zipcodes = TT.load_from_files(my_datadir)
+    ref_path = tmp_path / "ref.db"
+    TT.save_zipcodes_as_db(zipcodes, ref_path)
+
+    outpath = tmp_path / constants.DATABASE_FILENAME
+    TT.save_zipcodes_as_db(zipcodes, outpath, batch_size=7, normalize=True)
+    assert _load_zipcodes_from_db(outpath) == _load_zipcodes_from_db(
+        ref_path
+    )
+
+    with db.get_session_ctx(outpath, read_only=True) as dbs_ctx:
+        prefs = {(z["pref"], z["kana_pref"], z["roman_pref"])
+                 for z in zipcodes}
+        assert dbs_ctx.query(models.Prefecture).count() == len(prefs)
+        assert dbs_ctx.query(models.Municipality).count() < len(zipcodes)
+        assert dbs_ctx.query(models.Address).filter(
+            models.Address.pref.is_not(None)
+        ).count() == 0
+
+
+def _load_lookup_table(db_path):
+    with db.get_engine(db_path).connect() as conn:
+        return (
+            [dict(r._mapping) for r in conn.execute(
+                sqlalchemy.select(models.ZipcodeLookup.__table__).order_by(
+                    models.ZipcodeLookup.zipcode
+                )
+            )],
+            [dict(r._mapping) for r in conn.execute(
+                crud.select_zipcode_data()
+            )]
+        )
+
+
+@pytest.mark.parametrize(
+    ("normalize", ),
+    ((False, ),
+     (True, ),
+     )
+)
+def test_refresh_lookup_table(normalize, my_datadir, tmp_path):
+    zipcodes = TT.load_from_files(my_datadir)
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    TT.save_zipcodes_as_db(zipcodes, db_path, normalize=normalize)
+
+    (lookups, expected) = _load_lookup_table(db_path)
+    assert len(lookups) == len(zipcodes)
+    assert lookups == expected
+
+    engine = db.get_engine(db_path)
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.delete(models.ZipcodeLookup.__table__))
+        assert TT.refresh_lookup_table(conn, ["9071801", "0000000"]) == 1
+    assert [r["zipcode"] for r in _load_lookup_table(db_path)[0]] == [
+        "9071801"
+    ]
+
+    with engine.begin() as conn:
+        assert TT.refresh_lookup_table(conn) == len(zipcodes)
+    engine.dispose()
+    assert _load_lookup_table(db_path)[0] == expected
+
+
 def test_load_json_and_save_as_db_no_data(tmp_path):
     (tmp_path / constants.JSON_FILENAME).touch()
     TT.load_json_and_save_as_db(tmp_path, tmp_path)
@@ -215,6 +611,169 @@ def test_load_json_and_save_as_db(my_datadir, tmp_path):
         assert dbs_ctx.query(models.Zipcode).all()
 
 
+def _load_zipcodes_from_db(db_path):
+    with db.get_session_ctx(db_path, read_only=True) as dbs_ctx:
+        return [
+            z.as_dict() for z
+            in dbs_ctx.query(models.Zipcode).order_by(models.Zipcode.id)
+        ]
+
+
+def test_stream_and_save_as_db_no_data(tmp_path):
+    for fname in constants.ZIPCODE_CSV_FILENAMES:
+        (tmp_path / fname).touch()
+
+    assert TT.stream_and_save_as_db(tmp_path, tmp_path) == 0
+    assert not (tmp_path / constants.DATABASE_FILENAME).exists()
+
+
+@pytest.mark.parametrize(
+    ("batch_size", "normalize"),
+    ((1, False),
+     (5, False),
+     (constants.BATCH_SIZE, False),
+     (5, True),
+     )
+)
+def test_stream_and_save_as_db(batch_size, normalize, my_datadir, tmp_path):
+    zipcodes = TT.load_from_files(my_datadir)
+    ref_path = tmp_path / "ref.db"
+    TT.save_zipcodes_as_db(zipcodes, ref_path)
+
+    outdir = tmp_path / "out"
+    count = TT.stream_and_save_as_db(
+        my_datadir, outdir, batch_size=batch_size, workers=2,
+        normalize=normalize
+    )
+    assert count == len(zipcodes)
+    assert not (outdir / constants.JSON_FILENAME).exists()
+    assert _load_zipcodes_from_db(
+        outdir / constants.DATABASE_FILENAME
+    ) == _load_zipcodes_from_db(ref_path)
+
+
+@pytest.mark.parametrize(
+    ("legacy", ),
+    ((False, ),
+     (True, ),
+     )
+)
+def test_merge_zipcode_data_into_db_uses_index(legacy, my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    TT.stream_and_save_as_db(my_datadir, tmp_path)
+    zipcodes = _load_zipcodes_from_db(db_path)
+
+    engine = db.get_engine(db_path)
+    if legacy:  # made before address_id were indexed.
+        with engine.begin() as conn:
+            for table in ("kana_addresses", "roman_addresses"):
+                conn.exec_driver_sql(f"DROP INDEX ix_{table}_address_id")
+        TT.create_missing_indexes(engine)
+
+    updates = []
+
+    def record(_conn, _cursor, stmt, params, *_args):
+        if stmt.startswith("UPDATE"):
+            updates.append((stmt, params[0]))
+
+    sqlalchemy.event.listen(engine, "before_cursor_execute", record)
+    try:
+        with engine.begin() as conn:
+            assert TT.merge_zipcode_data_into_db(conn, zipcodes[:3]) == (0, 3)
+
+        assert len(updates) == len(TT.ADDRESS_MODEL_KEY_PREFIXES)
+        with engine.connect() as conn:
+            for stmt, params in updates:
+                plan = " ".join(
+                    row[-1] for row in conn.exec_driver_sql(
+                        f"EXPLAIN QUERY PLAN {stmt}", params
+                    )
+                )
+                assert "SCAN" not in plan, plan
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", record)
+        engine.dispose()
+
+
+def test_in_queries_are_chunked(my_datadir, tmp_path, monkeypatch):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    TT.stream_and_save_as_db(my_datadir, tmp_path)
+    zipcodes = _load_zipcodes_from_db(db_path)
+    (lookups, expected) = _load_lookup_table(db_path)
+
+    monkeypatch.setattr(constants, "BATCH_QUERY_SIZE", 2)
+    nparams = []
+
+    def record(_conn, _cursor, stmt, params, *_args):
+        nparams.extend(
+            ins.count("?") for ins in re.findall(r" IN \(([^)]*)\)", stmt)
+        )
+
+    engine = db.get_engine(db_path)
+    sqlalchemy.event.listen(engine, "before_cursor_execute", record)
+    try:
+        with engine.begin() as conn:
+            assert TT.merge_zipcode_data_into_db(conn, zipcodes) == (
+                0, len(zipcodes)
+            )
+            assert TT.refresh_lookup_table(
+                conn, [z["zipcode"] for z in zipcodes]
+            ) == len(zipcodes)
+        assert _load_lookup_table(db_path)[0] == expected
+
+        with engine.begin() as conn:
+            assert TT.delete_zipcode_data_from_db(conn, zipcodes) == len(
+                zipcodes
+            )
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", record)
+        engine.dispose()
+
+    assert nparams
+    assert max(nparams) <= 2
+    assert not _load_zipcodes_from_db(db_path)
+
+
+def test_save_db_as_snapshot(my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    TT.stream_and_save_as_db(my_datadir, tmp_path)
+    zipcodes = _load_zipcodes_from_db(db_path)
+
+    assert TT.save_db_as_snapshot(db_path) == len(zipcodes)
+    with snapshot.Snapshot(snapshot.get_path(db_path)) as snap:
+        for zdata in zipcodes:
+            assert snap.get_zipcode(zdata["zipcode"]).as_dict() == zdata
+
+
+def test_get_source_hash(tmp_path):
+    (path_a, path_b) = (tmp_path / "a.csv", tmp_path / "b.csv")
+    path_a.write_text("a")
+    path_b.write_text("b")
+
+    res = TT.get_source_hash([path_a, path_b])
+    assert len(res) == 64
+    assert TT.get_source_hash([path_a, path_b]) == res
+    assert TT.get_source_hash([path_b, path_a]) != res
+    assert TT.get_source_hash([path_a, path_b, tmp_path / "x"]) == res
+    assert TT.get_source_hash([path_a, path_b], base="abc") != res
+
+    path_b.write_text("B")
+    assert TT.get_source_hash([path_a, path_b]) != res
+
+
+def test_save_db_as_trie(my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    TT.stream_and_save_as_db(my_datadir, tmp_path)
+    zipcodes = [z["zipcode"] for z in _load_zipcodes_from_db(db_path)]
+
+    assert TT.save_db_as_trie(db_path) == len(zipcodes)
+    with trie.Trie(trie.get_path(db_path)) as ztrie:
+        assert len(ztrie) == len(zipcodes)
+        assert ztrie.count("06") == len(
+            [z for z in zipcodes if z.startswith("06")]
+        )
+
+
 def test_make_database_from_zip_files_errors(tmp_path):
     with pytest.raises(FileNotFoundError):
         TT.make_database_from_zip_files(tmp_path, tmp_path)
@@ -246,3 +805,292 @@ def test_make_database_from_zip_files(outname, my_datadir, tmp_path):
     assert db_path.exists()
     with db.get_session_ctx(db_path) as dbs_ctx:
         assert dbs_ctx.query(models.Zipcode).all()
+
+    version = dataset.load(db_path)
+    assert version.source_hash == TT.get_source_hash(
+        my_datadir / fname for fname in constants.ZIPCODE_ZIP_FILENAMES
+    )
+    assert version.built_at > 0
+
+
+@pytest.mark.parametrize(
+    ("streaming", ),
+    ((False, ),
+     (True, ),
+     )
+)
+def test_make_database_from_zip_files_stamped_before_replaced(
+    streaming, my_datadir, tmp_path, monkeypatch
+):
+    (versions, tags) = ([], [])
+    replace_file = TT.replace_file
+
+    def replace_and_record(srcpath, dstpath):
+        versions.append(dataset.load(srcpath))
+        with trie.Trie(trie.get_path(dstpath)) as ztrie:
+            tags.append(ztrie.tag)
+        replace_file(srcpath, dstpath)
+
+    monkeypatch.setattr(TT, "replace_file", replace_and_record)
+    TT.make_database_from_zip_files(my_datadir, tmp_path, streaming=streaming)
+
+    assert len(versions) == 1
+    assert versions[0] is not None
+    assert versions[0].source_hash == TT.get_source_hash(
+        my_datadir / fname for fname in constants.ZIPCODE_ZIP_FILENAMES
+    )
+    version = dataset.load(tmp_path / constants.DATABASE_FILENAME)
+    assert version.built_at == versions[0].built_at
+
+    # The trie was ready before the database was swapped in.
+    assert tags == [version.etag]
+    assert trie.get_trie_of_db(tmp_path / constants.DATABASE_FILENAME)
+
+
+@pytest.mark.parametrize(
+    ("export_json", ),
+    ((False, ),
+     (True, ),
+     )
+)
+def test_make_database_from_zip_files_streaming(
+    export_json, my_datadir, tmp_path
+):
+    datadir = tmp_path / "data"
+    shutil.copytree(my_datadir, datadir)
+    (datadir / constants.JSON_FILENAME).unlink()
+
+    outdir = tmp_path / "out"
+    TT.make_database_from_zip_files(
+        datadir, outdir, streaming=True, export_json=export_json,
+        make_snapshot=True
+    )
+    db_path = outdir / constants.DATABASE_FILENAME
+    assert _load_zipcodes_from_db(db_path)
+    assert (outdir / constants.JSON_FILENAME).exists() == export_json
+    assert snapshot.get_path(db_path).exists()
+    assert trie.get_path(db_path).exists()
+
+
+@pytest.mark.parametrize(
+    ("extract", ),
+    ((False, ),
+     (True, ),
+     )
+)
+def test_make_database_from_zip_files_extract(extract, my_datadir, tmp_path):
+    datadir = tmp_path / "data"
+    datadir.mkdir()
+    for zfn in constants.ZIPCODE_ZIP_FILENAMES:
+        shutil.copyfile(my_datadir / zfn, datadir / zfn)
+
+    outdir = tmp_path / "out"
+    TT.make_database_from_zip_files(
+        datadir, outdir, streaming=True, extract=extract
+    )
+    assert _load_zipcodes_from_db(outdir / constants.DATABASE_FILENAME)
+    for cfn in constants.ZIPCODE_CSV_FILENAMES:
+        assert (datadir / cfn).exists() == extract
+
+
+_DELTA_ADD_ROWS = (
+    # new
+    '47382,"90718","9071899","ｵｷﾅﾜｹﾝ","ﾔｴﾔﾏｸﾞﾝﾖﾅｸﾞﾆﾁｮｳ","ﾃｽﾄ","沖縄県",'
+    '"八重山郡与那国町","テスト",0,0,0,0,0,0',
+    # updated
+    '47382,"90718","9071801","ｵｷﾅﾜｹﾝ","ﾔｴﾔﾏｸﾞﾝﾖﾅｸﾞﾆﾁｮｳ","ﾖﾅｸﾞﾆ2","沖縄県",'
+    '"八重山郡与那国町","与那国2",0,0,0,0,0,0',
+)
+
+
+def _make_delta_file(path, rows, zipped=False):
+    content = "\r\n".join(rows).encode(constants.CSV_ENCODING)
+    if zipped:
+        with zipfile.ZipFile(str(path), mode='w') as zipf:
+            zipf.writestr(f"{path.stem.upper()}.CSV", content)
+    else:
+        path.write_bytes(content)
+
+    return path
+
+
+@pytest.mark.parametrize(
+    ("filename", "expected"),
+    (("add_2301.zip", "add"),
+     ("DEL_2301.CSV", "del"),
+     ("ken_all.zip", None),
+     )
+)
+def test_get_delta_file_type(filename, expected):
+    if expected is None:
+        with pytest.raises(ValueError):
+            TT.get_delta_file_type(pathlib.Path(filename))
+    else:
+        assert TT.get_delta_file_type(pathlib.Path(filename)) == expected
+
+
+@pytest.mark.parametrize(
+    ("filenames", "expected"),
+    ((["add_2302.zip", "del_2301.zip", "ADD_2301.CSV", "del_2302.zip"],
+      ["del_2301.zip", "ADD_2301.CSV", "del_2302.zip", "add_2302.zip"]),
+     ([], []),
+     )
+)
+def test_sort_delta_files(filenames, expected):
+    res = TT.sort_delta_files(pathlib.Path(fname) for fname in filenames)
+    assert [fpath.name for _dtype, fpath in res] == expected
+    assert [dtype for dtype, _fpath in res] == [
+        fname[:3].lower() for fname in expected
+    ]
+
+
+def test_apply_delta_files_errors(my_datadir, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TT.apply_delta_files(tmp_path / "not_exist.db", [])
+
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    shutil.copyfile(my_datadir / constants.DATABASE_FILENAME, db_path)
+    with pytest.raises(ValueError):
+        TT.apply_delta_files(
+            db_path, [my_datadir / constants.KANA_ZIPCODE_ZIP_FILENAME]
+        )
+
+
+@pytest.mark.parametrize(
+    ("zipped", "normalize", "legacy"),
+    ((False, False, False),
+     (True, False, False),
+     (False, True, False),
+     (False, False, True),
+     )
+)
+def test_apply_delta_files(zipped, normalize, legacy, my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    TT.stream_and_save_as_db(my_datadir, tmp_path, normalize=normalize)
+    if legacy:  # made before the lookup table was added.
+        engine = db.get_engine(db_path)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE zipcode_lookup")
+        engine.dispose()
+
+    zipcodes = {z["zipcode"]: z for z in _load_zipcodes_from_db(db_path)}
+
+    ext = ".zip" if zipped else ".CSV"
+    add_path = _make_delta_file(
+        tmp_path / f"add_2301{ext}", _DELTA_ADD_ROWS, zipped
+    )
+    del_path = _make_delta_file(
+        tmp_path / f"del_2301{ext}",
+        ['01101,"060  ","0600000","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ",'
+         '"ｲｶﾆｹｲｻｲｶﾞﾅｲﾊﾞｱｲ","北海道","札幌市中央区","以下に掲載がない場合",'
+         '0,0,0,0,0,0'],
+        zipped
+    )
+
+    TT.save_db_as_snapshot(db_path)
+    stats = TT.apply_delta_files(db_path, [del_path, add_path])
+    assert stats == dict(added=1, updated=1, deleted=1)
+
+    version = dataset.load(db_path)
+    assert version.source_hash == TT.get_source_hash([del_path, add_path])
+
+    res = {z["zipcode"]: z for z in _load_zipcodes_from_db(db_path)}
+    assert "0600000" in zipcodes
+    assert "0600000" not in res
+    assert len(res) == len(zipcodes)
+
+    assert res["9071899"]["house_numbers"] == "テスト"
+    assert res["9071899"]["kana_house_numbers"] == "ﾃｽﾄ"
+    assert res["9071899"]["roman_house_numbers"] == ""
+
+    assert res["9071801"]["house_numbers"] == "与那国2"
+    assert res["9071801"]["city_ward"] == "八重山郡与那国町"
+    assert res["9071801"]["roman_city_ward"] == (
+        zipcodes["9071801"]["roman_city_ward"]
+    )
+    assert res["9071801"]["kana_house_numbers"] == "ﾖﾅｸﾞﾆ2"
+    assert res["9071801"]["roman_house_numbers"] == (
+        zipcodes["9071801"]["roman_house_numbers"]
+    )
+
+    with db.get_session_ctx(db_path, read_only=True) as dbs_ctx:
+        for model in (models.Address, models.KanaAddress,
+                      models.RomanAddress):
+            assert dbs_ctx.query(model).count() == len(res)
+
+    (lookups, expected) = _load_lookup_table(db_path)
+    assert lookups == expected
+
+    with db.get_session_ctx(db_path, read_only=True) as dbs_ctx:
+        assert [
+            r.zipcode for r in crud.search_zipcodes_by_address(dbs_ctx, "テスト")
+        ] == ["9071899"]
+        assert [
+            r.zipcode for r
+            in crud.search_zipcodes_by_address(dbs_ctx, "与那国2")
+        ] == ["9071801"]
+        assert not crud.search_zipcodes_by_address(
+            dbs_ctx, "以下に掲載がない場合 札幌市中央区"
+        )
+
+    with snapshot.Snapshot(snapshot.get_path(db_path)) as snap:
+        assert len(snap) == len(res)
+        assert snap.get_zipcode("0600000") is None
+        assert snap.get_zipcode("9071899").as_dict() == res["9071899"]
+
+    with trie.Trie(trie.get_path(db_path)) as ztrie:
+        assert len(ztrie) == len(res)
+        assert ztrie.count("0600000") == 0
+        assert ztrie.count("9071899") == 1
+        assert ztrie.tag == version.etag
+
+
+def test_apply_delta_files_del_before_add(my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    TT.stream_and_save_as_db(my_datadir, tmp_path)
+    zipcodes = {z["zipcode"]: z for z in _load_zipcodes_from_db(db_path)}
+
+    # Zip code data changed are in both of delta files of the same month.
+    add_path = _make_delta_file(
+        tmp_path / "add_2401.zip",
+        [*_DELTA_ADD_ROWS[1:],
+         '01101,"064  ","0640941","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｱｻﾋｶﾞｵｶ2",'
+         '"北海道","札幌市中央区","旭ケ丘2",0,0,1,0,0,0'],
+        True
+    )
+    del_path = _make_delta_file(
+        tmp_path / "del_2401.zip",
+        ['47382,"90718","9071801","ｵｷﾅﾜｹﾝ","ﾔｴﾔﾏｸﾞﾝﾖﾅｸﾞﾆﾁｮｳ","ﾖﾅｸﾞﾆ",'
+         '"沖縄県","八重山郡与那国町","与那国",0,0,0,0,0,0',
+         '01101,"064  ","0640941","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｱｻﾋｶﾞｵｶ",'
+         '"北海道","札幌市中央区","旭ケ丘",0,0,1,0,0,0',
+         # One of the rows of the zip code not kept in the database.
+         '01101,"060  ","0600041","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｵｵﾄﾞｵﾘﾋｶﾞｼ2",'
+         '"北海道","札幌市中央区","大通東２",0,0,0,0,0,0'],
+        True
+    )
+
+    # In the order of glob, add_* before del_*.
+    stats = TT.apply_delta_files(db_path, [add_path, del_path])
+    assert stats == dict(added=0, updated=2, deleted=0)
+
+    res = {z["zipcode"]: z for z in _load_zipcodes_from_db(db_path)}
+    assert len(res) == len(zipcodes)
+    assert res["9071801"]["house_numbers"] == "与那国2"
+    assert res["0640941"]["house_numbers"] == "旭ケ丘2"
+    assert res["0640941"]["kana_house_numbers"] == "ｱｻﾋｶﾞｵｶ2"
+    assert res["0600041"] == zipcodes["0600041"]
+
+    # Roman data are kept as add files don't have them.
+    for zipcode in ("9071801", "0640941"):
+        for key in ("pref", "city_ward", "house_numbers"):
+            assert res[zipcode][f"roman_{key}"]
+            assert res[zipcode][f"roman_{key}"] == (
+                zipcodes[zipcode][f"roman_{key}"]
+            )
+
+    (lookups, expected) = _load_lookup_table(db_path)
+    assert lookups == expected
+
+    version = dataset.load(db_path)
+    assert version.source_hash == TT.get_source_hash([del_path, add_path])
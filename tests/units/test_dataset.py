@@ -0,0 +1,71 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+import shutil
+
+import pytest
+
+from zip2addr import (
+    constants,
+    dataset as TT,
+    datagen,
+    db,
+)
+
+
+VERSION = TT.Version("0123456789abcdef0123", 1700000000)
+
+
+def test_version_headers():
+    assert VERSION.etag == '"0123456789abcdef-1700000000"'
+    assert VERSION.get_headers() == {
+        "ETag": VERSION.etag,
+        "Last-Modified": "Tue, 14 Nov 2023 22:13:20 GMT",
+        "Cache-Control": f"public, max-age={constants.HTTP_CACHE_MAX_AGE}",
+    }
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "expected"),
+    (('"0123456789abcdef-1700000000"', True),
+     ('W/"0123456789abcdef-1700000000"', True),
+     ('"x", "0123456789abcdef-1700000000"', True),
+     ("*", True),
+     ('"0123456789abcdef-1700000001"', False),
+     ("0123456789abcdef-1700000000", False),
+     )
+)
+def test_version_matches(if_none_match, expected):
+    assert VERSION.matches(if_none_match) == expected
+
+
+def test_get_version(my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    assert TT.get_version(db_path) is None
+
+    shutil.copyfile(my_datadir / constants.DATABASE_FILENAME, db_path)
+    version = TT.get_version(db_path)
+    assert version is not None
+    assert len(version.source_hash) == 64
+    assert TT.get_version(db_path) is version
+
+    engine = db.get_engine(db_path)
+    with engine.begin() as conn:
+        datagen.stamp_dataset_version(conn, "abc", built_at=1)
+    engine.dispose()
+
+    version = TT.get_version(db_path)
+    assert (version.source_hash, version.built_at) == ("abc", 1)
+
+
+def test_get_version_not_stamped(tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    engine = db.get_engine(db_path)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE zipcodes (id INTEGER)")
+    engine.dispose()
+
+    assert TT.get_version(db_path) is None
@@ -0,0 +1,230 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=too-few-public-methods
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+import asyncio
+
+import pytest
+import sqlalchemy
+import sqlalchemy.exc
+
+from zip2addr import (
+    constants,
+    crud,
+    datagen,
+    db as TT,
+    models
+)
+
+
+def test_get_file_signature(tmp_path):
+    filepath = tmp_path / "test.db"
+    assert TT.get_file_signature(filepath) is None
+
+    filepath.touch()
+    sig = TT.get_file_signature(filepath)
+    assert sig is not None
+    assert TT.get_file_signature(filepath) == sig
+
+    newpath = tmp_path / "new.db"
+    newpath.touch()
+    newpath.replace(filepath)
+    assert TT.get_file_signature(filepath) != sig
+
+
+def test_file_cache(tmp_path):
+    filepath = tmp_path / "test.txt"
+    filepath.write_text("a")
+
+    cache = TT.FileCache()
+    assert cache.get(filepath, lambda path: path.read_text()) == ("a", None)
+    assert cache.get(filepath, lambda path: "x") == ("a", None)
+
+    newpath = tmp_path / "new.txt"
+    newpath.write_text("b")
+    newpath.replace(filepath)
+    assert cache.get(filepath, lambda path: path.read_text()) == ("b", "a")
+
+    assert cache.clear() == ["b"]
+    assert cache.get(filepath, lambda path: "c") == ("c", None)
+
+
+def test_file_cache_get_reloading(tmp_path):
+    filepath = tmp_path / "test.txt"
+    filepath.write_text("a")
+
+    def make(path):
+        content = path.read_text()
+        if content == "error":
+            raise ValueError(content)
+        return content
+
+    cache = TT.FileCache()
+    assert cache.get_reloading(filepath, make) == "a"
+
+    for content, expected in (("error", "a"), ("b", "b")):
+        newpath = tmp_path / "new.txt"
+        newpath.write_text(content)
+        newpath.replace(filepath)
+
+        assert cache.get_reloading(filepath, make) == "a"
+        cache.wait()
+        assert cache.get_reloading(filepath, make) == expected
+        cache.wait()  # It's tried again if it failed.
+
+    filepath.unlink()
+    assert cache.get_reloading(filepath, make) == "b"
+
+
+@pytest.mark.parametrize(
+    ("immutable", ),
+    ((False, ),
+     (True, ),
+     )
+)
+def test_get_engine_read_only(immutable, my_datadir):
+    engine = TT.get_engine(
+        my_datadir / constants.DATABASE_FILENAME, read_only=True,
+        immutable=immutable
+    )
+    try:
+        with engine.connect() as conn:
+            pragmas = dict(constants.SQLITE_READ_ONLY_PRAGMAS)
+            assert conn.exec_driver_sql(
+                "PRAGMA mmap_size"
+            ).scalar() == pragmas["mmap_size"]
+            assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 1
+            assert conn.execute(
+                sqlalchemy.select(sqlalchemy.func.count()).select_from(
+                    models.Zipcode.__table__
+                )
+            ).scalar()
+
+            with pytest.raises(sqlalchemy.exc.OperationalError):
+                conn.execute(sqlalchemy.delete(models.Zipcode.__table__))
+
+        assert isinstance(engine.pool, sqlalchemy.pool.QueuePool)
+    finally:
+        engine.dispose()
+
+
+def test_get_engine_read_only_not_found(tmp_path):
+    engine = TT.get_engine(tmp_path / "not_exist.db", read_only=True)
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        engine.connect()
+
+    assert not (tmp_path / "not_exist.db").exists()
+
+
+@pytest.fixture(name="zipcodes")
+def get_zipcodes(my_datadir):
+    return datagen.load_from_files(my_datadir)
+
+
+def test_get_reloadable_session_class(zipcodes, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    datagen.save_zipcodes_as_db(zipcodes, db_path)
+
+    cls = TT.get_reloadable_session_class(db_path)
+    assert TT.get_reloadable_session_class(db_path) is cls
+
+    # A session opened before the database file was replaced.
+    old_dbs = cls()
+    assert old_dbs.query(models.Zipcode).count() == len(zipcodes)
+
+    datagen.save_zipcodes_as_db(zipcodes[:3], db_path)
+
+    new_cls = TT.get_reloadable_session_class(db_path)
+    assert new_cls is not cls
+    with TT.get_session_ctx(db_path, reloadable=True) as dbs:
+        assert dbs.query(models.Zipcode).count() == 3
+
+    # It keeps reading the old database file.
+    assert old_dbs.query(models.Zipcode).count() == len(zipcodes)
+    old_dbs.close()
+
+
+def test_dispose_engines(zipcodes, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    datagen.save_zipcodes_as_db(zipcodes, db_path)
+
+    cls = TT.get_reloadable_session_class(db_path)
+    with TT.get_session_ctx(db_path, reloadable=True) as dbs:
+        assert dbs.query(models.Zipcode).count() == len(zipcodes)
+
+    assert cls.kw["bind"].pool.checkedin() == 1
+    TT.dispose_engines()
+    assert cls.kw["bind"].pool.checkedin() == 0
+    assert TT.get_reloadable_session_class(db_path) is not cls
+
+
+def test_get_async_engine_read_only(my_datadir):
+    engine = TT.get_async_engine(
+        my_datadir / constants.DATABASE_FILENAME, read_only=True
+    )
+
+    async def query():
+        try:
+            async with engine.connect() as conn:
+                assert (
+                    await conn.exec_driver_sql("PRAGMA query_only")
+                ).scalar() == 1
+                return (await conn.execute(
+                    sqlalchemy.select(sqlalchemy.func.count()).select_from(
+                        models.ZipcodeLookup.__table__
+                    )
+                )).scalar()
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(query())
+
+
+def test_get_reloadable_async_session_class(zipcodes, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    datagen.save_zipcodes_as_db(zipcodes, db_path)
+
+    cls = TT.get_reloadable_async_session_class(db_path)
+    assert TT.get_reloadable_async_session_class(db_path) is cls
+
+    datagen.save_zipcodes_as_db(zipcodes[:3], db_path)
+    new_cls = TT.get_reloadable_async_session_class(db_path)
+    assert new_cls is not cls
+
+    async def count():
+        async with new_cls() as adbs:
+            return await adbs.scalar(
+                sqlalchemy.select(sqlalchemy.func.count()).select_from(
+                    models.ZipcodeLookup.__table__
+                )
+            )
+
+    assert asyncio.run(count()) == 3
+    asyncio.run(TT.dispose_async_engines())
+    assert TT.get_reloadable_async_session_class(db_path) is not new_cls
+
+
+@pytest.mark.parametrize(("use_async", ), ((False, ), (True, )))
+def test_get_reader(use_async, zipcodes, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    datagen.save_zipcodes_as_db(zipcodes, db_path)
+
+    async def lookup():
+        async for reader in TT.get_reader(db_path, use_async=use_async):
+            assert (reader.adbs is not None) == use_async
+            return await reader.run(
+                crud.get_zipcode, crud.get_zipcode_async,
+                zipcodes[0]["zipcode"]
+            )
+
+    try:
+        assert asyncio.run(lookup()).as_dict()["zipcode"] == (
+            zipcodes[0]["zipcode"]
+        )
+    finally:
+        TT.dispose_engines()
+        asyncio.run(TT.dispose_async_engines())
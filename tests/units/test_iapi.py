@@ -11,12 +11,15 @@ import time
 import zipfile
 
 import pytest
+import sqlalchemy
 
 from zip2addr import (
     constants,
     datagen as TT,
     db,
-    models
+    iapi,
+    models,
+    trie,
 )
 
 
@@ -217,3 +220,110 @@ def test_make_database_from_zip_files(outname, my_datadir, tmp_path):
     assert db_path.exists()
     with db.get_session_ctx(db_path) as dbs_ctx:
         assert dbs_ctx.query(models.Zipcode).all()
+
+
+@pytest.mark.parametrize(
+    ("engine", ),
+    (("sql", ),
+     ("mmap", ),
+     ("memory", ),
+     )
+)
+def test_search_by_zipcode(engine, my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    assert not iapi.search_by_zipcode("907", str(db_path), engine=engine)
+
+    iapi.initdb(str(my_datadir), str(db_path))
+
+    res = iapi.search_by_zipcode("907", str(db_path), engine=engine)
+    assert res
+    assert all(r["zipcode"].startswith("907") for r in res)
+    assert [
+        r for r in res if r["zipcode"] == "9071801"
+    ][0]["roman_pref"] == "OKINAWA KEN"
+
+    assert not iapi.search_by_zipcode("000", str(db_path), engine=engine)
+    assert not iapi.search_by_zipcode("9O7", str(db_path), engine=engine)
+
+    # The trie is not trusted if it's stale.
+    trie.save([], trie.get_path(db_path), tag='"stale"')
+    assert iapi.search_by_zipcode("907", str(db_path), engine=engine) == res
+
+
+@pytest.mark.parametrize(
+    ("engine", ),
+    (("sql", ),
+     ("mmap", ),
+     ("memory", ),
+     )
+)
+def test_search_by_zipcodes(engine, my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    zipcodes = ["9071801", "0000000", "0600000", "9071801"]
+    assert not iapi.search_by_zipcodes(zipcodes, str(db_path), engine=engine)
+
+    iapi.initdb(str(my_datadir), str(db_path))
+
+    res = iapi.search_by_zipcodes(zipcodes, str(db_path), engine=engine)
+    assert [r["zipcode"] for r in res] == zipcodes
+    assert [r["found"] for r in res] == [True, False, True, True]
+    assert res[0]["result"]["roman_pref"] == "OKINAWA KEN"
+    assert res[1]["result"] is None
+    assert res[3] == res[0]
+
+
+@pytest.mark.parametrize(
+    ("streaming", ),
+    ((False, ),
+     (True, ),
+     )
+)
+def test_initdb_profile(streaming, my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    assert iapi.initdb(str(my_datadir), str(db_path)) is None
+
+    profile_dir = tmp_path / "prof"
+    profiler = iapi.initdb(
+        str(my_datadir), str(db_path), streaming=streaming, profile=True,
+        profile_dir=str(profile_dir)
+    )
+    names = [s.name for s in profiler.stages]
+    stages = ["insert", "refresh_lookup", "trie", "snapshot"]
+    if streaming:
+        assert names == ["parse", *stages]
+    else:
+        assert names == ["parse", "dump_json", "load_json", *stages]
+    assert all(s.rows for s in profiler.stages)
+    assert all(s.peak_memory is None for s in profiler.stages)
+    assert (profile_dir / "report.json").exists()
+    assert (profile_dir / f"00_{names[0]}.pstats").exists()
+
+
+@pytest.mark.parametrize("streaming", (False, True))
+def test_initdb_invalid_workers(streaming, my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    with pytest.raises(ValueError, match="workers"):
+        iapi.initdb(
+            str(my_datadir), str(db_path), streaming=streaming, workers=-1
+        )
+    assert not db_path.exists()
+
+
+def test_search_by_address(my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    assert not iapi.search_by_address("与那国", str(db_path))
+
+    iapi.initdb(str(my_datadir), str(db_path))
+
+    res = iapi.search_by_address("与那国", str(db_path))
+    assert sorted(r["zipcode"] for r in res) == ["9071800", "9071801"]
+    assert res[0]["pref"] == "沖縄県"
+
+    assert not iapi.search_by_address(" ", str(db_path))
+    assert not iapi.search_by_address("存在しない住所", str(db_path))
+
+    engine = sqlalchemy.create_engine(f"sqlite:///{db_path}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE {models.ADDRESS_FTS.name}")
+    engine.dispose()
+    assert not iapi.search_by_address("与那国", str(db_path))
@@ -0,0 +1,51 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+import shutil
+
+import fastapi.testclient
+import pytest
+
+from zip2addr import (
+    constants,
+    db,
+    main as TT,
+    memory,
+)
+
+
+@pytest.mark.parametrize(("use_async", ), ((False, ), (True, )))
+def test_lifespan(use_async, my_datadir, tmp_path, monkeypatch):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    shutil.copyfile(my_datadir / constants.DATABASE_FILENAME, db_path)
+    monkeypatch.setattr(constants, "DATABASE_FILEPATH", str(db_path))
+    monkeypatch.setenv("ZIP2ADDR_DB_ASYNC", str(use_async))
+
+    get_cls = (
+        db.get_reloadable_async_session_class if use_async
+        else db.get_reloadable_session_class
+    )
+    with fastapi.testclient.TestClient(TT.APP) as client:
+        cls = get_cls(db_path)
+        assert client.get("/zipcodes/0600000").status_code == 200
+        assert client.get("/zipcodes/partial/06").json()
+        assert get_cls(db_path) is cls
+
+    assert get_cls(db_path) is not cls
+
+
+def test_lifespan_memory(my_datadir, tmp_path, monkeypatch):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    shutil.copyfile(my_datadir / constants.DATABASE_FILENAME, db_path)
+    monkeypatch.setattr(constants, "DATABASE_FILEPATH", str(db_path))
+    monkeypatch.setenv("ZIP2ADDR_LOOKUP_ENGINE", "memory")
+
+    with fastapi.testclient.TestClient(TT.APP) as client:
+        store = memory.get_store(db_path)
+        assert client.get("/zipcodes/0600000").json() == (
+            store.get_zipcode("0600000").as_dict()
+        )
+        assert memory.get_store(db_path) is store
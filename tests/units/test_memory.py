@@ -0,0 +1,116 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+import os
+import shutil
+
+import pytest
+
+from zip2addr import (
+    constants,
+    crud,
+    dataset,
+    db,
+    memory as TT,
+)
+
+
+@pytest.fixture(name="db_path")
+def get_db_path(my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    shutil.copyfile(my_datadir / constants.DATABASE_FILENAME, db_path)
+    return db_path
+
+
+@pytest.fixture(name="expected")
+def get_expected(db_path):
+    with db.get_session_ctx(db_path, read_only=True) as dbs:
+        return {
+            z.zipcode: z.as_dict()
+            for z in crud.get_zipcodes_by_partial_zipcode(dbs, "", limit=0)
+        }
+
+
+def test_store_get_zipcode(expected, db_path):
+    store = TT.Store.load(db_path)
+    assert len(store) == len(expected)
+    assert store.load_time > 0
+
+    for zipcode, zdata in expected.items():
+        res = store.get_zipcode(zipcode)
+        assert res is not None
+        assert res.as_dict() == zdata
+
+    # Strings repeated are interned as records.Record does.
+    (res_0, res_1) = (store.get_zipcode("9071800"),
+                      store.get_zipcode("9071801"))
+    assert res_0["pref"] is res_1["pref"]
+
+    for zipcode in ("0000000", "060", "", "abc"):
+        assert store.get_zipcode(zipcode) is None
+
+
+@pytest.mark.parametrize(
+    ("partial_zipcode", ),
+    (("", ),
+     ("0", ),
+     ("06", ),
+     ("9071801", ),
+     ("999", ),
+     )
+)
+def test_store_get_zipcodes_by_partial_zipcode(
+    partial_zipcode, expected, db_path
+):
+    zipcodes = sorted(z for z in expected if z.startswith(partial_zipcode))
+    store = TT.Store.load(db_path)
+
+    res = store.get_zipcodes_by_partial_zipcode(partial_zipcode, limit=0)
+    assert [r.zipcode for r in res] == zipcodes
+
+    res = store.get_zipcodes_by_partial_zipcode(
+        partial_zipcode, skip=1, limit=2
+    )
+    assert [r.zipcode for r in res] == zipcodes[1:3]
+
+    if zipcodes:
+        res = store.get_zipcodes_by_partial_zipcode(
+            partial_zipcode, limit=0, after=zipcodes[0]
+        )
+        assert [r.zipcode for r in res] == zipcodes[1:]
+
+
+def test_store_get_zipcodes(expected, db_path):
+    zipcodes = sorted(expected)
+    store = TT.Store.load(db_path)
+
+    assert [r.zipcode for r in store.get_zipcodes()] == zipcodes
+    assert [
+        r.zipcode for r in store.get_zipcodes(skip=3, limit=5)
+    ] == zipcodes[3:8]
+    assert not store.get_zipcodes(limit=0)
+    assert [
+        r.zipcode for r in store.get_zipcodes(limit=5, after=zipcodes[2])
+    ] == zipcodes[3:8]
+    assert not store.get_zipcodes(after=zipcodes[-1])
+
+
+def test_get_store(db_path):
+    store = TT.get_store(db_path)
+    assert TT.get_store(db_path) is store
+    assert store.signature == db.get_file_signature(db_path)
+    assert store.version.etag == dataset.load(db_path).etag
+    assert store.stats()["size"] == len(store)
+
+    stat = db_path.stat()
+    os.utime(db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+    # The old one is served until the new one is loaded in background.
+    assert TT.get_store(db_path) is store
+    TT._STORES.wait()  # pylint: disable=protected-access
+    new_store = TT.get_store(db_path)
+    assert new_store is not store
+    assert new_store.signature == db.get_file_signature(db_path)
@@ -0,0 +1,72 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+import json
+import pstats
+
+import pytest
+
+from zip2addr import profiling as TT
+
+
+def test_stage_without_profiler():
+    with TT.stage(None, "noop") as stage:
+        stage.rows = 1
+
+    assert stage.name == "noop"
+    assert stage.peak_memory is None
+
+
+def test_profiler(tmp_path):
+    profiler = TT.Profiler(tmp_path / "prof", trace_memory=True)
+
+    with profiler.stage("alloc") as stage:
+        data = [str(i) for i in range(10000)]
+        stage.rows = len(data)
+
+    with pytest.raises(RuntimeError):
+        with TT.stage(profiler, "fail"):
+            raise RuntimeError("failed")
+
+    assert [s.name for s in profiler.stages] == ["alloc", "fail"]
+    assert profiler.stages[0].rows == 10000
+    assert profiler.stages[0].elapsed > 0
+    assert profiler.stages[0].peak_memory > 10000
+
+    assert pstats.Stats(str(tmp_path / "prof" / "00_alloc.pstats"))
+    assert (tmp_path / "prof" / "01_fail.pstats").exists()
+
+    report = profiler.report()
+    assert "alloc" in report and "10000" in report
+    assert report.splitlines()[-1].startswith("total")
+
+    outpath = tmp_path / TT.REPORT_FILENAME
+    profiler.save(outpath)
+    assert json.loads(outpath.read_text())[0]["name"] == "alloc"
+
+
+def test_profiler_accumulate():
+    profiler = TT.Profiler()
+    for _i in range(3):
+        with TT.stage(profiler, "batch", accumulate=True) as stage:
+            stage.rows = 2
+        with TT.stage(profiler, "other", accumulate=True):
+            pass
+
+    assert [s.name for s in profiler.stages] == ["batch", "other"]
+    assert profiler.stages[0].rows == 6
+    assert profiler.stages[0].elapsed > 0
+    assert profiler.stages[0].peak_memory is None
+
+
+def test_iterate():
+    items = [[1, 2], [3]]
+    assert list(TT.iterate(None, "parse", items)) == items
+
+    profiler = TT.Profiler()
+    assert list(TT.iterate(profiler, "parse", iter(items))) == items
+    assert [s.name for s in profiler.stages] == ["parse"]
+    assert profiler.stages[0].rows == 3
@@ -0,0 +1,61 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=too-few-public-methods
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+import pytest
+
+from zip2addr import (
+    datagen,
+    records as TT
+)
+
+
+ZDATA = dict(
+    zipcode="0861834", pref="北海道", city_ward="目梨郡　羅臼町",
+    house_numbers="礼文町",
+    roman_pref="HOKKAIDO", roman_city_ward="MENASHI GUN RAUSU CHO",
+    roman_house_numbers="REBUNCHO"
+)
+
+
+def test_record():
+    rec = TT.Record(ZDATA)
+    assert not hasattr(rec, "__dict__")
+    assert len(rec) == len(TT.KEYS)
+    assert list(rec) == list(TT.KEYS)
+    assert rec["pref"] == "北海道"
+    assert rec["kana_pref"] == ""
+    assert rec.get("kana_pref") == ""
+    assert dict(rec) == rec.as_dict()
+    assert rec == dict({key: "" for key in TT.KEYS}, **ZDATA)
+
+    with pytest.raises(KeyError):
+        rec["unknown_key"]  # pylint: disable=pointless-statement
+
+    rec.update(dict(kana_pref="ﾎｯｶｲﾄﾞｳ", unknown_key="ignored"))
+    assert rec["kana_pref"] == "ﾎｯｶｲﾄﾞｳ"
+    assert "unknown_key" not in rec
+
+
+def test_record_interns_values():
+    # Make equal strings not identical.
+    (pref_0, pref_1) = ("".join(["北海", "道"]), "".join(["北", "海道"]))
+    assert pref_0 is not pref_1
+
+    (rec_0, rec_1) = (
+        TT.Record(dict(ZDATA, pref=pref_0)),
+        TT.Record(dict(ZDATA, pref=pref_1))
+    )
+    assert rec_0["pref"] is rec_1["pref"]
+
+
+def test_records_from_loader(my_datadir):
+    res = datagen.load_from_files(my_datadir)
+    assert all(isinstance(r, TT.Record) for r in res)
+
+    prefs = {id(r["pref"]) for r in res}
+    assert len(prefs) == len({r["pref"] for r in res})
@@ -0,0 +1,161 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=too-few-public-methods
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+import pytest
+
+from zip2addr import (
+    constants,
+    datagen,
+    dataset,
+    records,
+    snapshot as TT
+)
+
+
+@pytest.fixture(name="zipcodes")
+def get_zipcodes(my_datadir):
+    return [
+        dict(id=idx, address_id=idx, **zdata)
+        for idx, zdata
+        in enumerate(datagen.load_from_files(my_datadir), start=1)
+    ]
+
+
+@pytest.fixture(name="snap_path")
+def get_snap_path(zipcodes, tmp_path):
+    path = tmp_path / f"test{constants.SNAPSHOT_SUFFIX}"
+    assert TT.save(zipcodes, path) == len(zipcodes)
+    return path
+
+
+def test_get_path():
+    assert TT.get_path("/tmp/zipcodes.db").name == "zipcodes.snap"
+
+
+def test_zipcode():
+    zdata = dict(id=1, address_id=2, zipcode="9071801", pref="沖縄県",
+                 roman_pref=None, unknown_key="ignored")
+    res = TT.Zipcode(zdata)
+    assert isinstance(res, records.Record)
+    assert not hasattr(res, "__dict__")
+    assert (res.id, res.address_id, res.zipcode) == (1, 2, "9071801")
+    assert res["roman_pref"] == ""
+    assert "unknown_key" not in res
+    assert res.as_dict() == dict(
+        {key: "" for key in TT.FIELDS}, zipcode="9071801", pref="沖縄県"
+    )
+
+
+def test_sorted_zipcodes_is_abstract():
+    with pytest.raises(TypeError):
+        TT.SortedZipcodes()  # pylint: disable=abstract-class-instantiated
+
+
+def test_save_invalid_zipcode(zipcodes, tmp_path):
+    zipcodes[0]["zipcode"] = "060"
+    with pytest.raises(ValueError):
+        TT.save(zipcodes, tmp_path / "test.snap")
+
+
+def test_snapshot_version(zipcodes, snap_path, tmp_path):
+    with TT.Snapshot(snap_path) as snap:
+        assert snap.version is None
+
+    path = tmp_path / "versioned.snap"
+    version = dataset.Version("a" * 63, 1700000000)
+    TT.save(zipcodes, path, version=version)
+    with TT.Snapshot(path) as snap:
+        assert snap.version.source_hash == version.source_hash
+        assert snap.version.etag == version.etag
+        assert snap.get_zipcode("9071801").as_dict()["pref"] == "沖縄県"
+
+
+def test_snapshot_invalid_file(tmp_path):
+    path = tmp_path / "test.snap"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        TT.Snapshot(path)
+
+
+def test_snapshot_get_zipcode(zipcodes, snap_path):
+    with TT.Snapshot(snap_path) as snap:
+        assert len(snap) == len(zipcodes)
+
+        for zdata in zipcodes:
+            res = snap.get_zipcode(zdata["zipcode"])
+            assert res is not None
+            assert res.id == zdata["id"]
+            assert res.address_id == zdata["address_id"]
+            assert res.as_dict() == {
+                key: zdata[key] for key in ("zipcode", ) + TT.FIELDS
+            }
+
+        for zipcode in ("0000000", "9999999", "060", "", "abc"):
+            assert snap.get_zipcode(zipcode) is None
+
+
+@pytest.mark.parametrize(
+    ("partial_zipcode", ),
+    (("", ),
+     ("0", ),
+     ("06", ),
+     ("064", ),
+     ("9071801", ),
+     ("000", ),
+     ("999", ),
+     )
+)
+def test_snapshot_get_zipcodes_by_partial_zipcode(
+    partial_zipcode, zipcodes, snap_path
+):
+    expected = sorted(
+        z["zipcode"] for z in zipcodes
+        if z["zipcode"].startswith(partial_zipcode)
+    )
+    with TT.Snapshot(snap_path) as snap:
+        res = snap.get_zipcodes_by_partial_zipcode(partial_zipcode, limit=0)
+        assert [r.zipcode for r in res] == expected
+
+        res = snap.get_zipcodes_by_partial_zipcode(
+            partial_zipcode, skip=1, limit=2
+        )
+        assert [r.zipcode for r in res] == expected[1:3]
+
+        if expected:
+            res = snap.get_zipcodes_by_partial_zipcode(
+                partial_zipcode, limit=0, after=expected[0]
+            )
+            assert [r.zipcode for r in res] == expected[1:]
+
+
+def test_snapshot_get_zipcodes(zipcodes, snap_path):
+    expected = sorted(z["zipcode"] for z in zipcodes)
+    with TT.Snapshot(snap_path) as snap:
+        assert [r.zipcode for r in snap.get_zipcodes()] == expected
+        assert [
+            r.zipcode for r in snap.get_zipcodes(skip=3, limit=5)
+        ] == expected[3:8]
+        assert not snap.get_zipcodes(limit=0)
+        assert [
+            r.zipcode for r in snap.get_zipcodes(limit=5, after=expected[2])
+        ] == expected[3:8]
+        assert [
+            r.zipcode for r in snap.get_zipcodes(after="0000000")
+        ] == expected
+        assert not snap.get_zipcodes(after=expected[-1])
+
+
+def test_get_snapshot(zipcodes, snap_path):
+    snap = TT.get_snapshot(snap_path)
+    assert TT.get_snapshot(snap_path) is snap
+
+    TT.save(zipcodes[:2], snap_path)
+    new_snap = TT.get_snapshot(snap_path)
+    assert new_snap is not snap
+    assert len(new_snap) == 2
+    assert len(snap) == len(zipcodes)
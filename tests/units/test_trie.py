@@ -0,0 +1,125 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+import shutil
+
+import pytest
+
+from zip2addr import (
+    constants,
+    dataset,
+    datagen,
+    trie as TT,
+)
+
+
+@pytest.fixture(name="zipcodes")
+def get_zipcodes(my_datadir):
+    return sorted(z["zipcode"] for z in datagen.load_from_files(my_datadir))
+
+
+@pytest.fixture(name="trie_path")
+def get_trie_path(zipcodes, tmp_path):
+    path = tmp_path / f"test{constants.TRIE_SUFFIX}"
+    assert TT.save(zipcodes, path) == len(zipcodes)
+    return path
+
+
+def test_get_path():
+    assert TT.get_path("/tmp/zipcodes.db").name == "zipcodes.trie"
+
+
+@pytest.mark.parametrize(
+    ("zipcode", ),
+    (("060", ),
+     ("06000000", ),
+     ("abcdefg", ),
+     ("０６００００００", ),
+     )
+)
+def test_save_invalid_zipcode(zipcode, zipcodes, tmp_path):
+    with pytest.raises(ValueError):
+        TT.save(zipcodes + [zipcode], tmp_path / "test.trie")
+
+
+def test_trie_invalid_file(tmp_path):
+    path = tmp_path / "test.trie"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        TT.Trie(path)
+
+
+def test_trie_empty(tmp_path):
+    path = tmp_path / "test.trie"
+    assert TT.save([], path) == 0
+    with TT.Trie(path) as ztrie:
+        assert len(ztrie) == 0
+        assert ztrie.count("") == 0
+        assert ztrie.count("0") == 0
+
+
+@pytest.mark.parametrize(
+    ("prefix", ),
+    (("", ),
+     ("0", ),
+     ("06", ),
+     ("064", ),
+     ("9071801", ),
+     ("000", ),
+     ("999", ),
+     ("06a", ),
+     ("06000000", ),
+     )
+)
+def test_trie_count(prefix, zipcodes, trie_path):
+    matches = [
+        zc for zc in zipcodes
+        if zc.startswith(prefix) and len(prefix) <= constants.ZIPCODE_LENGTH
+    ]
+    with TT.Trie(trie_path) as ztrie:
+        assert len(ztrie) == len(zipcodes)
+        assert ztrie.count(prefix) == len(matches)
+
+
+def test_trie_tag(zipcodes, trie_path):
+    with TT.Trie(trie_path) as ztrie:
+        assert ztrie.tag == ""
+
+    for tag in ('"abc"', '"abcde-1"'):
+        TT.save(zipcodes, trie_path, tag=tag)
+        with TT.Trie(trie_path) as ztrie:
+            assert ztrie.tag == tag
+            assert len(ztrie) == len(zipcodes)
+            assert ztrie.count("907") == len(
+                [zc for zc in zipcodes if zc.startswith("907")]
+            )
+
+
+def test_get_trie_of_db(zipcodes, my_datadir, tmp_path):
+    db_path = tmp_path / constants.DATABASE_FILENAME
+    shutil.copyfile(my_datadir / constants.DATABASE_FILENAME, db_path)
+    assert TT.get_trie_of_db(db_path) is None
+
+    # Made from another version of the dataset.
+    TT.save(zipcodes[:2], TT.get_path(db_path), tag='"x"')
+    assert TT.get_trie_of_db(db_path) is None
+
+    datagen.save_db_as_trie(db_path)
+    ztrie = TT.get_trie_of_db(db_path)
+    assert ztrie is not None
+    assert ztrie.tag == dataset.load(db_path).etag
+    assert len(ztrie) == len(zipcodes)
+
+
+def test_get_trie(zipcodes, trie_path):
+    ztrie = TT.get_trie(trie_path)
+    assert TT.get_trie(trie_path) is ztrie
+
+    TT.save(zipcodes[:2], trie_path)
+    new_trie = TT.get_trie(trie_path)
+    assert new_trie is not ztrie
+    assert len(new_trie) == 2
+    assert len(ztrie) == len(zipcodes)
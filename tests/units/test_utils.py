@@ -0,0 +1,67 @@
+# Copyright (C) 2023 Satoru SATOH <satoru.satoh@gmail.com>
+# SPDX-License-Identifier: MIT
+#
+# pylint: disable=invalid-name
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+import pytest
+
+from zip2addr import utils as TT
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    (("", ""),
+     ("ｻｯﾎﾟﾛｼ", "サッポロシ"),
+     ("さっぽろし", "サッポロシ"),
+     ("ヨナグニチョウ", "ヨナグニチョウ"),
+     ("KITA 7-JONISHI", "kita7jonishi"),
+     ("Ｋｉｔａ７－ｊｏ", "kita7jo"),
+     ("新潟市　北区", "新潟市北区"),
+     ("大通西（１～１９丁目）", "大通西(1~19丁目)"),
+     )
+)
+def test_normalize_text(text, expected):
+    assert TT.normalize_text(text) == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    (("", set()),
+     ("ab", set()),
+     ("abc", {"abc"}),
+     ("abab", {"aba", "bab"}),
+     )
+)
+def test_get_trigrams(text, expected):
+    assert TT.get_trigrams(text) == expected
+
+
+@pytest.mark.parametrize(
+    ("size", "expected"),
+    ((0, 0),
+     (1, 4),
+     (4, 4),
+     (5, 8),
+     )
+)
+def test_align(size, expected):
+    assert TT.align(size) == expected
+
+
+def test_open_atomically(tmp_path):
+    path = tmp_path / "test.bin"
+    with TT.open_atomically(path) as bfd:
+        bfd.write(b"abc")
+        assert TT.get_temporary_path(path).exists()
+        assert not path.exists()
+
+    assert path.read_bytes() == b"abc"
+
+    with pytest.raises(RuntimeError):
+        with TT.open_atomically(path) as bfd:
+            bfd.write(b"def")
+            raise RuntimeError("failed")
+
+    assert path.read_bytes() == b"abc"
+    assert not TT.get_temporary_path(path).exists()